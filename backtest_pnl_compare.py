@@ -2,7 +2,8 @@
 """Backtest PnL comparison with cooldown.
 
 Per user request:
-- Load data/sim_log.jsonl
+- Load the sim_log (data/sim_log/ segments, or data/sim_log.jsonl before they
+  exist); --since/--until limit it to a time range
 - Simulate trades with cooldown=360min, max_trades_per_snapshot=1
 - Scenario A (current): min_div=0.12, max_price=0.20
 - Scenario B (proposed): min_div=0.10, max_price=0.20
@@ -13,26 +14,52 @@ Trade model (matches existing bot/backtest.py + historical_backtest.py):
 - Consider only target city questions (NYC, Chicago)
 - Consider only positive divergence (div >= min_div)
 - Filter by simmer_price <= max_price (the Simmer prob in the snapshot)
-- Execute a BUY-YES with notional $10 using orderbook walk closest to $10
-
-Outputs a plain-text summary.
+- Execute a BUY-YES with notional $10, filled from the logged ask curve (closest
+  sampled walk for rows logged before the curve existed)
+
+Scenario engine:
+- With no arguments the two scenarios above run. `--scenarios file.json` or
+  the grid axes (--min-divs, --max-prices, --cooldowns, --caps, --notionals)
+  run any number of scenarios.
+- Scenarios sharing (notional, cooldown, cap) run the cooldown state machine
+  once for all their (min_div, max_price) cells, per market
+  (bot.market_series.select_trades_by_market), over the memory-mapped
+  snapshot store; chunks fan out over a process pool (--workers) whose
+  workers all map the same store files.
+
+Outputs a plain-text summary per scenario (small runs) and a ranked table.
 """
 
 from __future__ import annotations
 
+import argparse
 import json
 import os
-from dataclasses import dataclass
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
+import numpy as np
 import requests
 
-LOG_PATH = Path(__file__).resolve().parent / "data" / "sim_log.jsonl"
+from bot.grid_backtest import CITY_CODES, Candidates, extract_candidates, fill_for_notional
+from bot.market_series import select_trades_by_market
+from bot.questions import parse_question
+from bot.simlog import default_log_source
+from bot.snapshot_reader import SnapshotLog
+from bot.snapshot_store import SnapshotStore, open_store
+
+LOG_PATH = default_log_source()
 TRADE_NOTIONAL = 10.0
 COOLDOWN_MINUTES = 360
 MAX_TRADES_PER_SNAPSHOT = 1
+STORE_DIR = LOG_PATH.parent / "sim_log.cols"
+CITY_NAMES = {code: name for name, code in CITY_CODES.items()}
+# Print the per-market breakdown only for small runs; big grids get the ranked table.
+MAX_DETAILED = 4
 
 
 def safe_float(x) -> Optional[float]:
@@ -51,30 +78,12 @@ def parse_ts(ts: str) -> datetime:
 
 
 def is_target_city(question: str) -> Tuple[bool, Optional[str]]:
-    q = (question or "").lower()
-    if ("nyc" in q) or ("new york" in q):
-        return True, "nyc"
-    if "chicago" in q:
-        return True, "chicago"
+    city = parse_question(question or "").city
+    if city in CITY_CODES:
+        return True, city
     return False, None
 
 
-def closest_walk_for_notional(walks: Any, target_notional: float) -> Optional[Dict[str, Any]]:
-    if not isinstance(walks, list) or not walks:
-        return None
-    best = None
-    best_dist = None
-    for w in walks:
-        n = safe_float((w or {}).get("notional"))
-        if n is None:
-            continue
-        dist = abs(n - target_notional)
-        if best is None or dist < best_dist:
-            best = w
-            best_dist = dist
-    return best
-
-
 @dataclass
 class Trade:
     ts: datetime
@@ -88,29 +97,19 @@ class Trade:
     cost: float
 
 
-def load_snapshots() -> List[Dict[str, Any]]:
-    rows: List[Dict[str, Any]] = []
-    with LOG_PATH.open("r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                rows.append(json.loads(line))
-            except Exception:
-                continue
-    # sort just in case
-    rows.sort(key=lambda r: r.get("ts") or "")
-    return rows
+def load_snapshots(since: Optional[str] = None, until: Optional[str] = None) -> SnapshotLog:
+    # Streamed from disk on each pass, in ts order (sorted in memory only if the log isn't).
+    return SnapshotLog(LOG_PATH, ordered=True, since=since, until=until)
 
 
 def simulate_trades(
-    snapshots: List[Dict[str, Any]],
+    snapshots: Iterable[Dict[str, Any]],
     *,
     min_div: float,
     max_price: float,
-    cooldown_minutes: int,
-    max_trades_per_snapshot: int,
+    cooldown_minutes: float,
+    max_trades_per_snapshot: Optional[int],
+    notional: float = TRADE_NOTIONAL,
 ) -> List[Trade]:
     cooldown = timedelta(minutes=cooldown_minutes)
     last_trade_by_market: Dict[str, datetime] = {}
@@ -128,7 +127,7 @@ def simulate_trades(
 
         placed = 0
         for p in picks:
-            if placed >= max_trades_per_snapshot:
+            if max_trades_per_snapshot is not None and placed >= max_trades_per_snapshot:
                 break
 
             q = p.get("question") or ""
@@ -155,16 +154,10 @@ def simulate_trades(
             if prev is not None and (snap_ts - prev) < cooldown:
                 continue
 
-            ob = p.get("orderbook") or {}
-            walks = ob.get("walks") if isinstance(ob, dict) else None
-            walk = closest_walk_for_notional(walks, TRADE_NOTIONAL)
-            if not walk:
-                continue
-
-            fill = safe_float(walk.get("avg_price"))
-            shares = safe_float(walk.get("shares"))
-            if fill is None or shares is None:
+            filled = fill_for_notional(p.get("orderbook"), notional)
+            if filled is None:
                 continue
+            fill, shares = filled
 
             t = Trade(
                 ts=snap_ts,
@@ -175,7 +168,7 @@ def simulate_trades(
                 simmer_price=simmer,
                 fill_price=fill,
                 shares=shares,
-                cost=TRADE_NOTIONAL,
+                cost=notional,
             )
             trades.append(t)
             last_trade_by_market[mid] = snap_ts
@@ -288,70 +281,283 @@ def fmt_usd(x: float) -> str:
     return f"${x:,.2f}"
 
 
-def main():
-    snapshots = load_snapshots()
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    min_div: float
+    max_price: float
+    cooldown_minutes: float = COOLDOWN_MINUTES
+    max_trades_per_snapshot: Optional[int] = MAX_TRADES_PER_SNAPSHOT
+    notional: float = TRADE_NOTIONAL
+
+
+DEFAULT_SCENARIOS = [
+    Scenario("current", 0.12, 0.20),
+    Scenario("proposed", 0.10, 0.20),
+]
+
+
+def load_scenarios(path: Path) -> List[Scenario]:
+    """JSON list of {name?, min_div, max_price, cooldown_minutes?, max_trades_per_snapshot?, notional?}."""
+    raw = json.loads(Path(path).read_text("utf-8"))
+    out = []
+    for i, d in enumerate(raw):
+        d = dict(d)
+        d.setdefault("name", f"s{i}")
+        out.append(Scenario(**d))
+    return out
+
+
+def scenario_grid(
+    min_divs: List[float],
+    max_prices: List[float],
+    cooldowns: List[float],
+    caps: List[Optional[int]],
+    notionals: List[float],
+) -> List[Scenario]:
+    out = []
+    for n in notionals:
+        for cd in cooldowns:
+            for cap in caps:
+                for d in min_divs:
+                    for p in max_prices:
+                        name = f"div>={d:g} price<={p:g} cd={cd:g}m cap={cap} ${n:g}"
+                        out.append(Scenario(name, d, p, cd, cap, n))
+    return out
+
+
+# Per-process engine state: the memory-mapped snapshot store (pages shared by
+# every worker through the OS page cache), market info, candidates by notional.
+_ENGINE: Dict[str, Any] = {}
+
+
+def _init_engine(store_dir: str, markets: Dict[str, Dict[str, Any]]) -> None:
+    _ENGINE.clear()
+    _ENGINE.update(store=SnapshotStore(Path(store_dir)), markets=markets, candidates={})
+
+
+def _candidates(notional: float) -> Candidates:
+    cached = _ENGINE["candidates"].get(notional)
+    if cached is None:
+        c = extract_candidates(_ENGINE["store"], notional)
+        # simulate_trades walks snapshots in ts order; the store is in file order.
+        cached = c.take(np.argsort(c.ts, kind="stable"))
+        _ENGINE["candidates"][notional] = cached
+    return cached
 
-    scenarios = [
-        ("current", 0.12, 0.20),
-        ("proposed", 0.10, 0.20),
+
+def _trades_from(c: Candidates, rows: np.ndarray, notional: float) -> List[Trade]:
+    return [
+        Trade(
+            ts=datetime.fromtimestamp(int(c.ts[i]) / 1_000_000, timezone.utc),
+            market_id=c.market_ids[c.market[i]],
+            question=c.questions[c.question[i]],
+            city=CITY_NAMES[int(c.city[i])],
+            divergence=float(c.divergence[i]),
+            simmer_price=float(c.simmer_price[i]),
+            fill_price=float(c.fill_price[i]),
+            shares=float(c.shares[i]),
+            cost=notional,
+        )
+        for i in rows
     ]
 
-    trades_by_name: Dict[str, List[Trade]] = {}
-    all_market_ids: List[str] = []
 
-    for name, min_div, max_price in scenarios:
-        trades = simulate_trades(
-            snapshots,
-            min_div=min_div,
-            max_price=max_price,
-            cooldown_minutes=COOLDOWN_MINUTES,
-            max_trades_per_snapshot=MAX_TRADES_PER_SNAPSHOT,
+def _run_chunk(scenarios: List[Scenario]) -> List[Dict[str, Any]]:
+    """Summaries for scenarios sharing (notional, cooldown, cap): one state-machine pass for all of them."""
+    first = scenarios[0]
+    c = _candidates(first.notional)
+    divs = sorted({s.min_div for s in scenarios})
+    prices = sorted({s.max_price for s in scenarios})
+    taken = select_trades_by_market(
+        c,
+        divs,
+        prices,
+        cooldown_minutes=first.cooldown_minutes,
+        max_trades_per_snapshot=first.max_trades_per_snapshot,
+    )
+    out = []
+    for s in scenarios:
+        cell = divs.index(s.min_div) * len(prices) + prices.index(s.max_price)
+        trades = _trades_from(c, np.flatnonzero(taken[cell]), s.notional)
+        out.append(summarize(trades, _ENGINE["markets"]))
+    return out
+
+
+def candidate_market_ids(store: SnapshotStore, scenarios: List[Scenario]) -> List[str]:
+    """Markets any scenario could trade (a superset of the traded ones)."""
+    ids = set()
+    min_div = min(s.min_div for s in scenarios)
+    max_price = max(s.max_price for s in scenarios)
+    for notional in {s.notional for s in scenarios}:
+        c = extract_candidates(store, notional)
+        ok = (c.divergence >= min_div) & (c.simmer_price <= max_price) & (c.market >= 0)
+        ids.update(c.market_ids[m] for m in np.unique(c.market[ok]))
+    return sorted(ids)
+
+
+def run_scenarios(
+    scenarios: List[Scenario],
+    markets: Dict[str, Dict[str, Any]],
+    *,
+    store_dir: Path,
+    workers: int = 1,
+) -> List[Dict[str, Any]]:
+    """`summarize` output per scenario (same order), fanned out over a process pool."""
+    groups: Dict[Tuple[float, float, Optional[int]], List[int]] = {}
+    for i, s in enumerate(scenarios):
+        groups.setdefault((s.notional, s.cooldown_minutes, s.max_trades_per_snapshot), []).append(i)
+    # Split groups so every worker gets work; each chunk still shares one pass over the candidates.
+    per_chunk = max(1, -(-len(scenarios) // (workers * 4)))
+    chunks = [idx[k : k + per_chunk] for idx in groups.values() for k in range(0, len(idx), per_chunk)]
+
+    summaries: List[Optional[Dict[str, Any]]] = [None] * len(scenarios)
+    if workers <= 1:
+        _init_engine(str(store_dir), markets)
+        results = map(_run_chunk, ([scenarios[i] for i in ch] for ch in chunks))
+        for ch, res in zip(chunks, results):
+            for i, summary in zip(ch, res):
+                summaries[i] = summary
+        return summaries
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_engine, initargs=(str(store_dir), markets)) as pool:
+        futures = {pool.submit(_run_chunk, [scenarios[i] for i in ch]): ch for ch in chunks}
+        for fut, ch in futures.items():
+            for i, summary in zip(ch, fut.result()):
+                summaries[i] = summary
+    return summaries
+
+
+def print_scenario(sc: Scenario, s: Dict[str, Any]) -> None:
+    print(
+        f"=== Scenario: {sc.name} (min_div={sc.min_div:.2f}, max_price={sc.max_price:.2f}, "
+        f"cooldown={sc.cooldown_minutes:g}min, max_trades_per_snapshot={sc.max_trades_per_snapshot}, "
+        f"notional=${sc.notional:.0f}) ==="
+    )
+    print(f"Trades: {s['trades']}")
+    print(f"Total cost:  {fmt_usd(s['total_cost'])}")
+    print(f"Total value: {fmt_usd(s['total_value'])}")
+    print(f"Total PnL:   {fmt_usd(s['total_pnl'])}")
+    print(f"ROI:         {s['roi']*100:.2f}%")
+    print("Per-market breakdown:")
+    pm = list(s["per_market"].values())
+    pm.sort(key=lambda r: r["pnl"], reverse=True)
+    if not pm:
+        print("  (no trades)")
+    for r in pm:
+        outcome = r.get("outcome")
+        cp = r.get("current_probability")
+        outcome_s = (str(outcome).lower() if outcome is not None else f"prob={cp:.3f}" if cp is not None else "unknown")
+        print(
+            "  - "
+            + r["market_id"]
+            + f" | trades={r['trades']} | cost={fmt_usd(r['cost'])} | value={fmt_usd(r['value'])} | pnl={fmt_usd(r['pnl'])} | avg_fill={r['avg_fill_price']:.4f} | {outcome_s}"
+        )
+        q = (r.get("question") or "").strip()
+        if q:
+            print(f"      {q}")
+    print("")
+
+
+def print_ranked(scenarios: List[Scenario], summaries: List[Dict[str, Any]], top: int) -> None:
+    order = sorted(range(len(scenarios)), key=lambda i: (-summaries[i]["total_pnl"], -summaries[i]["roi"], i))
+    print(f"=== Ranked by total PnL (top {min(top, len(order))} of {len(order)}) ===")
+    print("rank min_div max_price cooldown cap notional trades cost pnl roi name")
+    for rank, i in enumerate(order[:top], 1):
+        sc, su = scenarios[i], summaries[i]
+        print(
+            f"{rank:4d} {sc.min_div:7.3f} {sc.max_price:9.3f} {sc.cooldown_minutes:8g} {str(sc.max_trades_per_snapshot):>3s} "
+            f"{sc.notional:8.2f} {su['trades']:6d} {fmt_usd(su['total_cost'])} {fmt_usd(su['total_pnl'])} "
+            f"{su['roi'] * 100:.2f}% {sc.name}"
         )
-        trades_by_name[name] = trades
-        all_market_ids.extend([t.market_id for t in trades])
+    print("")
+
+
+def parse_csv(raw: Optional[str], default: List[Any], cast=float) -> List[Any]:
+    if not raw:
+        return list(default)
+    return [None if part.strip().lower() == "none" else cast(part) for part in raw.split(",") if part.strip()]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--scenarios", type=str, default=None, help="JSON file with a list of scenarios")
+    ap.add_argument("--min-divs", type=str, default=None, help="grid axis, comma-separated")
+    ap.add_argument("--max-prices", type=str, default=None, help="grid axis, comma-separated")
+    ap.add_argument("--cooldowns", type=str, default=None, help="grid axis, minutes")
+    ap.add_argument("--caps", type=str, default=None, help="grid axis, max trades per snapshot ('none' = no cap)")
+    ap.add_argument("--notionals", type=str, default=None, help="grid axis, USD per trade")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--top", type=int, default=20, help="rows in the ranked table")
+    ap.add_argument("--output", type=str, default=None, help="write per-scenario summaries as JSON")
+    ap.add_argument("--check", action="store_true", help="re-run each scenario through simulate_trades and compare")
+    ap.add_argument("--since", type=str, default=None, help="only snapshots at or after this ISO time")
+    ap.add_argument("--until", type=str, default=None, help="only snapshots before this ISO time")
+    args = ap.parse_args()
+
+    grid_axes = (args.min_divs, args.max_prices, args.cooldowns, args.caps, args.notionals)
+    if args.scenarios:
+        scenarios = load_scenarios(Path(args.scenarios))
+    elif any(grid_axes):
+        scenarios = scenario_grid(
+            parse_csv(args.min_divs, sorted({s.min_div for s in DEFAULT_SCENARIOS})),
+            parse_csv(args.max_prices, sorted({s.max_price for s in DEFAULT_SCENARIOS})),
+            parse_csv(args.cooldowns, [COOLDOWN_MINUTES]),
+            parse_csv(args.caps, [MAX_TRADES_PER_SNAPSHOT], int),
+            parse_csv(args.notionals, [TRADE_NOTIONAL]),
+        )
+    else:
+        scenarios = list(DEFAULT_SCENARIOS)
+    if not scenarios:
+        raise SystemExit("no scenarios")
 
-    unique_ids = sorted(set(all_market_ids))
+    store = open_store(LOG_PATH, STORE_DIR, since=args.since, until=args.until)
+    unique_ids = candidate_market_ids(store, scenarios)
     markets = fetch_markets_by_ids(unique_ids) if unique_ids else {}
 
-    summaries = {name: summarize(trades, markets) for name, trades in trades_by_name.items()}
+    t0 = time.perf_counter()
+    summaries = run_scenarios(scenarios, markets, store_dir=store.dir, workers=max(1, args.workers))
+    elapsed = time.perf_counter() - t0
+
+    if args.check:
+        snapshots = load_snapshots(args.since, args.until)
+        for sc, got in zip(scenarios, summaries):
+            ref = simulate_trades(
+                snapshots,
+                min_div=sc.min_div,
+                max_price=sc.max_price,
+                cooldown_minutes=sc.cooldown_minutes,
+                max_trades_per_snapshot=sc.max_trades_per_snapshot,
+                notional=sc.notional,
+            )
+            if summarize(ref, markets) != got:
+                raise SystemExit(f"scenario {sc.name!r}: engine differs from simulate_trades")
+        print(f"check: {len(scenarios)} scenarios match simulate_trades")
 
     # Print summary
     now = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
     print(f"Backtest PnL comparison (run_at={now})")
     print(f"Log: {LOG_PATH}")
-    print(f"Rules: cooldown={COOLDOWN_MINUTES}min, max_trades_per_snapshot={MAX_TRADES_PER_SNAPSHOT}, notional=${TRADE_NOTIONAL:.0f}, side=BUY-YES")
+    print(f"Scenarios: {len(scenarios)} in {elapsed:.2f}s on {max(1, args.workers)} worker(s)")
     print("")
 
-    for name, min_div, max_price in scenarios:
-        s = summaries[name]
-        print(f"=== Scenario: {name} (min_div={min_div:.2f}, max_price={max_price:.2f}) ===")
-        print(f"Trades: {s['trades']}")
-        print(f"Total cost:  {fmt_usd(s['total_cost'])}")
-        print(f"Total value: {fmt_usd(s['total_value'])}")
-        print(f"Total PnL:   {fmt_usd(s['total_pnl'])}")
-        print(f"ROI:         {s['roi']*100:.2f}%")
-        print("Per-market breakdown:")
-        pm = list(s["per_market"].values())
-        pm.sort(key=lambda r: r["pnl"], reverse=True)
-        if not pm:
-            print("  (no trades)")
-        for r in pm:
-            outcome = r.get("outcome")
-            cp = r.get("current_probability")
-            outcome_s = (str(outcome).lower() if outcome is not None else f"prob={cp:.3f}" if cp is not None else "unknown")
-            print(
-                "  - "
-                + r["market_id"]
-                + f" | trades={r['trades']} | cost={fmt_usd(r['cost'])} | value={fmt_usd(r['value'])} | pnl={fmt_usd(r['pnl'])} | avg_fill={r['avg_fill_price']:.4f} | {outcome_s}"
-            )
-            q = (r.get("question") or "").strip()
-            if q:
-                print(f"      {q}")
-        print("")
+    if len(scenarios) <= MAX_DETAILED:
+        for sc, s in zip(scenarios, summaries):
+            print_scenario(sc, s)
+    print_ranked(scenarios, summaries, args.top)
+
+    if args.output:
+        payload = [{"scenario": asdict(sc), "summary": s} for sc, s in zip(scenarios, summaries)]
+        Path(args.output).write_text(json.dumps(payload, indent=2), encoding="utf-8")
+        print(f"Wrote {len(payload)} scenario summaries to {args.output}")
+
+    by_name = {sc.name: s for sc, s in zip(scenarios, summaries)}
+    if "current" not in by_name or "proposed" not in by_name:
+        return
 
     # Conclusion
-    cur = summaries["current"]["total_pnl"]
-    prop = summaries["proposed"]["total_pnl"]
+    cur = by_name["current"]["total_pnl"]
+    prop = by_name["proposed"]["total_pnl"]
     if prop > cur:
         winner = "proposed"
     elif cur > prop:
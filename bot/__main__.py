@@ -0,0 +1,121 @@
+"""`python -m bot <command> [args]`: one entrypoint for every tool.
+
+Only the chosen command's module is imported. The modules keep requests,
+asyncio and dateutil imports inside the functions that make the calls, so
+`--help`, argument errors and the pure-data commands never load them (numpy
+is still imported eagerly by the backtest/store modules that are built on it).
+
+`python -m bot --startup-profile <command> [args]` reruns the command in a
+fresh interpreter under `-X importtime` and prints its wall time (best of
+--repeat, next to a bare interpreter) and the slowest imports.
+
+Usage:
+  python -m bot scan --limit 30
+  python -m bot --startup-profile scan --help
+"""
+
+from __future__ import annotations
+
+import importlib
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# command -> (module, one-line description)
+COMMANDS: Dict[str, Tuple[str, str]] = {
+    "scan": ("bot.scan_weather", "rank weather markets by divergence"),
+    "hourly": ("bot.hourly_log", "log scan + sims + orderbooks to data/sim_log.jsonl"),
+    "paper": ("bot.paper_trade", "place $SIM paper trades"),
+    "optimized": ("bot.optimized_paper_trade", "paper trades with spread/time filters"),
+    "summary": ("bot.daily_summary", "daily digest of paper trades"),
+    "daemon": ("bot.daemon", "run the periodic jobs in one process"),
+    "enrich": ("bot.enrich_orderbook", "top of book and walks for candidates"),
+    "sim-trades": ("bot.sim_trades", "simulated buys for top candidates"),
+    "catalog": ("bot.market_catalog", "query or refresh the local market catalog"),
+    "backtest": ("bot.backtest", "sweep (min_div, max_price) over sim_log"),
+    "historical": ("bot.historical_backtest", "replay the paper-trade rule over sim_log"),
+    "store": ("bot.snapshot_store", "convert/inspect the columnar snapshot store"),
+    "reader": ("bot.snapshot_reader", "stream sim_log rows / benchmark the reader"),
+    "simlog": ("bot.simlog", "migrate/inspect/seal the segmented sim_log"),
+    "index": ("bot.snapshot_index", "look up sim_log rows by market / time range"),
+    "series": ("bot.market_series", "per-market snapshot series, entry timing, cooldown bench"),
+    "books": ("bot.book_recorder", "record and inspect full order books"),
+    "feed": ("bot.book_feed", "streamed local order books (simulate/replay)"),
+    "ladders": ("bot.ladders", "check whole bucket ladders against one batched /books call"),
+    "state": ("bot.state_store", "inspect/export/bench the paper-trade cooldown store"),
+    "questions": ("bot.questions", "parse market questions / inspect the question cache"),
+    "pipeline": ("bot.pipeline", "bench the candidate-selection stages"),
+    "pnl-compare": ("backtest_pnl_compare", "PnL of trade-rule scenarios with cooldown over sim_log"),
+}
+STARTUP_TARGET_MS = 100.0
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def usage() -> str:
+    lines = ["usage: python -m bot [--startup-profile [--repeat N]] <command> [args]", "", "commands:"]
+    lines += [f"  {name:12s} {desc}" for name, (_, desc) in COMMANDS.items()]
+    return "\n".join(lines)
+
+
+def _run(cmd: List[str], env: Dict[str, str]) -> Tuple[float, str]:
+    import subprocess
+
+    t0 = time.perf_counter()
+    p = subprocess.run(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    return time.perf_counter() - t0, p.stderr
+
+
+def startup_profile(argv: List[str], repeat: int = 5, top: int = 15) -> None:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (str(ROOT), env.get("PYTHONPATH")) if p)
+    cmd = [sys.executable, "-m", "bot", *argv]
+    bare = min(_run([sys.executable, "-c", "pass"], env)[0] for _ in range(repeat))
+    wall = min(_run(cmd, env)[0] for _ in range(repeat))
+
+    # -X importtime lines: "import time: self [us] | cumulative | imported package"
+    _, err = _run([sys.executable, "-X", "importtime", *cmd[1:]], env)
+    rows = []
+    for line in err.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cum_us, name = line[len("import time:") :].split("|")
+        rows.append((int(cum_us), int(self_us), name.rstrip()))
+    top_level = [r for r in rows if not r[2].startswith("  ")]
+    total_us = sum(r[0] for r in top_level)
+
+    print(f"command: python -m bot {' '.join(argv)}")
+    print(f"wall (best of {repeat}): {wall * 1000:.1f} ms   bare interpreter: {bare * 1000:.1f} ms")
+    print(f"imports: {len(rows)} modules, {total_us / 1000:.1f} ms (incl. interpreter startup)")
+    verdict = "OK" if wall * 1000 <= STARTUP_TARGET_MS else "over"
+    print(f"target {STARTUP_TARGET_MS:.0f} ms: {verdict}\n")
+    print(f"{'cumulative ms':>13} {'self ms':>8}  module")
+    for cum, self_us, name in sorted(rows, reverse=True)[:top]:
+        print(f"{cum / 1000:13.1f} {self_us / 1000:8.1f}  {name}")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if argv and argv[0] == "--startup-profile":
+        argv = argv[1:]
+        repeat = 5
+        if len(argv) >= 2 and argv[0] == "--repeat":
+            repeat, argv = max(1, int(argv[1])), argv[2:]
+        if not argv:
+            raise SystemExit(usage())
+        startup_profile(argv, repeat=repeat)
+        return
+    if not argv or argv[0] in ("-h", "--help"):
+        print(usage())
+        return
+
+    name, rest = argv[0], argv[1:]
+    if name not in COMMANDS:
+        raise SystemExit(f"unknown command {name!r}\n\n{usage()}")
+    sys.argv = [f"bot {name}", *rest]  # argparse shows "usage: bot <name> ..."
+    importlib.import_module(COMMANDS[name][0]).main()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,21 @@
 """Backtest paper-trade heuristic from hourly JSONL snapshots.
 
-Reads data/sim_log.jsonl written by bot.hourly_log and sweeps:
+Reads the sim_log written by bot.hourly_log (the data/sim_log/ segments, or
+data/sim_log.jsonl before they exist) and sweeps:
 - min_div
 - max_entry_price
+
+The default engine (bot.grid_backtest) evaluates the sweep with array ops over
+the columnar snapshot store and also supports a per-market cooldown and a
+per-snapshot trade cap; `--engine loop` runs the original per-cell loop.
+
+Fills for `--notional` are interpolated from the ask-side cost curve that
+hourly_log records; older rows without one fall back to the closest walk.
+
+The grid engine keeps a checkpoint (bot.backtest_checkpoint), so a rerun only
+reads lines appended since the last one; `--full` forces a rebuild.
+`--since/--until` restrict the sweep to a time range (segments outside it are
+not read; the checkpoint is bypassed).
 """
 
 from __future__ import annotations
@@ -11,10 +24,18 @@ import argparse
 import json
 from pathlib import Path
 
+from .backtest_checkpoint import DEFAULT_CHECKPOINT_PATH, run_incremental
+from .grid_backtest import CITY_CODES, extract_candidates, fill_for_notional, run_grid
+from .questions import parse_question
+from .simlog import default_log_source
+from .snapshot_reader import iter_snapshots
+from .snapshot_store import DEFAULT_STORE_DIR, open_store
+
 
 DEFAULT_SWEEP_DIVS = [0.08, 0.10, 0.12, 0.15, 0.20]
 DEFAULT_SWEEP_PRICES = [0.15, 0.20, 0.25, 0.30, 0.50]
 TRADE_NOTIONAL = 10.0
+TARGET_CITIES = tuple(CITY_CODES)  # ("nyc", "chicago")
 
 
 def safe_float(x):
@@ -37,111 +58,89 @@ def parse_float_csv(raw: str | None, default_vals: list[float]) -> list[float]:
 
 
 def is_target_city(question: str) -> tuple[bool, str | None]:
-    q = (question or "").lower()
-    if ("nyc" in q) or ("new york" in q):
-        return True, "nyc"
-    if "chicago" in q:
-        return True, "chicago"
+    city = parse_question(question or "").city
+    if city in TARGET_CITIES:
+        return True, city
     return False, None
 
 
-def closest_walk_for_notional(walks, target_notional: float):
-    if not isinstance(walks, list) or not walks:
-        return None
-    best = None
-    best_dist = None
-    for w in walks:
-        n = safe_float((w or {}).get("notional"))
-        if n is None:
+def run_backtest(
+    log_path: Path,
+    sweep_divs: list[float],
+    sweep_prices: list[float],
+    notional: float = TRADE_NOTIONAL,
+    since: str | None = None,
+    until: str | None = None,
+):
+    # One streaming pass over the log; every cell adds its picks in file order.
+    cells = [
+        {
+            "min_div": min_div,
+            "max_price": max_price,
+            "trades": 0,
+            "sum_div": 0.0,
+            "sum_fill": 0.0,
+            "sum_edge": 0.0,
+            "total_shares": 0.0,
+            "nyc_count": 0,
+            "chicago_count": 0,
+        }
+        for min_div in sweep_divs
+        for max_price in sweep_prices
+    ]
+
+    for snap in iter_snapshots(log_path, since=since, until=until):
+        picks = snap.get("picks") or []
+        if not isinstance(picks, list):
             continue
-        dist = abs(n - target_notional)
-        if best is None or dist < best_dist:
-            best = w
-            best_dist = dist
-    return best
-
-
-def load_snapshots(log_path: Path):
-    rows = []
-    with log_path.open("r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                rows.append(json.loads(line))
-            except Exception:
+
+        for p in picks:
+            q = p.get("question") or ""
+            city_ok, city = is_target_city(q)
+            if not city_ok:
                 continue
-    return rows
 
+            div = safe_float(p.get("divergence"))
+            simmer_price = safe_float(p.get("simmer_price"))
+            if div is None or simmer_price is None:
+                continue
 
-def run_backtest(log_path: Path, sweep_divs: list[float], sweep_prices: list[float]):
-    snapshots = load_snapshots(log_path)
+            filled = fill_for_notional(p.get("orderbook"), notional)
+            if filled is None:
+                continue
+            fill_price, shares = filled
 
-    results = []
-    for min_div in sweep_divs:
-        for max_price in sweep_prices:
-            trades = 0
-            sum_div = 0.0
-            sum_fill = 0.0
-            sum_edge = 0.0
-            total_shares = 0.0
-            nyc_count = 0
-            chicago_count = 0
-
-            for snap in snapshots:
-                picks = snap.get("picks") or []
-                if not isinstance(picks, list):
+            edge = simmer_price - fill_price
+            for c in cells:
+                if div < c["min_div"]:
                     continue
+                if simmer_price > c["max_price"]:
+                    continue
+                c["trades"] += 1
+                c["sum_div"] += div
+                c["sum_fill"] += fill_price
+                c["sum_edge"] += edge
+                c["total_shares"] += shares
+                if city == "nyc":
+                    c["nyc_count"] += 1
+                elif city == "chicago":
+                    c["chicago_count"] += 1
 
-                for p in picks:
-                    q = p.get("question") or ""
-                    city_ok, city = is_target_city(q)
-                    if not city_ok:
-                        continue
-
-                    div = safe_float(p.get("divergence"))
-                    simmer_price = safe_float(p.get("simmer_price"))
-                    if div is None or simmer_price is None:
-                        continue
-                    if div < min_div:
-                        continue
-                    if simmer_price > max_price:
-                        continue
-
-                    ob = p.get("orderbook") or {}
-                    walks = ob.get("walks") if isinstance(ob, dict) else None
-                    walk = closest_walk_for_notional(walks, TRADE_NOTIONAL)
-                    if not walk:
-                        continue
-                    fill_price = safe_float(walk.get("avg_price"))
-                    shares = safe_float(walk.get("shares"))
-                    if fill_price is None or shares is None:
-                        continue
-
-                    edge = simmer_price - fill_price
-                    trades += 1
-                    sum_div += div
-                    sum_fill += fill_price
-                    sum_edge += edge
-                    total_shares += shares
-                    if city == "nyc":
-                        nyc_count += 1
-                    elif city == "chicago":
-                        chicago_count += 1
-
-            row = {
-                "min_div": min_div,
-                "max_price": max_price,
-                "trades": trades,
-                "avg_divergence": (sum_div / trades) if trades else 0.0,
-                "avg_fill_price": (sum_fill / trades) if trades else 0.0,
-                "avg_edge": (sum_edge / trades) if trades else 0.0,
-                "total_shares": total_shares,
-                "nyc_count": nyc_count,
-                "chicago_count": chicago_count,
-            }
-            results.append(row)
+    results = []
+    for c in cells:
+        trades = c["trades"]
+        row = {
+            "min_div": c["min_div"],
+            "max_price": c["max_price"],
+            "trades": trades,
+            "avg_divergence": (c["sum_div"] / trades) if trades else 0.0,
+            "avg_fill_price": (c["sum_fill"] / trades) if trades else 0.0,
+            "avg_edge": (c["sum_edge"] / trades) if trades else 0.0,
+            "total_shares": c["total_shares"],
+            "nyc_count": c["nyc_count"],
+            "chicago_count": c["chicago_count"],
+        }
+        results.append(row)
 
     return results
 
@@ -178,23 +177,80 @@ def main():
     ap.add_argument("--sweep-divs", type=str, default=None, help="comma-separated min_div values")
     ap.add_argument("--sweep-prices", type=str, default=None, help="comma-separated max_entry_price values")
     ap.add_argument("--output", type=str, default=None, help="results json path")
-    ap.add_argument("--log-path", type=str, default=None, help="input sim_log.jsonl path")
+    ap.add_argument("--log-path", type=str, default=None, help="input sim_log.jsonl or segment directory")
+    ap.add_argument("--since", type=str, default=None, help="only snapshots at or after this ISO time")
+    ap.add_argument("--until", type=str, default=None, help="only snapshots before this ISO time")
+    ap.add_argument("--notional", type=float, default=TRADE_NOTIONAL, help="trade size in USD (fills come from the logged curve)")
+    ap.add_argument("--engine", choices=["grid", "loop"], default="grid")
+    ap.add_argument("--store-dir", type=str, default=None, help="root of the columnar stores (grid engine)")
+    ap.add_argument("--cooldown-min", type=float, default=None, help="per-market cooldown (grid engine)")
+    ap.add_argument("--max-per-snapshot", type=int, default=None, help="max trades per snapshot (grid engine)")
+    ap.add_argument("--check", action="store_true", help="also run the loop engine and require identical results")
+    ap.add_argument("--checkpoint", type=str, default=None, help="incremental checkpoint path (grid engine)")
+    ap.add_argument("--no-checkpoint", action="store_true", help="recompute from the store without a checkpoint")
+    ap.add_argument("--full", action="store_true", help="ignore the checkpoint and rebuild it")
     args = ap.parse_args()
 
     base = Path(__file__).resolve().parent.parent
-    log_path = Path(args.log_path) if args.log_path else (base / "data" / "sim_log.jsonl")
+    log_path = Path(args.log_path) if args.log_path else default_log_source()
     output_path = Path(args.output) if args.output else (base / "data" / "backtest_results.json")
 
     sweep_divs = parse_float_csv(args.sweep_divs, DEFAULT_SWEEP_DIVS)
     sweep_prices = parse_float_csv(args.sweep_prices, DEFAULT_SWEEP_PRICES)
 
-    results = run_backtest(log_path=log_path, sweep_divs=sweep_divs, sweep_prices=sweep_prices)
+    stateful = args.cooldown_min is not None or args.max_per_snapshot is not None
+    if args.engine == "loop" and stateful:
+        raise SystemExit("--cooldown-min/--max-per-snapshot need --engine grid")
+    if args.check and stateful:
+        raise SystemExit("--check compares against the loop engine, which has no cooldown/cap")
+
+    store_dir = Path(args.store_dir) if args.store_dir else DEFAULT_STORE_DIR
+    ranged = {"since": args.since, "until": args.until}
+    if args.engine == "grid" and (args.no_checkpoint or args.since or args.until):
+        store = open_store(log_path, store_dir, **ranged)
+        results = run_grid(
+            extract_candidates(store, args.notional),
+            sweep_divs,
+            sweep_prices,
+            cooldown_minutes=args.cooldown_min,
+            max_trades_per_snapshot=args.max_per_snapshot,
+        )
+    elif args.engine == "grid":
+        results, info = run_incremental(
+            log_path,
+            sweep_divs,
+            sweep_prices,
+            notional=args.notional,
+            cooldown_minutes=args.cooldown_min,
+            max_trades_per_snapshot=args.max_per_snapshot,
+            checkpoint_path=Path(args.checkpoint) if args.checkpoint else DEFAULT_CHECKPOINT_PATH,
+            store_dir=store_dir,
+            full=args.full,
+        )
+        why = f" ({info['reason']})" if info["reason"] else ""
+        print(
+            f"checkpoint: {info['mode']}{why} read {info['read']}, "
+            f"{info['new_snapshots']} new snapshots of {info['snapshots']} in {info['elapsed_s']:.3f}s"
+        )
+    else:
+        results = run_backtest(log_path, sweep_divs, sweep_prices, args.notional, **ranged)
+
+    if args.check and args.engine == "grid":
+        expected = run_backtest(log_path, sweep_divs, sweep_prices, args.notional, **ranged)
+        if json.dumps(results) != json.dumps(expected):
+            raise SystemExit("grid engine results differ from the loop engine")
+        print("check: grid results identical to loop engine")
     print_table(results)
 
     output_path.parent.mkdir(parents=True, exist_ok=True)
     payload = {
         "log_path": str(log_path),
-        "trade_notional": TRADE_NOTIONAL,
+        "since": args.since,
+        "until": args.until,
+        "trade_notional": args.notional,
+        "engine": args.engine,
+        "cooldown_min": args.cooldown_min,
+        "max_per_snapshot": args.max_per_snapshot,
         "sweep_divs": sweep_divs,
         "sweep_prices": sweep_prices,
         "results": results,
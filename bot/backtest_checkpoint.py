@@ -0,0 +1,234 @@
+"""Checkpointed, incremental grid backtest over the append-only sim_log.
+
+hourly_log only ever appends to data/sim_log.jsonl, so a rerun of the sweep
+doesn't need to look at history again. The checkpoint
+(data/backtest_checkpoint.json) records:
+
+- the sweep config (divs, prices, notional, cooldown, cap);
+- how far the log was consumed: byte offset of the end of the last complete
+  line, device/inode, and sha1 of the first and last 4 KiB before the offset;
+- the per-cell `GridState` (raw sums, counts and the cooldown clock).
+
+A rerun reads only bytes past the offset and folds them into the saved state.
+Sums continue the same left-to-right additions, so the rows are identical to a
+full run. If the file was replaced, truncated or rewritten (inode, size or
+fingerprints differ) or the config changed, the state is rebuilt from scratch
+(through the columnar store when the log ends on a newline).
+
+For a segmented log (bot/simlog.py) the checkpoint records the rows consumed
+per segment instead; closed segments never change, so a rerun resumes inside
+the last consumed segment and reads the ones created since.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import mmap
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .grid_backtest import GridState, accumulate, candidates_from_snapshots, extract_candidates, grid_rows
+from .simlog import iter_segmented, source_signature
+from .snapshot_reader import DEFAULT_SKIP, iter_snapshots
+from .snapshot_store import DEFAULT_STORE_DIR, open_store
+
+DEFAULT_CHECKPOINT_PATH = Path(__file__).resolve().parent.parent / "data" / "backtest_checkpoint.json"
+CHECKPOINT_VERSION = 1
+FINGERPRINT_BYTES = 4096
+
+
+def _config(divs, prices, notional, cooldown_minutes, max_trades_per_snapshot) -> Dict[str, Any]:
+    return {
+        "version": CHECKPOINT_VERSION,
+        "sweep_divs": [float(d) for d in divs],
+        "sweep_prices": [float(p) for p in prices],
+        "notional": float(notional),
+        "cooldown_min": cooldown_minutes,
+        "max_per_snapshot": max_trades_per_snapshot,
+    }
+
+
+def _fingerprints(f, offset: int) -> Dict[str, str]:
+    f.seek(0)
+    head = hashlib.sha1(f.read(min(offset, FINGERPRINT_BYTES))).hexdigest()
+    start = max(0, offset - FINGERPRINT_BYTES)
+    f.seek(start)
+    tail = hashlib.sha1(f.read(offset - start)).hexdigest()
+    return {"head": head, "tail": tail}
+
+
+def _complete_lines_end(f, offset: int, size: int) -> int:
+    if size <= offset:
+        return offset
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return mm.rfind(b"\n", offset, size) + 1 or offset
+
+
+def load_checkpoint(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads(Path(path).read_text("utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def save_checkpoint(path: Path, cp: Dict[str, Any]) -> None:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(json.dumps(cp), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _resume_point(cp: Optional[Dict[str, Any]], f, st: os.stat_result, config: Dict[str, Any]) -> Tuple[Optional[str], int]:
+    """(reason to rebuild or None, offset to resume from)."""
+    if not cp:
+        return "no checkpoint", 0
+    if cp.get("config") != config:
+        return "sweep config changed", 0
+    src = cp.get("source") or {}
+    offset = int(src.get("offset") or 0)
+    if (src.get("dev"), src.get("ino")) != (st.st_dev, st.st_ino):
+        return "log file replaced", 0
+    if st.st_size < offset:
+        return "log file truncated", 0
+    if _fingerprints(f, offset) != src.get("fingerprints"):
+        return "log file rewritten", 0
+    return None, offset
+
+
+def run_incremental(
+    log_path: Path,
+    divs: List[float],
+    prices: List[float],
+    *,
+    notional: float,
+    cooldown_minutes: Optional[float] = None,
+    max_trades_per_snapshot: Optional[int] = None,
+    checkpoint_path: Path = DEFAULT_CHECKPOINT_PATH,
+    store_dir: Path = DEFAULT_STORE_DIR,
+    full: bool = False,
+) -> Tuple[List[Dict], Dict[str, Any]]:
+    """Sweep rows for `log_path`, resuming from the checkpoint when it is still valid.
+
+    Returns (rows, info) where info says whether this was a "rebuild" (and
+    why) or an "incremental" run, and how much of the log / how many snapshots
+    were read.
+    """
+    t0 = time.perf_counter()
+    config = _config(divs, prices, notional, cooldown_minutes, max_trades_per_snapshot)
+    kw = {"cooldown_minutes": cooldown_minutes, "max_trades_per_snapshot": max_trades_per_snapshot}
+    cp = None if full else load_checkpoint(checkpoint_path)
+
+    if Path(log_path).is_dir():
+        reason, state, snapshots, new_snapshots, source, read = _run_segments(
+            Path(log_path), cp, config, divs, prices, notional, kw, store_dir, full
+        )
+    else:
+        reason, state, snapshots, new_snapshots, source, read = _run_jsonl(
+            Path(log_path), cp, config, divs, prices, notional, kw, store_dir, full
+        )
+
+    save_checkpoint(
+        checkpoint_path,
+        {
+            "config": config,
+            "source": source,
+            "snapshots": snapshots,
+            "state": state.to_json(),
+            "updated_at": time.time(),
+        },
+    )
+    info = {
+        "mode": "rebuild" if reason is not None else "incremental",
+        "reason": reason,
+        "read": read,
+        "new_snapshots": new_snapshots,
+        "snapshots": snapshots,
+        "elapsed_s": time.perf_counter() - t0,
+    }
+    return grid_rows(state, divs, prices), info
+
+
+def _run_jsonl(log_path: Path, cp, config, divs, prices, notional, kw, store_dir, full):
+    with log_path.open("rb") as f:
+        st = os.fstat(f.fileno())
+        reason, offset = _resume_point(cp, f, st, config)
+        if full:
+            reason = "forced"
+        end = _complete_lines_end(f, offset, st.st_size)  # a partial last line is read next time
+
+        if reason is not None and end == st.st_size and end > 0:
+            # Whole log, ending on a newline: the memory-mapped store gives the same candidates faster.
+            store = open_store(log_path, store_dir)
+            state = accumulate(extract_candidates(store, notional), divs, prices, **kw)
+            snapshots = int(store.meta["snapshots"])
+            new_snapshots = snapshots
+        else:
+            rows = list(iter_snapshots(log_path, start=offset, end=end))
+            first = 0 if reason is not None else int(cp["snapshots"])
+            prev = None if reason is not None else GridState.from_json(cp["state"])
+            state = accumulate(candidates_from_snapshots(rows, notional, first_snap=first), divs, prices, prev, **kw)
+            new_snapshots = len(rows)
+            snapshots = first + new_snapshots
+        fingerprints = _fingerprints(f, end)
+
+    source = {
+        "path": str(log_path),
+        "dev": st.st_dev,
+        "ino": st.st_ino,
+        "offset": end,
+        "fingerprints": fingerprints,
+    }
+    return reason, state, snapshots, new_snapshots, source, f"{end - offset} bytes"
+
+
+def _segment_resume(cp: Optional[Dict[str, Any]], log_dir: Path, config: Dict[str, Any]) -> Tuple[Optional[str], List[List[Any]]]:
+    """(reason to rebuild or None, [[segment, rows consumed], ...] to resume after)."""
+    if not cp:
+        return "no checkpoint", []
+    if cp.get("config") != config:
+        return "sweep config changed", []
+    done = (cp.get("source") or {}).get("segments")
+    if done is None:
+        return "log layout changed", []
+    current = source_signature(log_dir)
+    if [n for n, _ in current[: len(done)]] != [n for n, _ in done]:
+        return "log segments replaced", []
+    for i, ((_, rows), (_, now)) in enumerate(zip(done, current)):
+        if now < rows:
+            return "log segment truncated", []
+        if now != rows and i < len(done) - 1:
+            return "log segment rewritten", []
+    return None, done
+
+
+def _run_segments(log_dir: Path, cp, config, divs, prices, notional, kw, store_dir, full):
+    reason, done = _segment_resume(cp, log_dir, config)
+    if full:
+        reason = "forced"
+    if reason is not None:
+        store = open_store(log_dir, store_dir)
+        state = accumulate(extract_candidates(store, notional), divs, prices, **kw)
+        snapshots = new_snapshots = int(store.meta["snapshots"])
+        consumed = store.meta["source"]["segments"]
+        read = f"{len(consumed)} segments"
+    else:
+        progress: Dict[str, int] = {}
+        resume = dict(done[-1:])
+        rows = list(iter_segmented(log_dir, skip=DEFAULT_SKIP, resume=resume, progress=progress))
+        first = int(cp["snapshots"])
+        prev = GridState.from_json(cp["state"])
+        state = accumulate(candidates_from_snapshots(rows, notional, first_snap=first), divs, prices, prev, **kw)
+        new_snapshots = len(rows)
+        snapshots = first + new_snapshots
+        consumed = [list(x) for x in done]
+        for name, n in progress.items():
+            if consumed and consumed[-1][0] == name:
+                consumed[-1][1] = n
+            else:
+                consumed.append([name, n])
+        read = f"{sum(progress.values()) - sum(resume.values())} rows from {len(progress)} segments"
+    return reason, state, snapshots, new_snapshots, {"path": str(log_dir), "segments": consumed}, read
@@ -0,0 +1,457 @@
+"""Local order books kept current from a streaming feed.
+
+`BookFeed` holds one `LocalBook` per token id and applies feed messages to it,
+so a strategy reads top of book or walk costs from memory instead of calling
+/books per decision. Messages are dicts in the shape of Polymarket's market
+channel, plus a per-token `seq`:
+
+  {"event_type": "book", "asset_id": ..., "seq": n, "timestamp": ms, "bids": [...], "asks": [...]}
+  {"event_type": "price_change", "asset_id": ..., "seq": n, "timestamp": ms,
+   "changes": [{"price": "0.34", "side": "SELL", "size": "120"}, ...]}
+
+A change sets the level's size (side BUY = bids, SELL = asks); size 0 removes
+it. A delta whose seq skips ahead is a gap: the token is marked stale, its
+later deltas are buffered, and `resync` pulls one /books snapshot for every
+stale token (anything with a `books(token_ids)` method: `PolymarketCLOB`, or
+`SimulatedFeed` in tests) and replays the buffered deltas newer than it.
+Snapshots from the real /books carry no seq, so "newer" falls back to the
+message timestamp and the first buffered delta past it re-anchors the seq.
+Messages without a seq are applied as they come (no gap detection).
+
+Resyncs are rate limited per token: a token is fetched again no sooner than
+`resync_interval` seconds after its last fetch, doubling up to
+`resync_backoff_max` while snapshots keep failing to bridge its gap (or the
+/books call itself fails). Stale
+tokens that come due together share one /books call, and their deltas keep
+buffering in between, so a long gap costs a few calls, not one per message.
+
+`OrderBook` is rebuilt lazily, on the first read after a change, so a read of
+an unchanged book costs a dict lookup plus the bisect walk.
+
+Sources: `ReplayFeed` (a JSONL file of messages) and `SimulatedFeed`, a
+random-walk generator with optional dropped messages for exercising resync;
+`polymarket_messages` adapts raw market-channel events for a live socket.
+
+Usage:
+  python -m bot.book_feed simulate --tokens 20 --messages 200000 --drop-rate 0.001
+  python -m bot.book_feed simulate --messages 5000 --write /tmp/feed.jsonl
+  python -m bot.book_feed replay --path /tmp/feed.jsonl
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .polymarket_clob import OrderBook, TopOfBook
+
+
+def safe_float(x):
+    try:
+        return float(x)
+    except Exception:
+        return None
+
+
+class LocalBook:
+    """Price -> size for each side of one token, with the last applied seq."""
+
+    __slots__ = ("token_id", "bids", "asks", "seq", "ts", "updated_at", "_ob")
+
+    def __init__(self, token_id: str):
+        self.token_id = token_id
+        self.bids: Dict[float, float] = {}
+        self.asks: Dict[float, float] = {}
+        self.seq: Optional[int] = None
+        self.ts: Optional[int] = None  # feed timestamp (ms) of the last message
+        self.updated_at = 0.0
+        self._ob: Optional[OrderBook] = None
+
+    def load(self, book: Dict[str, Any], seq: Optional[int]) -> None:
+        ob = OrderBook.from_book(book)
+        self.bids = {p: s for p, s in zip(ob.bid_px, ob.bid_sz) if s > 0}
+        self.asks = {p: s for p, s in zip(ob.ask_px, ob.ask_sz) if s > 0}
+        self.seq = seq
+        self.ts = _int(book.get("timestamp"))
+        self.updated_at = time.time()
+        self._ob = None
+
+    def apply(self, changes: Iterable[Dict[str, Any]], seq: Optional[int], ts: Optional[int]) -> None:
+        for ch in changes:
+            p, s = safe_float(ch.get("price")), safe_float(ch.get("size"))
+            if p is None or s is None or p <= 0:
+                continue
+            side = self.bids if str(ch.get("side")).upper() == "BUY" else self.asks
+            if s > 0:
+                side[p] = s
+            else:
+                side.pop(p, None)
+        self.seq = seq
+        if ts is not None:
+            self.ts = ts
+        self.updated_at = time.time()
+        self._ob = None
+
+    @property
+    def order_book(self) -> OrderBook:
+        if self._ob is None:
+            self._ob = OrderBook(self.bids.items(), self.asks.items(), self.token_id)
+        return self._ob
+
+    def to_book(self) -> Dict[str, Any]:
+        return {
+            "asset_id": self.token_id,
+            "seq": self.seq,
+            "timestamp": self.ts,
+            "bids": [{"price": str(p), "size": str(s)} for p, s in sorted(self.bids.items(), reverse=True)],
+            "asks": [{"price": str(p), "size": str(s)} for p, s in sorted(self.asks.items())],
+        }
+
+
+def _int(x) -> Optional[int]:
+    try:
+        return int(x)
+    except (TypeError, ValueError):
+        return None
+
+
+class BookFeed:
+    """In-memory books for a set of tokens, maintained from feed messages."""
+
+    def __init__(
+        self,
+        snapshots=None,
+        *,
+        max_buffer: int = 10_000,
+        resync_interval: float = 1.0,
+        resync_backoff_max: float = 30.0,
+        clock=time.monotonic,
+    ):
+        self.snapshots = snapshots  # .books(token_ids) -> list of /books dicts
+        self.max_buffer = max_buffer
+        self.resync_interval = resync_interval
+        self.resync_backoff_max = resync_backoff_max
+        self.clock = clock
+        self.books: Dict[str, LocalBook] = {}
+        self.stale: set = set()
+        self._pending: Dict[str, List[Dict[str, Any]]] = {}
+        self._due: Dict[str, float] = {}  # token -> earliest next /books fetch
+        self._failures: Dict[str, int] = {}
+        self._next_check = 0.0  # earliest _due among stale tokens
+        self.last_resync_error: Optional[BaseException] = None
+        self.stats = {
+            "messages": 0,
+            "deltas": 0,
+            "snapshots": 0,
+            "gaps": 0,
+            "resyncs": 0,
+            "resync_tokens": 0,
+            "resync_errors": 0,
+            "stale_reads": 0,
+        }
+
+    def subscribe(self, token_ids: Iterable[str]) -> None:
+        """Start tracking `token_ids`, seeding them from a /books snapshot."""
+        for tid in token_ids:
+            tid = str(tid)
+            if tid not in self.books:
+                self.books[tid] = LocalBook(tid)
+                self.stale.add(tid)
+        self.resync()
+
+    def _gap(self, tid: str, msg: Dict[str, Any]) -> None:
+        if tid not in self.stale:
+            self.stats["gaps"] += 1
+            self.stale.add(tid)
+            self._next_check = min(self._next_check, self._due.get(tid, 0.0))
+        buf = self._pending.setdefault(tid, [])
+        buf.append(msg)
+        if len(buf) > self.max_buffer:
+            del buf[: len(buf) - self.max_buffer]
+
+    def apply(self, msg: Dict[str, Any]) -> None:
+        self.stats["messages"] += 1
+        kind = msg.get("event_type")
+        tid = str(msg.get("asset_id") or "")
+        if not tid:
+            return
+        book = self.books.get(tid)
+        if book is None:
+            book = self.books[tid] = LocalBook(tid)
+        seq = _int(msg.get("seq"))
+
+        if kind == "book":
+            book.load(msg, seq)
+            self.stats["snapshots"] += 1
+            self.stale.discard(tid)
+            self._pending.pop(tid, None)
+            self._failures.pop(tid, None)
+            return
+        if kind != "price_change":
+            return
+        if tid in self.stale or not book.updated_at:  # stale, or never seeded
+            self._gap(tid, msg)
+            return
+        if seq is not None and book.seq is not None:
+            if seq <= book.seq:
+                return  # duplicate / replayed
+            if seq != book.seq + 1:
+                self._gap(tid, msg)
+                return
+        book.apply(msg.get("changes") or [], seq, _int(msg.get("timestamp")))
+        self.stats["deltas"] += 1
+
+    def resync(self, *, force: bool = False) -> int:
+        """One /books call for the stale tokens that are due (all of them with
+        `force`), then replay their buffered deltas. Returns how many tokens
+        are current again. A failing /books call is counted in
+        stats["resync_errors"] (kept in `last_resync_error`), not raised, and
+        its tokens back off as if the snapshot hadn't bridged."""
+        if not self.stale or self.snapshots is None:
+            return 0
+        now = self.clock()
+        if not force and now < self._next_check:
+            return 0
+        tids = sorted(t for t in self.stale if force or self._due.get(t, 0.0) <= now)
+        if tids:
+            try:
+                fixed = self._resync(tids)
+            except Exception as e:
+                # /books failed: the tokens it didn't fix stay stale and back off like a missed bridge
+                self.stats["resync_errors"] += 1
+                self.last_resync_error = e
+                fixed = sum(1 for t in tids if t not in self.stale)
+            for tid in tids:
+                if tid in self.stale:
+                    # no snapshot bridged the gap: back off before fetching it again
+                    n = self._failures[tid] = self._failures.get(tid, 0) + 1
+                    self._due[tid] = now + min(self.resync_backoff_max, self.resync_interval * 2 ** min(n - 1, 16))
+                else:
+                    self._failures.pop(tid, None)
+                    self._due[tid] = now + self.resync_interval
+        else:
+            fixed = 0
+        self._next_check = min((self._due.get(t, 0.0) for t in self.stale), default=float("inf"))
+        return fixed
+
+    def _resync(self, tids: List[str]) -> int:
+        self.stats["resyncs"] += 1
+        self.stats["resync_tokens"] += len(tids)
+        fixed = 0
+        for snap in self.snapshots.books(tids):
+            tid = str((snap or {}).get("asset_id") or (snap or {}).get("token_id") or "")
+            if tid not in self.stale:
+                continue
+            book = self.books[tid]
+            book.load(snap, _int(snap.get("seq")))
+            self.stats["snapshots"] += 1
+            pending = self._pending.pop(tid, [])
+            for i, msg in enumerate(pending):
+                mseq, mts = _int(msg.get("seq")), _int(msg.get("timestamp"))
+                if book.seq is not None and mseq is not None:
+                    if mseq <= book.seq:
+                        continue  # already in the snapshot
+                    if mseq != book.seq + 1:
+                        self._pending[tid] = pending[i:]  # still missing messages past the snapshot
+                        break
+                elif mts is not None and book.ts is not None and mts <= book.ts:
+                    continue  # already in the snapshot
+                book.apply(msg.get("changes") or [], mseq, mts)
+                self.stats["deltas"] += 1
+            else:
+                self.stale.discard(tid)
+                fixed += 1
+        return fixed
+
+    def consume(self, messages: Iterable[Dict[str, Any]], *, resync: bool = True) -> None:
+        """Apply every message, resyncing stale tokens as they come due."""
+        for msg in messages:
+            self.apply(msg)
+            if resync and self.stale:
+                self.resync()
+
+    def order_book(self, token_id: str) -> Optional[OrderBook]:
+        """Current book, or None while the token is unknown or stale."""
+        tid = str(token_id)
+        book = self.books.get(tid)
+        if book is None or tid in self.stale:
+            self.stats["stale_reads"] += 1
+            return None
+        return book.order_book
+
+    def top(self, token_id: str) -> Optional[TopOfBook]:
+        ob = self.order_book(token_id)
+        return ob.top() if ob is not None else None
+
+    def buy(self, token_id: str, notional_usd: float) -> Optional[Tuple[float, float]]:
+        ob = self.order_book(token_id)
+        return ob.buy(notional_usd) if ob is not None else None
+
+    def age(self, token_id: str) -> float:
+        """Seconds since the token's book last changed (inf if never loaded)."""
+        book = self.books.get(str(token_id))
+        return time.time() - book.updated_at if book is not None and book.updated_at else float("inf")
+
+
+def polymarket_messages(events: Any) -> Iterator[Dict[str, Any]]:
+    """Normalise raw market-channel events (a dict or a list of them) into
+    feed messages. `price_change` events that carry several assets are split
+    per asset. The live channel has no seq, so these skip gap detection."""
+    for ev in events if isinstance(events, list) else [events]:
+        if not isinstance(ev, dict):
+            continue
+        kind = ev.get("event_type")
+        if kind == "book":
+            yield ev
+        elif kind == "price_change":
+            by_asset: Dict[str, List[Dict[str, Any]]] = {}
+            for ch in ev.get("price_changes") or ev.get("changes") or []:
+                tid = ch.get("asset_id") or ev.get("asset_id")
+                if tid:
+                    by_asset.setdefault(str(tid), []).append(ch)
+            for tid, changes in by_asset.items():
+                yield {"event_type": "price_change", "asset_id": tid, "timestamp": ev.get("timestamp"), "changes": changes}
+
+
+class ReplayFeed:
+    """Messages from a JSONL file, one per line, in file order."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        with self.path.open("r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    msg = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(msg, dict):
+                    yield msg
+
+
+class SimulatedFeed:
+    """Random-walk books for `n_tokens` tokens that emit price_change messages.
+
+    Each message moves 1-3 levels of one token. `drop_rate` silently drops that
+    fraction of messages (the seq still advances) to produce gaps. `books()`
+    returns the true current books with their seq, so it doubles as the
+    snapshot source for `BookFeed`.
+    """
+
+    def __init__(self, n_tokens: int = 20, *, levels: int = 20, drop_rate: float = 0.0, seed: int = 0):
+        self.rng = random.Random(seed)
+        self.drop_rate = drop_rate
+        self.truth: Dict[str, LocalBook] = {}
+        self.ts = 1_700_000_000_000
+        for i in range(n_tokens):
+            tid = f"sim-{i}"
+            mid = self.rng.randint(100, 900)
+            book = LocalBook(tid)
+            book.bids = {round((mid - k) / 1000, 3): round(self.rng.uniform(5, 500), 2) for k in range(1, levels + 1)}
+            book.asks = {round((mid + k) / 1000, 3): round(self.rng.uniform(5, 500), 2) for k in range(levels)}
+            book.seq = 0
+            book.ts = self.ts
+            self.truth[tid] = book
+        self.token_ids = list(self.truth)
+
+    def books(self, token_ids: List[str]) -> List[Dict[str, Any]]:
+        return [self.truth[str(t)].to_book() for t in token_ids if str(t) in self.truth]
+
+    def messages(self, n: int) -> Iterator[Dict[str, Any]]:
+        rng = self.rng
+        for _ in range(n):
+            book = self.truth[rng.choice(self.token_ids)]
+            self.ts += rng.randint(1, 50)
+            changes = []
+            for _ in range(rng.randint(1, 3)):
+                buy = rng.random() < 0.5
+                side = book.bids if buy else book.asks
+                if side and rng.random() < 0.8:
+                    p = rng.choice(list(side))
+                else:
+                    best = max(book.bids, default=0.5) if buy else min(book.asks, default=0.5)
+                    p = round(best + (-1 if buy else 1) * rng.randint(0, 3) / 1000, 3)
+                    if not 0 < p < 1:
+                        continue
+                s = 0.0 if (p in side and rng.random() < 0.2) else round(rng.uniform(5, 500), 2)
+                changes.append({"price": str(p), "side": "BUY" if buy else "SELL", "size": str(s)})
+            seq = book.seq + 1
+            book.apply(changes, seq, self.ts)
+            if self.drop_rate and rng.random() < self.drop_rate:
+                continue
+            yield {"event_type": "price_change", "asset_id": book.token_id, "seq": seq, "timestamp": self.ts, "changes": changes}
+
+
+def _check(feed: BookFeed, sim: SimulatedFeed) -> int:
+    bad = 0
+    for tid, truth in sim.truth.items():
+        ob = feed.order_book(tid)
+        if ob is None or (feed.books[tid].bids, feed.books[tid].asks) != (truth.bids, truth.asks):
+            bad += 1
+    return bad
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("command", choices=["simulate", "replay"])
+    ap.add_argument("--tokens", type=int, default=20)
+    ap.add_argument("--messages", type=int, default=100_000)
+    ap.add_argument("--drop-rate", type=float, default=0.0)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--write", type=str, default=None, help="simulate: also write the messages as JSONL")
+    ap.add_argument("--path", type=str, default=None, help="replay: JSONL file of messages")
+    ap.add_argument("--resync-interval", type=float, default=1.0, help="min seconds between /books fetches per token")
+    args = ap.parse_args()
+
+    if args.command == "replay":
+        if not args.path:
+            raise SystemExit("replay needs --path")
+        feed = BookFeed()
+        t0 = time.perf_counter()
+        feed.consume(ReplayFeed(Path(args.path)), resync=False)
+        dt = time.perf_counter() - t0
+        print(f"replayed {feed.stats['messages']} messages in {dt:.3f}s; tokens={len(feed.books)} stale={len(feed.stale)} {feed.stats}")
+        return
+
+    sim = SimulatedFeed(args.tokens, drop_rate=args.drop_rate, seed=args.seed)
+    feed = BookFeed(sim, resync_interval=args.resync_interval)
+    feed.subscribe(sim.token_ids)
+    msgs = sim.messages(args.messages)
+    out = None
+    if args.write:
+        out = Path(args.write).open("w", encoding="utf-8")
+        for b in sim.books(sim.token_ids):
+            out.write(json.dumps({"event_type": "book", **b}) + "\n")
+        msgs = (out.write(json.dumps(m) + "\n") and m for m in msgs)
+    t0 = time.perf_counter()
+    feed.consume(msgs)
+    dt = time.perf_counter() - t0
+    feed.resync(force=True)  # gaps near the end may still be waiting out the resync interval
+    if out is not None:
+        out.close()
+    print(f"applied {feed.stats['messages']} messages in {dt:.3f}s ({feed.stats['messages'] / dt:,.0f}/s) {feed.stats}")
+    print(f"books matching the simulator: {len(sim.truth) - _check(feed, sim)}/{len(sim.truth)}")
+
+    tid = sim.token_ids[0]
+    n = 100_000
+    t0 = time.perf_counter()
+    for _ in range(n):
+        feed.top(tid)
+    top_us = (time.perf_counter() - t0) / n * 1e6
+    t0 = time.perf_counter()
+    for _ in range(n):
+        feed.buy(tid, 10.0)
+    buy_us = (time.perf_counter() - t0) / n * 1e6
+    print(f"reads on an unchanged book: top {top_us:.2f} us, buy($10) {buy_us:.2f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,371 @@
+"""Compact recorder for full CLOB order books.
+
+hourly_log keeps only derived stats for its top picks. This records every
+level of every book from `PolymarketCLOB.books` into data/book_log.bin, small
+enough to poll all weather markets every few minutes.
+
+File layout (little-endian): an 8-byte magic, then records. Each record is a
+17-byte header `<B I q H H` (kind, token index, ts in epoch µs, n_bids,
+n_asks) followed by n_bids + n_asks levels of `<H f` (price tick, size):
+
+  TOKEN     kind 0: n_bids is the byte length of the utf-8 token id that
+            follows; defines the next token index (the token dictionary).
+  KEYFRAME  kind 1: the whole book, bids then asks, ascending ticks.
+  DELTA     kind 2: only levels that changed since the token's previous
+            record; size 0 removes the level.
+
+Prices are fixed-point ticks of 1e-4 (Polymarket's finest tick is 0.001) and
+sizes float32, so a level costs 6 bytes instead of ~35 in JSON. A token gets a
+keyframe on its first record, every `keyframe_every` records after that, and
+whenever the delta would not be smaller. Zero-size levels are not stored.
+
+`BookLog` indexes the record headers once (no level decoding) and rebuilds
+any token's book at any timestamp by replaying from the nearest keyframe at
+or before it. A record cut short by a crash is ignored by the reader and
+truncated by the next `BookRecorder` on the same file.
+
+Usage:
+  python -m bot.book_recorder record --interval 300 --iterations 12
+  python -m bot.book_recorder info
+  python -m bot.book_recorder show --token <token_id> --at 2026-02-14T12:00:00Z
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import mmap
+import struct
+import time
+from array import array
+from bisect import bisect_right
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from .polymarket_clob import PolymarketCLOB
+from .snapshot_reader import parse_ts_us
+
+DEFAULT_PATH = Path(__file__).resolve().parent.parent / "data" / "book_log.bin"
+MAGIC = b"PMBOOK1\n"
+PRICE_SCALE = 10_000
+KEYFRAME_EVERY = 32
+
+TOKEN, KEYFRAME, DELTA = 0, 1, 2
+HEADER = struct.Struct("<BIqHH")
+LEVEL = struct.Struct("<Hf")
+
+Side = Dict[int, float]  # price tick -> float32 size
+
+
+def _f32(x: float) -> float:
+    return array("f", [x])[0]
+
+
+def _side(raw: Any) -> Side:
+    out: Side = {}
+    for lvl in raw or []:
+        try:
+            p, s = float(lvl.get("price")), float(lvl.get("size"))
+        except (AttributeError, TypeError, ValueError):
+            continue
+        tick = round(p * PRICE_SCALE)
+        if not 0 < tick <= 0xFFFF or not s > 0:
+            continue
+        out[tick] = _f32(s)
+    return out
+
+
+def _delta(prev: Side, cur: Side) -> Side:
+    out = {t: s for t, s in cur.items() if prev.get(t) != s}
+    out.update((t, 0.0) for t in prev.keys() - cur.keys())
+    return out
+
+
+def _pack(kind: int, token: int, ts: int, bids: Side, asks: Side) -> bytes:
+    parts = [HEADER.pack(kind, token, ts, len(bids), len(asks))]
+    for side in (bids, asks):
+        parts.extend(LEVEL.pack(t, side[t]) for t in sorted(side))
+    return b"".join(parts)
+
+
+def _ts_us(ts: Union[None, int, str, datetime]) -> Optional[int]:
+    if ts is None or isinstance(ts, int):
+        return ts
+    if isinstance(ts, datetime):
+        return int(round(ts.timestamp() * 1_000_000))
+    us = parse_ts_us(ts)
+    if us is None:
+        raise ValueError(f"bad timestamp: {ts!r}")
+    return us
+
+
+def _fmt_price(tick: int) -> str:
+    return f"{tick / PRICE_SCALE:.4f}".rstrip("0").rstrip(".")
+
+
+class BookLog:
+    """Random-access reader over a book_log.bin file."""
+
+    def __init__(self, path: Path = DEFAULT_PATH):
+        self.path = Path(path)
+        self.tokens: List[str] = []
+        self.token_index: Dict[str, int] = {}
+        # per token index: record offsets, timestamps, and the keyframe each record replays from
+        self._offsets: List[array] = []
+        self._ts: List[array] = []
+        self._key: List[array] = []
+        self.records = 0
+        self.keyframes = 0
+        self.end = 0  # end of the last complete record
+        self._data = b""
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with self.path.open("rb") as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):  # missing or empty
+            return
+        if data[: len(MAGIC)] != MAGIC:
+            raise ValueError(f"{self.path}: not a book log")
+        self._data = data
+        pos, size = len(MAGIC), len(data)
+        while pos + HEADER.size <= size:
+            kind, tok, ts, nb, na = HEADER.unpack_from(data, pos)
+            body = nb if kind == TOKEN else (nb + na) * LEVEL.size
+            if pos + HEADER.size + body > size:
+                break
+            if kind == TOKEN:
+                tid = bytes(data[pos + HEADER.size : pos + HEADER.size + nb]).decode("utf-8")
+                self.token_index[tid] = len(self.tokens)
+                self.tokens.append(tid)
+                self._offsets.append(array("q"))
+                self._ts.append(array("q"))
+                self._key.append(array("l"))
+            else:
+                offs = self._offsets[tok]
+                if kind == KEYFRAME:
+                    self.keyframes += 1
+                    key = len(offs)
+                else:
+                    key = self._key[tok][-1]
+                offs.append(pos)
+                self._ts[tok].append(ts)
+                self._key[tok].append(key)
+                self.records += 1
+            pos += HEADER.size + body
+        self.end = pos
+
+    def close(self) -> None:
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+
+    def times(self, token_id: str) -> List[int]:
+        i = self.token_index.get(str(token_id))
+        return [] if i is None else list(self._ts[i])
+
+    def _read(self, off: int) -> Tuple[int, int, List[Tuple[int, float]], List[Tuple[int, float]]]:
+        kind, _, ts, nb, na = HEADER.unpack_from(self._data, off)
+        lv = list(LEVEL.iter_unpack(self._data[off + HEADER.size : off + HEADER.size + (nb + na) * LEVEL.size]))
+        return kind, ts, lv[:nb], lv[nb:]
+
+    def _state(self, tok: int, i: int) -> Tuple[Side, Side]:
+        bids: Side = {}
+        asks: Side = {}
+        for j in range(self._key[tok][i], i + 1):
+            kind, _, b, a = self._read(self._offsets[tok][j])
+            if kind == KEYFRAME:
+                bids, asks = dict(b), dict(a)
+                continue
+            for side, changes in ((bids, b), (asks, a)):
+                for t, s in changes:
+                    if s:
+                        side[t] = s
+                    else:
+                        side.pop(t, None)
+        return bids, asks
+
+    def book_at(self, token_id: str, ts: Union[None, int, str, datetime] = None) -> Optional[Dict[str, Any]]:
+        """The token's book as recorded at or before `ts` (latest if None), in
+        /books shape so `OrderBook.from_book` takes it; None if none yet."""
+        tok = self.token_index.get(str(token_id))
+        if tok is None or not self._ts[tok]:
+            return None
+        us = _ts_us(ts)
+        i = len(self._ts[tok]) - 1 if us is None else bisect_right(self._ts[tok], us) - 1
+        if i < 0:
+            return None
+        bids, asks = self._state(tok, i)
+        return {
+            "asset_id": self.tokens[tok],
+            "timestamp": str(self._ts[tok][i] // 1000),
+            "bids": [{"price": _fmt_price(t), "size": f"{bids[t]:.7g}"} for t in sorted(bids, reverse=True)],
+            "asks": [{"price": _fmt_price(t), "size": f"{asks[t]:.7g}"} for t in sorted(asks)],
+        }
+
+    def history(self, token_id: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """(ts_us, book) for every record of one token, oldest first."""
+        for ts in self.times(token_id):
+            yield ts, self.book_at(token_id, ts)
+
+
+class BookRecorder:
+    """Appends `/books` responses to a book log; reopening continues the deltas."""
+
+    def __init__(self, path: Path = DEFAULT_PATH, *, keyframe_every: int = KEYFRAME_EVERY):
+        self.path = Path(path)
+        self.keyframe_every = max(1, int(keyframe_every))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        log = BookLog(self.path)
+        self.tokens: Dict[str, int] = dict(log.token_index)
+        self._last: Dict[int, Tuple[int, Side, Side, int]] = {}  # token -> (ts, bids, asks, records since keyframe)
+        for tok in range(len(log.tokens)):
+            if log._ts[tok]:
+                i = len(log._ts[tok]) - 1
+                bids, asks = log._state(tok, i)
+                self._last[tok] = (log._ts[tok][i], bids, asks, i - log._key[tok][i])
+        end = log.end
+        log.close()
+        self.f = self.path.open("r+b" if end else "wb")
+        if end:
+            self.f.truncate(end)  # drop a partial record left by a crash
+            self.f.seek(end)
+        else:
+            self.f.write(MAGIC)
+
+    def close(self) -> None:
+        self.f.close()
+
+    def __enter__(self) -> "BookRecorder":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def record(self, books: Iterable[Dict[str, Any]], ts: Union[None, int, str, datetime] = None) -> Dict[str, int]:
+        """Append one snapshot of `books` taken at `ts` (default now). Returns
+        counts and the bytes written next to the size of the same books as JSON."""
+        us = _ts_us(ts)
+        if us is None:
+            us = int(time.time() * 1_000_000)
+        out = bytearray()
+        stats = {"books": 0, "keyframes": 0, "deltas": 0, "bytes": 0, "json_bytes": 0}
+        for b in books:
+            tid = (b or {}).get("asset_id") or (b or {}).get("token_id")
+            if not tid:
+                continue
+            tid = str(tid)
+            stats["books"] += 1
+            stats["json_bytes"] += len(json.dumps(b))
+            tok = self.tokens.get(tid)
+            if tok is None:
+                tok = self.tokens[tid] = len(self.tokens)
+                raw = tid.encode("utf-8")
+                out += HEADER.pack(TOKEN, tok, 0, len(raw), 0) + raw
+            bids, asks = _side(b.get("bids")), _side(b.get("asks"))
+            last = self._last.get(tok)
+            t = us if last is None else max(us, last[0])  # keep each token's timeline sorted
+            db = da = None
+            if last is not None and last[3] + 1 < self.keyframe_every:
+                db, da = _delta(last[1], bids), _delta(last[2], asks)
+                if len(db) + len(da) >= len(bids) + len(asks):
+                    db = da = None
+            if db is None:
+                out += _pack(KEYFRAME, tok, t, bids, asks)
+                stats["keyframes"] += 1
+                since_key = 0
+            else:
+                out += _pack(DELTA, tok, t, db, da)
+                stats["deltas"] += 1
+                since_key = last[3] + 1
+            self._last[tok] = (t, bids, asks, since_key)
+        self.f.write(out)
+        self.f.flush()
+        stats["bytes"] = len(out)
+        return stats
+
+
+def record_weather_books(
+    recorder: BookRecorder,
+    *,
+    limit: int = 200,
+    cities: Optional[List[str]] = None,
+    client=None,
+    clob: Optional[PolymarketCLOB] = None,
+) -> Dict[str, int]:
+    """Record the books of every catalog weather market (optionally only `cities`)."""
+    from .market_catalog import MarketCatalog, weather_markets
+    from .simmer_client import SimmerClient
+
+    cat = MarketCatalog()
+    try:
+        markets = weather_markets(client or SimmerClient(), limit=limit, catalog=cat)
+    finally:
+        cat.close()
+    token_ids = []
+    for m in markets:
+        q = (m.get("question") or "").lower()
+        if cities and not any(c in q for c in cities):
+            continue
+        tid = m.get("polymarket_token_id")
+        if tid and str(tid) not in token_ids:
+            token_ids.append(str(tid))
+    books = (clob or PolymarketCLOB()).books(token_ids) if token_ids else []
+    return recorder.record(books)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("command", choices=["record", "info", "show"])
+    ap.add_argument("--path", type=str, default=None)
+    ap.add_argument("--limit", type=int, default=200, help="record: catalog markets to consider")
+    ap.add_argument("--cities", type=str, default=None, help="record: comma-separated question substrings")
+    ap.add_argument("--interval", type=float, default=300.0, help="record: seconds between snapshots")
+    ap.add_argument("--iterations", type=int, default=1, help="record: snapshots to take (0 = forever)")
+    ap.add_argument("--keyframe-every", type=int, default=KEYFRAME_EVERY)
+    ap.add_argument("--token", type=str, default=None, help="show: token id")
+    ap.add_argument("--at", type=str, default=None, help="show: ISO timestamp (default latest)")
+    args = ap.parse_args()
+
+    path = Path(args.path) if args.path else DEFAULT_PATH
+
+    if args.command == "record":
+        cities = [c.strip().lower() for c in (args.cities or "").split(",") if c.strip()] or None
+        clob = PolymarketCLOB()
+        with BookRecorder(path, keyframe_every=args.keyframe_every) as rec:
+            n = 0
+            while True:
+                st = record_weather_books(rec, limit=args.limit, cities=cities, clob=clob)
+                ratio = st["json_bytes"] / st["bytes"] if st["bytes"] else 0.0
+                print(
+                    f"{datetime.now(timezone.utc).isoformat()} books={st['books']} keyframes={st['keyframes']} "
+                    f"deltas={st['deltas']} bytes={st['bytes']} json_bytes={st['json_bytes']} ({ratio:.1f}x smaller)"
+                )
+                n += 1
+                if args.iterations and n >= args.iterations:
+                    break
+                time.sleep(args.interval)
+        return
+
+    log = BookLog(path)
+    if args.command == "info":
+        size = path.stat().st_size if path.exists() else 0
+        print(f"log={path} bytes={size} tokens={len(log.tokens)} records={log.records} keyframes={log.keyframes}")
+        stamps = [ts for tok in log.tokens for ts in log.times(tok)]
+        if stamps:
+            first = datetime.fromtimestamp(min(stamps) / 1e6, timezone.utc).isoformat()
+            last = datetime.fromtimestamp(max(stamps) / 1e6, timezone.utc).isoformat()
+            print(f"range {first} .. {last}")
+        return
+
+    if not args.token:
+        raise SystemExit("show needs --token")
+    book = log.book_at(args.token, args.at)
+    if book is None:
+        raise SystemExit(f"no book for {args.token} at {args.at or 'latest'}")
+    print(json.dumps(book, indent=2))
+
+
+if __name__ == "__main__":
+    main()
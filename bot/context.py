@@ -0,0 +1,132 @@
+"""Shared clients, caches and state for jobs that run in one process.
+
+Run as separate cron processes, every job builds its own HTTP clients, pulls
+the same market listing and book snapshots, and reopens the paper-trade state.
+`JobContext` is handed to each job's `run_job(args, ctx)` by bot.daemon so
+they share instead:
+
+- one `SimmerClient` and one `PolymarketCLOB` (warm keep-alive pools, one
+  rate-limit bucket, one response cache);
+- the weather market listing, kept in memory for `market_ttl_s` on top of
+  the SQLite catalog;
+- CLOB books per token for `book_ttl_s`, fetched in one /books call for all
+  tokens that are missing or expired;
+- the fee cache, loaded once and saved by the jobs that change it, and one
+  connection to the paper-trade state store (bot.state_store).
+
+A job run without a context (plain `python -m bot.<job>`) builds its own
+clients as before. Everything here is safe to call from worker threads.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+DEFAULT_MARKET_TTL_S = 60.0
+DEFAULT_BOOK_TTL_S = 30.0
+
+
+class JobContext:
+    def __init__(
+        self,
+        *,
+        market_ttl_s: float = DEFAULT_MARKET_TTL_S,
+        book_ttl_s: float = DEFAULT_BOOK_TTL_S,
+        pool_maxsize: int = 8,
+        state_path: Optional[Path] = None,
+    ):
+        self.market_ttl_s = market_ttl_s
+        self.book_ttl_s = book_ttl_s
+        self.pool_maxsize = pool_maxsize
+        self.state_path = state_path
+        self._lock = threading.RLock()
+        self._simmer = None
+        self._clob = None
+        self._fees = None
+        self._state = None
+        self._markets: Optional[tuple] = None  # (fetched_at, limit, markets)
+        self._books: Dict[str, tuple] = {}  # token_id -> (fetched_at, book)
+        self.stats = {"market_hits": 0, "market_misses": 0, "book_hits": 0, "book_misses": 0, "book_calls": 0}
+
+    @property
+    def simmer(self):
+        with self._lock:
+            if self._simmer is None:
+                from .simmer_client import SimmerClient
+
+                self._simmer = SimmerClient(pool_maxsize=self.pool_maxsize)
+            return self._simmer
+
+    @property
+    def clob(self):
+        with self._lock:
+            if self._clob is None:
+                from .polymarket_clob import PolymarketCLOB
+
+                self._clob = PolymarketCLOB(pool_maxsize=self.pool_maxsize)
+            return self._clob
+
+    @property
+    def fees(self):
+        with self._lock:
+            if self._fees is None:
+                from .execution_sim import FeeCache
+
+                self._fees = FeeCache()
+            return self._fees
+
+    @property
+    def state(self):
+        """bot.state_store.PaperStateStore shared by the executors."""
+        with self._lock:
+            if self._state is None:
+                from .state_store import PaperStateStore
+
+                self._state = PaperStateStore(self.state_path)
+            return self._state
+
+    def markets(self, limit: int) -> List[Dict[str, Any]]:
+        """`weather_markets(client, limit=limit)`, reused for `market_ttl_s`.
+
+        The catalog returns listing order, so a fresh listing fetched with a
+        larger limit serves smaller ones as a prefix.
+        """
+        from .market_catalog import weather_markets
+
+        with self._lock:
+            hit = self._markets
+            if hit and time.time() - hit[0] < self.market_ttl_s and hit[1] >= limit:
+                self.stats["market_hits"] += 1
+                return hit[2][:limit]
+            self.stats["market_misses"] += 1
+            n = max(limit, hit[1]) if hit else limit
+            rows = weather_markets(self.simmer, limit=n)
+            self._markets = (time.time(), n, rows)
+            return rows[:limit]
+
+    def books(self, token_ids: List[str]) -> List[Dict[str, Any]]:
+        """/books for `token_ids`; fresh cached books are reused and the rest
+        come from a single request. Unknown tokens are simply absent, including
+        ones whose cached book expired and a refetch no longer returns."""
+        with self._lock:
+            now = time.time()
+            # drop expired books, so closed tokens aren't served and the cache stays bounded
+            for t in [t for t, (at, _) in self._books.items() if now - at >= self.book_ttl_s]:
+                del self._books[t]
+            want = [str(t) for t in token_ids]
+            missing = [t for t in dict.fromkeys(want) if t not in self._books]
+            self.stats["book_hits"] += len(want) - len(missing)
+            self.stats["book_misses"] += len(missing)
+            if missing:
+                self.stats["book_calls"] += 1
+                for b in self.clob.books(missing):
+                    tid = (b or {}).get("asset_id") or (b or {}).get("token_id")
+                    if tid:
+                        self._books[str(tid)] = (now, b)
+            return [self._books[t][1] for t in want if t in self._books]
+
+    def summary(self) -> str:
+        return " ".join(f"{k}={v}" for k, v in self.stats.items())
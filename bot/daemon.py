@@ -0,0 +1,188 @@
+"""Run the periodic jobs inside one long-lived process.
+
+Instead of one cron process per job, `python -m bot.daemon` schedules
+hourly_log, paper_trade, optimized_paper_trade and daily_summary on their own
+intervals and hands each run the same `JobContext` (bot.context): warm HTTP
+pools, one rate-limit bucket, and short-lived market/book caches, so running
+a job more often, or several jobs in the same minute, costs at most one
+listing and one /books call per cache TTL.
+
+Jobs run one at a time. A job that raises (or exits) is logged with its
+traceback and retried after `retry_s`, doubling per consecutive failure up to
+its interval; the other jobs keep their schedule. SIGINT/SIGTERM stop the
+loop after the current job.
+
+Config (`--config file.json`) replaces the default job list:
+
+  {"market_ttl_s": 60, "book_ttl_s": 30,
+   "jobs": [{"name": "hourly_log", "every_s": 900, "args": ["--calibrate-rate", "0.05"]},
+            {"name": "daily_summary", "every_s": 86400, "delay_s": 3600}]}
+
+`args` are the job's own command-line flags.
+
+Usage:
+  python -m bot.daemon
+  python -m bot.daemon --jobs hourly_log,paper_trade --every hourly_log=900
+  python -m bot.daemon --once
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib
+import json
+import signal
+import threading
+import time
+import traceback
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .context import DEFAULT_BOOK_TTL_S, DEFAULT_MARKET_TTL_S, JobContext
+
+# job name -> module exposing build_parser() and run_job(args, ctx)
+JOB_MODULES = {
+    "hourly_log": "bot.hourly_log",
+    "paper_trade": "bot.paper_trade",
+    "optimized_paper_trade": "bot.optimized_paper_trade",
+    "daily_summary": "bot.daily_summary",
+}
+
+DEFAULT_JOBS: List[Dict[str, Any]] = [
+    {"name": "hourly_log", "every_s": 3600},
+    {"name": "paper_trade", "every_s": 3600},
+    {"name": "optimized_paper_trade", "every_s": 3600},
+    {"name": "daily_summary", "every_s": 86400},
+]
+DEFAULT_RETRY_S = 60.0
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds").replace("+00:00", "Z")
+
+
+@dataclass
+class Job:
+    name: str
+    every_s: float
+    args: List[str] = field(default_factory=list)
+    delay_s: float = 0.0
+    next_at: float = 0.0
+    runs: int = 0
+    failures: int = 0  # consecutive
+    last_error: Optional[str] = None
+
+    def run(self, ctx: JobContext) -> None:
+        mod = importlib.import_module(JOB_MODULES[self.name])
+        mod.run_job(mod.build_parser().parse_args(self.args), ctx)
+
+
+def load_jobs(config: Dict[str, Any]) -> List[Job]:
+    jobs = []
+    for spec in config.get("jobs") or DEFAULT_JOBS:
+        name = spec.get("name")
+        if name not in JOB_MODULES:
+            raise SystemExit(f"unknown job {name!r}; known: {', '.join(JOB_MODULES)}")
+        jobs.append(
+            Job(
+                name=name,
+                every_s=float(spec.get("every_s") or 3600),
+                args=[str(a) for a in spec.get("args") or []],
+                delay_s=float(spec.get("delay_s") or 0),
+            )
+        )
+    return jobs
+
+
+class Daemon:
+    def __init__(self, jobs: List[Job], ctx: JobContext, *, retry_s: float = DEFAULT_RETRY_S):
+        self.jobs = jobs
+        self.ctx = ctx
+        self.retry_s = retry_s
+        self.stop = threading.Event()
+
+    def run_one(self, job: Job) -> bool:
+        t0 = time.perf_counter()
+        print(f"[{_now()}] {job.name}: start", flush=True)
+        try:
+            job.run(self.ctx)
+        except (Exception, SystemExit) as e:
+            job.failures += 1
+            job.last_error = f"{type(e).__name__}: {e}"
+            print(f"[{_now()}] {job.name}: FAILED after {time.perf_counter() - t0:.1f}s ({job.last_error})", flush=True)
+            traceback.print_exc()
+            return False
+        job.runs += 1
+        job.failures = 0
+        job.last_error = None
+        print(f"[{_now()}] {job.name}: ok in {time.perf_counter() - t0:.1f}s; ctx {self.ctx.summary()}", flush=True)
+        return True
+
+    def run_forever(self) -> None:
+        start = time.monotonic()
+        for job in self.jobs:
+            job.next_at = start + job.delay_s
+        while not self.stop.is_set():
+            job = min(self.jobs, key=lambda j: j.next_at)
+            wait = job.next_at - time.monotonic()
+            if wait > 0:
+                self.stop.wait(wait)
+                continue
+            ok = self.run_one(job)
+            now = time.monotonic()
+            if ok:
+                # keep the cadence, but don't replay runs missed while a job was slow
+                job.next_at = max(job.next_at + job.every_s, now)
+            else:
+                job.next_at = now + min(job.every_s, self.retry_s * 2 ** (job.failures - 1))
+
+    def run_once(self) -> int:
+        return sum(not self.run_one(job) for job in self.jobs)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--config", type=str, default=None, help="JSON job config (see module docstring)")
+    ap.add_argument("--jobs", type=str, default=None, help="comma-separated subset of jobs to run")
+    ap.add_argument("--every", action="append", default=[], metavar="JOB=SECONDS", help="override a job's interval")
+    ap.add_argument("--once", action="store_true", help="run each job once and exit (non-zero if any failed)")
+    ap.add_argument("--retry-s", type=float, default=DEFAULT_RETRY_S)
+    ap.add_argument("--market-ttl-s", type=float, default=None)
+    ap.add_argument("--book-ttl-s", type=float, default=None)
+    args = ap.parse_args()
+
+    config = json.loads(Path(args.config).read_text("utf-8")) if args.config else {}
+    jobs = load_jobs(config)
+    if args.jobs:
+        keep = [j.strip() for j in args.jobs.split(",") if j.strip()]
+        jobs = [j for j in jobs if j.name in keep]
+    for override in args.every:
+        name, _, secs = override.partition("=")
+        for j in jobs:
+            if j.name == name.strip():
+                j.every_s = float(secs)
+    if not jobs:
+        raise SystemExit("no jobs to run")
+
+    ctx = JobContext(
+        market_ttl_s=args.market_ttl_s if args.market_ttl_s is not None else float(config.get("market_ttl_s", DEFAULT_MARKET_TTL_S)),
+        book_ttl_s=args.book_ttl_s if args.book_ttl_s is not None else float(config.get("book_ttl_s", DEFAULT_BOOK_TTL_S)),
+    )
+    daemon = Daemon(jobs, ctx, retry_s=args.retry_s)
+    if args.once:
+        raise SystemExit(1 if daemon.run_once() else 0)
+
+    def _stop(signum, frame):
+        print(f"[{_now()}] signal {signum}: stopping after the current job", flush=True)
+        daemon.stop.set()
+
+    signal.signal(signal.SIGINT, _stop)
+    signal.signal(signal.SIGTERM, _stop)
+    print(f"[{_now()}] daemon: " + ", ".join(f"{j.name} every {j.every_s:g}s" for j in jobs), flush=True)
+    daemon.run_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -12,8 +12,6 @@ from __future__ import annotations
 import argparse
 from datetime import datetime, timezone
 
-from .simmer_client import SimmerClient
-
 
 def safe_float(x):
     try:
@@ -22,14 +20,18 @@ def safe_float(x):
         return 0.0
 
 
-def main():
+def build_parser() -> argparse.ArgumentParser:
     ap = argparse.ArgumentParser()
     ap.add_argument("--limit", type=int, default=50)
     ap.add_argument("--venue", type=str, default="simmer", help="simmer|polymarket|kalshi (or empty for all)")
     ap.add_argument("--source", type=str, default="sdk:weather:paper", help="filter to our paper-trade source tag")
-    args = ap.parse_args()
+    return ap
+
+
+def run_job(args, ctx=None):
+    from .simmer_client import SimmerClient
 
-    c = SimmerClient()
+    c = ctx.simmer if ctx else SimmerClient()
     me = c.me()
 
     venue = args.venue.strip() if args.venue else None
@@ -57,5 +59,9 @@ def main():
         print(f"- {created} {action} {side} shares={shares} cost={cost} :: {q}")
 
 
+def main():
+    run_job(build_parser().parse_args())
+
+
 if __name__ == "__main__":
     main()
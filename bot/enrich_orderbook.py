@@ -12,8 +12,9 @@ from __future__ import annotations
 import argparse
 from datetime import datetime, timezone
 
-from .simmer_client import SimmerClient
-from .polymarket_clob import PolymarketCLOB, best_bid_ask_from_book, walk_cost_from_asks
+from .simmer_client import AsyncSimmerClient
+from .market_catalog import weather_markets
+from .polymarket_clob import AsyncPolymarketCLOB, OrderBook
 
 
 def safe_float(x):
@@ -23,16 +24,11 @@ def safe_float(x):
         return None
 
 
-def main():
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--limit", type=int, default=50)
-    ap.add_argument("--min-div", type=float, default=0.02)
-    ap.add_argument("--cities", type=str, default="nyc,new york,chicago")
-    ap.add_argument("--notionals", type=str, default="2,5,10")
-    ap.add_argument("--top", type=int, default=5)
-    args = ap.parse_args()
+async def run(args):
+    import asyncio
+
+    from .pipeline import ByAbsDivergence, CityTerms, HasToken, MarketFrame, MinAbsDivergence, Pipeline, split_terms
 
-    city_terms = [c.strip().lower() for c in (args.cities or "").split(",") if c.strip()]
     notionals = []
     for p in (args.notionals or "").split(","):
         p = p.strip()
@@ -45,45 +41,35 @@ def main():
     if not notionals:
         notionals = [2.0, 5.0, 10.0]
 
-    c = SimmerClient()
-    data = c.list_markets(tags="weather", limit=args.limit)
-    markets = data.get("markets", [])
-
-    cands = []
-    for m in markets:
-        q = (m.get("question") or "").strip()
-        if city_terms:
-            q_l = q.lower()
-            if not any(t in q_l for t in city_terms):
-                continue
-        div = safe_float(m.get("divergence"))
-        if div is None or abs(div) < args.min_div:
-            continue
-        token_id = m.get("polymarket_token_id")
-        if not token_id:
-            continue
-        cands.append(
-            {
-                "id": m.get("id"),
-                "question": q,
-                "div": div,
-                "price": safe_float(m.get("current_probability")),
-                "url": m.get("url"),
-                "token_id": str(token_id),
-            }
-        )
-
-    cands.sort(key=lambda r: abs(r["div"]), reverse=True)
-    cands = cands[: max(0, args.top)]
-
-    clob = PolymarketCLOB()
-    books = clob.books([x["token_id"] for x in cands])
+    c = AsyncSimmerClient(max_concurrency=args.concurrency)
+    markets = await asyncio.to_thread(weather_markets, c.client, limit=args.limit)
+
+    frame = MarketFrame(markets)
+    pipe = Pipeline(
+        [CityTerms(split_terms(args.cities)), MinAbsDivergence(args.min_div), HasToken()],
+        rank=ByAbsDivergence(),
+        top=args.top,
+    )
+    cands = [
+        {
+            "id": frame.ids[i],
+            "question": frame.questions[i],
+            "div": float(frame.divergence[i]),
+            "price": safe_float(markets[i].get("current_probability")),
+            "url": markets[i].get("url"),
+            "token_id": frame.token_ids[i],
+        }
+        for i in pipe.select(frame)
+    ]
+
+    clob = AsyncPolymarketCLOB(max_concurrency=args.concurrency)
+    books = await clob.books([x["token_id"] for x in cands])
     # books are in same order as request per docs, but be defensive with token_id key
     by_tid = {}
     for b in books:
-        tid = str(b.get("asset_id") or b.get("token_id") or "")
-        if tid:
-            by_tid[tid] = b
+        ob = OrderBook.from_book(b)
+        if ob.token_id:
+            by_tid[ob.token_id] = ob
 
     now = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
     print(f"enrich_at={now} candidates={len(cands)}")
@@ -98,13 +84,8 @@ def main():
         if not book:
             print("  orderbook: MISSING")
             continue
-        tob = best_bid_ask_from_book(book)
-        spread = None
-        if tob.best_bid is not None and tob.best_ask is not None:
-            spread = tob.best_ask - tob.best_bid
-        print(f"  tob bid={tob.best_bid} ask={tob.best_ask} spread={spread}")
-        for n in notionals:
-            walked = walk_cost_from_asks(book, n)
+        print(f"  tob bid={book.best_bid} ask={book.best_ask} spread={book.spread}")
+        for n, walked in zip(notionals, book.buy_many(notionals)):
             if not walked:
                 print(f"    walk ${n}: unavailable")
                 continue
@@ -112,5 +93,21 @@ def main():
             print(f"    walk ${n}: avg_price={avg_price:.4f} shares={shares:.2f}")
 
 
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--limit", type=int, default=50)
+    ap.add_argument("--min-div", type=float, default=0.02)
+    ap.add_argument("--cities", type=str, default="nyc,new york,chicago")
+    ap.add_argument("--notionals", type=str, default="2,5,10")
+    ap.add_argument("--top", type=int, default=5)
+    ap.add_argument("--concurrency", type=int, default=4, help="max in-flight /books requests")
+    args = ap.parse_args()
+    args.concurrency = max(1, args.concurrency)
+
+    import asyncio
+
+    asyncio.run(run(args))
+
+
 if __name__ == "__main__":
     main()
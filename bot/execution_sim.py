@@ -0,0 +1,115 @@
+"""Local execution simulator for Polymarket buys.
+
+Answers the same question as `SimmerClient.dry_run_trade` (shares, cost, fee)
+for any list of notionals from a single CLOB book, with no API call. The
+remote dry-run is only needed as an occasional calibration sample; its
+`fee_rate_bps` is cached per market in data/fee_cache.json.
+
+Fee model: the taker fee is taken out of the notional before walking the asks,
+so `est_shares` is what `amount * (1 - bps/10000)` buys.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import random
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+from .polymarket_clob import OrderBook
+
+DEFAULT_FEE_CACHE_PATH = Path(__file__).resolve().parent.parent / "data" / "fee_cache.json"
+DEFAULT_FEE_TTL_S = 7 * 24 * 3600
+
+
+class FeeCache:
+    """market_id -> fee_rate_bps as last reported by a remote dry-run."""
+
+    def __init__(self, path: Optional[Path] = None, ttl_s: float = DEFAULT_FEE_TTL_S):
+        self.path = Path(path or DEFAULT_FEE_CACHE_PATH)
+        self.ttl_s = ttl_s
+        self.entries: Dict[str, Dict[str, float]] = {}
+        if self.path.exists():
+            try:
+                self.entries = json.loads(self.path.read_text("utf-8"))
+            except Exception:
+                self.entries = {}
+
+    def get(self, market_id: str) -> Optional[float]:
+        e = self.entries.get(market_id)
+        if not e or time.time() - e.get("ts", 0) > self.ttl_s:
+            return None
+        return e.get("bps")
+
+    def set(self, market_id: str, bps: Any) -> None:
+        try:
+            self.entries[market_id] = {"bps": float(bps), "ts": time.time()}
+        except (TypeError, ValueError):
+            pass
+
+    def save(self) -> None:
+        now = time.time()
+        self.entries = {k: v for k, v in self.entries.items() if now - v.get("ts", 0) <= self.ttl_s}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp.write_text(json.dumps(self.entries, indent=2), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+
+def simulate_buys(
+    book: Union[Dict[str, Any], OrderBook], notionals: List[float], fee_rate_bps: Optional[float] = None
+) -> List[Dict[str, Any]]:
+    """Dry-run shaped results (`amount`, `fee_rate_bps`, `est_shares`, `cost`) per notional.
+
+    `cost` is the USD actually spent, which is less than `amount` when the
+    book runs out of depth. Returns est_shares=None if the book has no asks.
+    """
+    ob = book if isinstance(book, OrderBook) else OrderBook.from_book(book)
+    keep = 1.0 - float(fee_rate_bps or 0.0) / 10000.0
+    out = []
+    for amt in notionals:
+        walked = ob.buy(float(amt) * keep)
+        if walked:
+            avg_price, shares = walked
+            cost = avg_price * shares / keep
+        else:
+            shares, cost = None, None
+        out.append({"amount": amt, "fee_rate_bps": fee_rate_bps, "est_shares": shares, "cost": cost, "source": "local"})
+    return out
+
+
+def sims_from_dry_run(amount: float, res: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalise a remote dry-run response to the same shape as `simulate_buys`."""
+    return {
+        "amount": amount,
+        "fee_rate_bps": res.get("fee_rate_bps"),
+        "est_shares": res.get("shares_bought") or res.get("shares") or res.get("estimated_shares"),
+        "cost": res.get("cost") or res.get("amount"),
+        "source": "dry_run",
+    }
+
+
+def should_calibrate(rate: float) -> bool:
+    return rate > 0 and random.random() < rate
+
+
+def calibration_record(market_id: str, local: Dict[str, Any], remote: Dict[str, Any]) -> Dict[str, Any]:
+    """Compare a local fill estimate to the remote dry-run for the same order."""
+    ls = local.get("est_shares")
+    rs = remote.get("est_shares")
+    err = None
+    try:
+        if ls is not None and rs:
+            err = (float(ls) - float(rs)) / float(rs)
+    except (TypeError, ValueError):
+        err = None
+    return {
+        "market_id": market_id,
+        "amount": local.get("amount"),
+        "local_shares": ls,
+        "remote_shares": rs,
+        "rel_error": err,
+        "fee_rate_bps": remote.get("fee_rate_bps"),
+    }
@@ -0,0 +1,471 @@
+"""Vectorized (min_div, max_price) grid backtest over the columnar snapshot store.
+
+`bot.backtest.run_backtest` rescans every pick once per grid cell. Here the
+candidate picks are pulled out of the store once (city, divergence,
+simmer_price and the walk closest to the trade notional) and the whole sweep
+is evaluated with array ops:
+
+- trade and per-city counts come from candidates sorted by divergence plus
+  one cumulative sum per price threshold (a searchsorted per min_div);
+- float sums are masked cumulative sums in file order, so they add the same
+  numbers in the same order as the loop and match it bit for bit;
+- with a cooldown and/or a per-snapshot cap, `select_trades` is the cooldown
+  state machine with every grid cell advanced together, pick by pick;
+  `accumulate` uses its per-market equivalent in bot.market_series.
+
+`accumulate` folds candidates into a `GridState` (raw per-cell sums and the
+cooldown clock), so a later batch of picks can be folded into a saved state
+with the same result as one pass over everything; see bot.backtest_checkpoint.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from .polymarket_clob import curve_fill
+from .questions import parse_question
+from .snapshot_store import SnapshotStore, parse_ts_us
+
+CITY_CODES = {"nyc": 0, "chicago": 1}
+NO_TS = np.iinfo(np.int64).min
+NEVER_TRADED = NO_TS // 2
+# Upper bound on cells x candidates materialised at once for masked sums.
+BLOCK_ELEMS = 4_000_000
+
+
+def safe_float(x):
+    try:
+        return float(x)
+    except Exception:
+        return None
+
+
+def _f(x) -> float:
+    v = safe_float(x)
+    return np.nan if v is None else v
+
+
+def city_code(question: str) -> int:
+    """Same city rules as bot.backtest.is_target_city, as a CITY_CODES value (-1 = other)."""
+    return CITY_CODES.get(parse_question(question or "").city, -1)
+
+
+@dataclass
+class Candidates:
+    """Picks that can trade in some grid cell, in log order."""
+
+    snap: np.ndarray
+    ts: np.ndarray
+    market: np.ndarray  # index into market_ids, -1 if missing
+    city: np.ndarray
+    divergence: np.ndarray
+    simmer_price: np.ndarray
+    fill_price: np.ndarray
+    shares: np.ndarray
+    market_ids: List[str] = field(default_factory=list)
+    question: Optional[np.ndarray] = None  # index into questions
+    questions: List[str] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.divergence)
+
+    @property
+    def edge(self) -> np.ndarray:
+        return self.simmer_price - self.fill_price
+
+    def take(self, idx: np.ndarray) -> "Candidates":
+        """Rows `idx` (a permutation or subset), keeping the string dictionaries."""
+        cols = ("snap", "ts", "market", "city", "divergence", "simmer_price", "fill_price", "shares")
+        out = {k: getattr(self, k)[idx] for k in cols}
+        question = None if self.question is None else self.question[idx]
+        return Candidates(**out, market_ids=self.market_ids, question=question, questions=self.questions)
+
+
+def fill_for_notional(ob: Any, target_notional: float):
+    """(fill_price, shares) for one logged orderbook: exact from its cost curve
+    when the row has one, else the sampled walk closest to `target_notional`."""
+    if not isinstance(ob, dict):
+        return None
+    curve = ob.get("curve")
+    if isinstance(curve, dict):
+        return curve_fill(curve, target_notional)
+    walks = ob.get("walks")
+    if not isinstance(walks, list) or not walks:
+        return None
+    best, best_dist = None, None
+    for w in walks:
+        n = safe_float((w or {}).get("notional"))
+        if n is None:
+            continue
+        if best is None or abs(n - target_notional) < best_dist:
+            best, best_dist = w, abs(n - target_notional)
+    if not best:
+        return None
+    fill, shares = safe_float(best.get("avg_price")), safe_float(best.get("shares"))
+    if fill is None or shares is None:
+        return None
+    return fill, shares
+
+
+def curve_fills(store: SnapshotStore, notional: float):
+    """(fill_price, shares, has_curve) per row from the logged cost curves, vectorized.
+
+    Same arithmetic as `polymarket_clob.curve_fill`, so results match it bit
+    for bit; NaN where a row has no curve or the notional is past a cut curve.
+    """
+    n_rows = len(store)
+    state = np.asarray(store["curve_state"])
+    off = np.asarray(store["curve_offsets"])
+    cn = np.asarray(store["curve_notional"])
+    cs = np.asarray(store["curve_shares"])
+    fill = np.full(n_rows, np.nan)
+    shares = np.full(n_rows, np.nan)
+    has = state >= 0
+    counts = np.diff(off)
+    rows = np.flatnonzero(has & (counts > 0))
+    if notional <= 0 or len(rows) == 0:
+        return fill, shares, has
+
+    # breakpoints <= notional per row (each row's curve is ascending)
+    le = np.concatenate([[0], np.cumsum(cn <= notional)])
+    start, end = off[rows], off[rows + 1]
+    k = le[end] - le[start]
+    inside = k < counts[rows]
+    prev = start + k - 1
+    n0 = np.where(k > 0, cn[np.maximum(prev, 0)], 0.0)
+    s0 = np.where(k > 0, cs[np.maximum(prev, 0)], 0.0)
+    nxt = np.minimum(start + k, len(cn) - 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        interp = s0 + (notional - n0) * (cs[nxt] - s0) / (cn[nxt] - n0)
+    last = end - 1
+    full = ~inside & (state[rows] == 1)
+    spent = np.where(inside, float(notional), np.where(full, cn[last], np.nan))
+    got = np.where(inside, interp, np.where(full, cs[last], np.nan))
+    ok = (got > 0) & (spent > 0)
+    fill[rows] = np.where(ok, spent / np.where(ok, got, 1.0), np.nan)
+    shares[rows] = np.where(ok, got, np.nan)
+    return fill, shares, has
+
+
+def closest_walk(store: SnapshotStore, target_notional: float):
+    """(fill_price, shares) per row from the walk nearest `target_notional` (first one on ties)."""
+    n = len(store)
+    notional = np.asarray(store["walk_notional"])
+    if notional.size == 0:
+        nan = np.full(n, np.nan)
+        return nan, nan.copy()
+    dist = np.abs(notional - target_notional)
+    dist[np.isnan(dist)] = np.inf
+    idx = np.argmin(dist, axis=1)
+    rows = np.arange(n)
+    found = np.isfinite(dist[rows, idx])
+    fill = np.where(found, np.asarray(store["walk_avg_price"])[rows, idx], np.nan)
+    shares = np.where(found, np.asarray(store["walk_shares"])[rows, idx], np.nan)
+    return fill, shares
+
+
+def extract_candidates(store: SnapshotStore, notional: float) -> Candidates:
+    q_city = np.array([city_code(q) for q in store.questions] or [-1], dtype=np.int8)
+    city = q_city[np.asarray(store["question"])] if len(store) else np.zeros(0, dtype=np.int8)
+    div = np.asarray(store["divergence"])
+    price = np.asarray(store["simmer_price"])
+    fill, shares = closest_walk(store, notional)
+    c_fill, c_shares, has_curve = curve_fills(store, notional)
+    fill = np.where(has_curve, c_fill, fill)
+    shares = np.where(has_curve, c_shares, shares)
+    keep = (city >= 0) & ~np.isnan(div) & ~np.isnan(price) & ~np.isnan(fill) & ~np.isnan(shares)
+    return Candidates(
+        snap=np.asarray(store["snap"])[keep],
+        ts=np.asarray(store["ts"])[keep],
+        market=np.asarray(store["market"])[keep],
+        city=city[keep],
+        divergence=div[keep],
+        simmer_price=price[keep],
+        fill_price=fill[keep],
+        shares=shares[keep],
+        market_ids=store.markets,
+        question=np.asarray(store["question"])[keep],
+        questions=store.questions,
+    )
+
+
+def candidates_from_snapshots(snapshots: Iterable[Dict[str, Any]], notional: float, *, first_snap: int = 0) -> Candidates:
+    """Candidates from already parsed sim_log rows, numbering snapshots from `first_snap`."""
+    market_ids: Dict[str, int] = {}
+    questions: Dict[str, int] = {}
+    cols: Dict[str, List[Any]] = {
+        k: [] for k in ("snap", "ts", "market", "question", "city", "divergence", "simmer_price", "fill", "shares")
+    }
+    snap_idx = first_snap - 1
+    for snap in snapshots:
+        snap_idx += 1
+        ts = parse_ts_us(snap.get("ts"))
+        picks = snap.get("picks") or []
+        if not isinstance(picks, list):
+            continue
+        for p in picks:
+            if not isinstance(p, dict):
+                continue
+            q = p.get("question") or ""
+            city = city_code(q)
+            div = _f(p.get("divergence"))
+            price = _f(p.get("simmer_price"))
+            if city < 0 or np.isnan(div) or np.isnan(price):
+                continue
+            filled = fill_for_notional(p.get("orderbook"), notional)
+            if filled is None or np.isnan(filled[0]) or np.isnan(filled[1]):
+                continue
+            fill, shares = filled
+            mid = p.get("market_id")
+            cols["snap"].append(snap_idx)
+            cols["ts"].append(NO_TS if ts is None else ts)
+            cols["market"].append(market_ids.setdefault(mid, len(market_ids)) if mid else -1)
+            cols["question"].append(questions.setdefault(q, len(questions)))
+            cols["city"].append(city)
+            cols["divergence"].append(div)
+            cols["simmer_price"].append(price)
+            cols["fill"].append(fill)
+            cols["shares"].append(shares)
+    return Candidates(
+        snap=np.asarray(cols["snap"], dtype=np.int32),
+        ts=np.asarray(cols["ts"], dtype=np.int64),
+        market=np.asarray(cols["market"], dtype=np.int32),
+        city=np.asarray(cols["city"], dtype=np.int8),
+        divergence=np.asarray(cols["divergence"], dtype=np.float64),
+        simmer_price=np.asarray(cols["simmer_price"], dtype=np.float64),
+        fill_price=np.asarray(cols["fill"], dtype=np.float64),
+        shares=np.asarray(cols["shares"], dtype=np.float64),
+        market_ids=sorted(market_ids, key=market_ids.get),
+        question=np.asarray(cols["question"], dtype=np.int32),
+        questions=sorted(questions, key=questions.get),
+    )
+
+
+@dataclass
+class GridState:
+    """Per-cell running aggregates (cells divs-major), plus the cooldown clock.
+
+    Sums are kept raw, not averaged, so folding more picks in continues the
+    same left-to-right additions.
+    """
+
+    trades: np.ndarray
+    nyc: np.ndarray
+    chicago: np.ndarray
+    sum_div: np.ndarray
+    sum_fill: np.ndarray
+    sum_edge: np.ndarray
+    total_shares: np.ndarray
+    # market id -> last trade ts (epoch µs) per cell; only used with a cooldown/cap
+    last_trade: Dict[str, np.ndarray] = field(default_factory=dict)
+
+    INT_FIELDS = ("trades", "nyc", "chicago")
+    FLOAT_FIELDS = ("sum_div", "sum_fill", "sum_edge", "total_shares")
+
+    @classmethod
+    def empty(cls, cells: int) -> "GridState":
+        ints = {k: np.zeros(cells, dtype=np.int64) for k in cls.INT_FIELDS}
+        floats = {k: np.zeros(cells, dtype=np.float64) for k in cls.FLOAT_FIELDS}
+        return cls(**ints, **floats)
+
+    def to_json(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {k: getattr(self, k).tolist() for k in self.INT_FIELDS + self.FLOAT_FIELDS}
+        out["last_trade"] = {mid: ts.tolist() for mid, ts in self.last_trade.items()}
+        return out
+
+    @classmethod
+    def from_json(cls, d: Dict[str, Any]) -> "GridState":
+        ints = {k: np.asarray(d[k], dtype=np.int64) for k in cls.INT_FIELDS}
+        floats = {k: np.asarray(d[k], dtype=np.float64) for k in cls.FLOAT_FIELDS}
+        last = {mid: np.asarray(ts, dtype=np.int64) for mid, ts in (d.get("last_trade") or {}).items()}
+        return cls(**ints, **floats, last_trade=last)
+
+
+def _threshold_mask(c: Candidates, divs: np.ndarray, prices: np.ndarray) -> np.ndarray:
+    """(cells, N) mask of div >= min_div & price <= max_price; cells are divs-major."""
+    m = (c.divergence[None, None, :] >= divs[:, None, None]) & (c.simmer_price[None, None, :] <= prices[None, :, None])
+    return m.reshape(len(divs) * len(prices), len(c))
+
+
+def select_trades(
+    c: Candidates,
+    divs: List[float],
+    prices: List[float],
+    *,
+    cooldown_minutes: Optional[float] = None,
+    max_trades_per_snapshot: Optional[int] = None,
+    last_trade: Optional[Dict[str, np.ndarray]] = None,
+) -> np.ndarray:
+    """(cells, N) bool: which candidates trade in each cell, cells ordered divs-major.
+
+    With a cooldown or cap, picks need a market id and a snapshot ts (as in
+    backtest_pnl_compare), a market is skipped while `ts - last_trade <
+    cooldown`, and at most `max_trades_per_snapshot` picks trade per snapshot.
+    `last_trade` (market id -> ts per cell) seeds the cooldown clock and is
+    updated in place.
+    """
+    divs_a = np.asarray(divs, dtype=np.float64)
+    prices_a = np.asarray(prices, dtype=np.float64)
+    mask = _threshold_mask(c, divs_a, prices_a)
+    if cooldown_minutes is None and max_trades_per_snapshot is None:
+        return mask
+
+    mask &= ((c.market >= 0) & (c.ts != NO_TS))[None, :]
+    cells = mask.shape[0]
+    cooldown_us = int(round((cooldown_minutes or 0) * 60_000_000))
+    cap = max_trades_per_snapshot if max_trades_per_snapshot is not None else np.iinfo(np.int64).max
+    n_markets = int(c.market.max()) + 1 if len(c) else 0
+    last = np.full((cells, n_markets), NEVER_TRADED, dtype=np.int64)
+    if last_trade:
+        for m in range(n_markets):
+            if c.market_ids[m] in last_trade:
+                last[:, m] = last_trade[c.market_ids[m]]
+    placed = np.zeros(cells, dtype=np.int64)
+    taken = np.zeros_like(mask)
+    cur_snap = None
+    for i in range(len(c)):
+        if c.snap[i] != cur_snap:
+            cur_snap = c.snap[i]
+            placed[:] = 0
+        m = c.market[i]
+        if m < 0:
+            continue
+        ok = mask[:, i] & (placed < cap)
+        if cooldown_us:
+            ok &= (c.ts[i] - last[:, m]) >= cooldown_us
+        if not ok.any():
+            continue
+        taken[:, i] = ok
+        last[ok, m] = c.ts[i]
+        placed += ok
+    if last_trade is not None:
+        for m in np.flatnonzero((last != NEVER_TRADED).any(axis=0)):
+            last_trade[c.market_ids[m]] = last[:, m].copy()
+    return taken
+
+
+def _ordered_sums(
+    values: np.ndarray,
+    c: Candidates,
+    divs: np.ndarray,
+    prices: np.ndarray,
+    taken: Optional[np.ndarray] = None,
+    start: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Per-cell `start` + the selected `values`, added left to right like the Python loop.
+
+    The selection is `taken` if given, else the threshold mask built block by block.
+    """
+    cells = len(divs) * len(prices)
+    out = np.zeros(cells, dtype=np.float64) if start is None else np.array(start, dtype=np.float64)
+    if len(c) == 0:
+        return out
+    step = max(1, BLOCK_ELEMS // len(c))
+    for i in range(0, cells, step):
+        j = min(cells, i + step)
+        if taken is not None:
+            mask = taken[i:j]
+        else:
+            cell = np.arange(i, j)
+            d = divs[cell // len(prices)]
+            p = prices[cell % len(prices)]
+            mask = (c.divergence[None, :] >= d[:, None]) & (c.simmer_price[None, :] <= p[:, None])
+        block = np.where(mask, values[None, :], 0.0)
+        out[i:j] = np.cumsum(np.concatenate([out[i:j, None], block], axis=1), axis=1)[:, -1]
+    return out
+
+
+def _sorted_counts(c: Candidates, divs: np.ndarray, prices: np.ndarray, select: np.ndarray) -> np.ndarray:
+    """Count candidates in `select` with div >= min_div and price <= max_price for every cell."""
+    order = np.argsort(-c.divergence, kind="stable")
+    div_asc = np.sort(c.divergence)
+    k = len(c) - np.searchsorted(div_asc, divs, side="left")  # prefix length per min_div
+    ok = (c.simmer_price[order][None, :] <= prices[:, None]) & select[order][None, :]
+    prefix = np.concatenate([np.zeros((len(prices), 1), dtype=np.int64), np.cumsum(ok, axis=1)], axis=1)
+    return prefix[:, k].T  # (divs, prices)
+
+
+def accumulate(
+    c: Candidates,
+    divs: List[float],
+    prices: List[float],
+    state: Optional[GridState] = None,
+    *,
+    cooldown_minutes: Optional[float] = None,
+    max_trades_per_snapshot: Optional[int] = None,
+) -> GridState:
+    """Fold `c` into `state` (or a fresh one) for every (min_div, max_price) cell."""
+    divs_a = np.asarray(divs, dtype=np.float64)
+    prices_a = np.asarray(prices, dtype=np.float64)
+    if state is None:
+        state = GridState.empty(len(divs_a) * len(prices_a))
+    stateful = cooldown_minutes is not None or max_trades_per_snapshot is not None
+
+    last_trade = dict(state.last_trade)
+    if stateful:
+        from .market_series import select_trades_by_market  # imports this module
+
+        taken = select_trades_by_market(
+            c,
+            divs,
+            prices,
+            cooldown_minutes=cooldown_minutes,
+            max_trades_per_snapshot=max_trades_per_snapshot,
+            last_trade=last_trade,
+        )
+        trades = taken.sum(axis=1)
+        nyc = (taken & (c.city == CITY_CODES["nyc"])[None, :]).sum(axis=1)
+        chicago = (taken & (c.city == CITY_CODES["chicago"])[None, :]).sum(axis=1)
+    else:
+        taken = None
+        trades = _sorted_counts(c, divs_a, prices_a, np.ones(len(c), dtype=bool)).ravel()
+        nyc = _sorted_counts(c, divs_a, prices_a, c.city == CITY_CODES["nyc"]).ravel()
+        chicago = _sorted_counts(c, divs_a, prices_a, c.city == CITY_CODES["chicago"]).ravel()
+
+    return GridState(
+        trades=state.trades + trades,
+        nyc=state.nyc + nyc,
+        chicago=state.chicago + chicago,
+        sum_div=_ordered_sums(c.divergence, c, divs_a, prices_a, taken, state.sum_div),
+        sum_fill=_ordered_sums(c.fill_price, c, divs_a, prices_a, taken, state.sum_fill),
+        sum_edge=_ordered_sums(c.edge, c, divs_a, prices_a, taken, state.sum_edge),
+        total_shares=_ordered_sums(c.shares, c, divs_a, prices_a, taken, state.total_shares),
+        last_trade=last_trade,
+    )
+
+
+def grid_rows(state: GridState, divs: List[float], prices: List[float]) -> List[Dict]:
+    """Same rows as `bot.backtest.run_backtest` from accumulated state."""
+    results = []
+    for i, (min_div, max_price) in enumerate((d, p) for d in divs for p in prices):
+        n = int(state.trades[i])
+        results.append(
+            {
+                "min_div": min_div,
+                "max_price": max_price,
+                "trades": n,
+                "avg_divergence": (float(state.sum_div[i]) / n) if n else 0.0,
+                "avg_fill_price": (float(state.sum_fill[i]) / n) if n else 0.0,
+                "avg_edge": (float(state.sum_edge[i]) / n) if n else 0.0,
+                "total_shares": float(state.total_shares[i]),
+                "nyc_count": int(state.nyc[i]),
+                "chicago_count": int(state.chicago[i]),
+            }
+        )
+    return results
+
+
+def run_grid(
+    c: Candidates,
+    divs: List[float],
+    prices: List[float],
+    *,
+    cooldown_minutes: Optional[float] = None,
+    max_trades_per_snapshot: Optional[int] = None,
+) -> List[Dict]:
+    """Same rows as `bot.backtest.run_backtest`, for every (min_div, max_price) cell."""
+    state = accumulate(c, divs, prices, cooldown_minutes=cooldown_minutes, max_trades_per_snapshot=max_trades_per_snapshot)
+    return grid_rows(state, divs, prices)
@@ -1,10 +1,15 @@
 """Backtest against actual paper trade history."""
 from __future__ import annotations
 import argparse
-import json
 from datetime import datetime, timezone
 from pathlib import Path
 
+from .grid_backtest import CITY_CODES, fill_for_notional
+from .questions import parse_question
+from .simlog import default_log_source
+from .snapshot_index import SnapshotIndex
+from .snapshot_reader import iter_snapshots
+
 
 def safe_float(x):
     try:
@@ -14,11 +19,9 @@ def safe_float(x):
 
 
 def is_target_city(q: str):
-    qc = (q or "").lower()
-    if "nyc" in qc or "new york" in qc:
-        return True, "nyc"
-    if "chicago" in qc:
-        return True, "chicago"
+    city = parse_question(q or "").city
+    if city in CITY_CODES:
+        return True, city
     return False, None
 
 
@@ -45,24 +48,8 @@ def simulate_from_snapshots(snapshots, *, min_div: float, max_price: float, log_
                 continue
 
             # Would trade here
-            ob = p.get("orderbook") or {}
-            walks = ob.get("walks") if isinstance(ob, dict) else None
-            walk = None
-            if walks:
-                # Find closest to $10
-                best = None
-                best_dist = float("inf")
-                for w in walks:
-                    n = safe_float(w.get("notional"))
-                    if n is None:
-                        continue
-                    dist = abs(n - 10.0)
-                    if dist < best_dist:
-                        best = w
-                        best_dist = dist
-                walk = best
-
-            if not walk:
+            filled = fill_for_notional(p.get("orderbook"), 10.0)
+            if filled is None:
                 continue
 
             trades.append(
@@ -73,8 +60,8 @@ def simulate_from_snapshots(snapshots, *, min_div: float, max_price: float, log_
                     "city": city,
                     "divergence": div,
                     "simmer_price": simmer,
-                    "fill_price": safe_float(walk.get("avg_price")),
-                    "shares": safe_float(walk.get("shares")),
+                    "fill_price": filled[0],
+                    "shares": filled[1],
                     "cost": 10.0,
                 }
             )
@@ -85,17 +72,18 @@ def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--min-div", type=float, default=0.12)
     ap.add_argument("--max-price", type=float, default=0.20)
-    ap.add_argument("--log-path", type=str, default=str(Path("data") / "sim_log.jsonl"))
+    ap.add_argument("--log-path", type=str, default=None, help="sim_log.jsonl or segment directory")
+    ap.add_argument("--since", type=str, default=None, help="only snapshots at or after this ISO time")
+    ap.add_argument("--until", type=str, default=None, help="only snapshots before this ISO time")
+    ap.add_argument("--market", type=str, default=None, help="only this market's picks (looked up via bot.snapshot_index)")
     args = ap.parse_args()
 
-    log_path = Path(args.log_path)
-    snapshots = []
-    with open(log_path, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            snapshots.append(json.loads(line))
+    log_path = Path(args.log_path) if args.log_path else default_log_source()
+    if args.market:
+        rows = SnapshotIndex(log_path).rows(args.market, since=args.since, until=args.until)
+        snapshots = ({**r, "picks": [p for p in r.get("picks") or [] if p.get("market_id") == args.market]} for r in rows)
+    else:
+        snapshots = iter_snapshots(log_path, since=args.since, until=args.until)
 
     # For now just print candidates
     trades = simulate_from_snapshots(snapshots, min_div=args.min_div, max_price=args.max_price, log_path=log_path)
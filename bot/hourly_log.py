@@ -1,8 +1,13 @@
 """Hourly runner that logs scan + sims + orderbook enrichment to JSONL.
 
-Dry-run only.
+Dry-run only. Sims come from the local execution simulator over the CLOB book;
+a remote dry_run is only made for picks without a book, plus an occasional
+sampled calibration check (--calibrate-rate).
 
-Writes: data/sim_log.jsonl (one JSON object per run)
+Writes: one row per run to the segmented log in data/sim_log/ (bot/simlog.py;
+daily segments, gzipped once closed). Each pick's orderbook
+carries walks at the sampled notionals plus the ask-side cost curve
+(`OrderBook.curve`), so backtests can size trades at any notional.
 
 Run under op:
   SIMMER_API_KEY='op://SterlingArcherVault/Simmer API Key/password' \
@@ -11,13 +16,17 @@ Run under op:
 
 from __future__ import annotations
 
-import json
+import argparse
+import random
 from dataclasses import asdict
 from datetime import datetime, timezone
 from pathlib import Path
 
-from .simmer_client import SimmerClient
-from .polymarket_clob import PolymarketCLOB, best_bid_ask_from_book, walk_cost_from_asks
+from .simmer_client import AsyncSimmerClient
+from .market_catalog import weather_markets
+from .polymarket_clob import AsyncPolymarketCLOB, OrderBook
+from .execution_sim import FeeCache, calibration_record, should_calibrate, simulate_buys, sims_from_dry_run
+from .simlog import SimLogWriter
 
 
 def safe_float(x):
@@ -27,12 +36,16 @@ def safe_float(x):
         return None
 
 
-def main():
+async def run(concurrency: int = 4, calibrate_rate: float = 0.1, ctx=None):
+    import asyncio
+
+    from .pipeline import ByAbsDivergence, CityTerms, HasId, MarketFrame, MinAbsDivergence, Pipeline
+
     now = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
     base = Path(__file__).resolve().parent.parent
     data_dir = base / "data"
     data_dir.mkdir(parents=True, exist_ok=True)
-    log_path = data_dir / "sim_log.jsonl"
+    log_dir = data_dir / "sim_log"
 
     cities = ["nyc", "new york", "chicago"]
     limit = 80
@@ -40,84 +53,99 @@ def main():
     top = 3
     notionals = [2.0, 5.0, 10.0]
 
-    c = SimmerClient()
-    me = c.me()
-
-    markets = c.list_markets(tags="weather", limit=limit).get("markets", [])
-
-    cands = []
-    for m in markets:
-        q = (m.get("question") or "").strip()
-        q_l = q.lower()
-        if not any(t in q_l for t in cities):
-            continue
-        div = safe_float(m.get("divergence"))
-        if div is None or abs(div) < min_div:
-            continue
-        token_id = m.get("polymarket_token_id")
-        cands.append(
-            {
-                "market_id": m.get("id"),
-                "question": q,
-                "divergence": div,
-                "simmer_price": safe_float(m.get("current_probability")),
-                "opportunity_score": safe_float(m.get("opportunity_score")),
-                "resolves_at": m.get("resolves_at"),
-                "url": m.get("url"),
-                "polymarket_token_id": str(token_id) if token_id else None,
-            }
-        )
-
-    cands.sort(key=lambda r: abs(r["divergence"]), reverse=True)
-    picks = [x for x in cands if x.get("market_id")][:top]
-
-    # dry-run sims + orderbook
-    clob = PolymarketCLOB()
+    c = AsyncSimmerClient(ctx.simmer if ctx else None, max_concurrency=concurrency)
+    clob = AsyncPolymarketCLOB(ctx.clob if ctx else None, max_concurrency=concurrency)
+
+    list_markets = ctx.markets if ctx else (lambda n: weather_markets(c.client, limit=n))
+    me, markets = await asyncio.gather(c.me(), asyncio.to_thread(list_markets, limit))
+
+    frame = MarketFrame(markets)
+    pipe = Pipeline([CityTerms(cities), MinAbsDivergence(min_div), HasId()], rank=ByAbsDivergence(), top=top)
+    picks = [
+        {
+            "market_id": frame.ids[i],
+            "question": frame.questions[i],
+            "divergence": float(frame.divergence[i]),
+            "simmer_price": safe_float(markets[i].get("current_probability")),
+            "opportunity_score": safe_float(markets[i].get("opportunity_score")),
+            "resolves_at": markets[i].get("resolves_at"),
+            "url": markets[i].get("url"),
+            "polymarket_token_id": frame.token_ids[i],
+        }
+        for i in pipe.select(frame)
+    ]
+
+    # one /books call feeds both the local fill simulator and the orderbook stats
     token_ids = [p["polymarket_token_id"] for p in picks if p.get("polymarket_token_id")]
-    books = clob.books(token_ids) if token_ids else []
+    if not token_ids:
+        books = []
+    elif ctx:
+        books = await asyncio.to_thread(ctx.books, token_ids)
+    else:
+        books = await clob.books(token_ids)
     by_tid = {}
     for b in books:
-        tid = str(b.get("asset_id") or b.get("token_id") or "")
-        if tid:
-            by_tid[tid] = b
+        ob = OrderBook.from_book(b)  # parsed once for every sim and walk below
+        if ob.token_id:
+            by_tid[ob.token_id] = ob
+
+    fees = ctx.fees if ctx else FeeCache()
+    sims_by_pick = {}
+    remote = []  # (pick index, amount) pairs that need a real dry-run
+    for i, p in enumerate(picks):
+        book = by_tid.get(p.get("polymarket_token_id") or "")
+        if book is None:
+            remote.extend((i, amt) for amt in notionals)
+            continue
+        sims_by_pick[i] = simulate_buys(book, notionals, fees.get(p["market_id"]))
 
-    enriched = []
-    for p in picks:
-        sims = []
-        for amt in notionals:
-            res = c.dry_run_trade(
-                market_id=p["market_id"],
+    cal = None  # (pick index, notional index) checked against the remote dry-run
+    if sims_by_pick and should_calibrate(calibrate_rate):
+        cal = (random.choice(sorted(sims_by_pick)), random.randrange(len(notionals)))
+        remote.append((cal[0], notionals[cal[1]]))
+
+    results = await asyncio.gather(
+        *(
+            c.dry_run_trade(
+                market_id=picks[i]["market_id"],
                 side="yes",
                 amount=amt,
                 venue="polymarket",
-                reasoning=f"hourly dry_run: div={p['divergence']:+.3f} price={p['simmer_price']} amt={amt}",
+                reasoning=f"hourly dry_run: div={picks[i]['divergence']:+.3f} price={picks[i]['simmer_price']} amt={amt}",
                 source="sdk:weather:dry_run",
             )
-            sims.append(
-                {
-                    "amount": amt,
-                    "fee_rate_bps": res.get("fee_rate_bps"),
-                    "est_shares": res.get("shares_bought") or res.get("shares") or res.get("estimated_shares"),
-                    "cost": res.get("cost") or res.get("amount"),
-                }
-            )
+            for i, amt in remote
+        )
+    )
+    calibration = None
+    for k, ((i, amt), res) in enumerate(zip(remote, results)):
+        sim = sims_from_dry_run(amt, res)
+        fees.set(picks[i]["market_id"], sim["fee_rate_bps"])
+        if cal and k == len(remote) - 1:
+            calibration = calibration_record(picks[i]["market_id"], sims_by_pick[i][cal[1]], sim)
+        else:
+            sims_by_pick.setdefault(i, []).append(sim)
+    fees.save()
+
+    enriched = []
+    for i, p in enumerate(picks):
+        sims = sims_by_pick.get(i, [])
 
         ob = None
         tid = p.get("polymarket_token_id")
         if tid and tid in by_tid:
             book = by_tid[tid]
-            tob = best_bid_ask_from_book(book)
             walks = []
-            for n in notionals:
-                walked = walk_cost_from_asks(book, n)
+            for n, walked in zip(notionals, book.buy_many(notionals)):
                 if walked:
                     avg_price, shares = walked
                     walks.append({"notional": n, "avg_price": avg_price, "shares": shares})
             ob = {
-                "best_bid": tob.best_bid,
-                "best_ask": tob.best_ask,
-                "spread": (tob.best_ask - tob.best_bid) if (tob.best_bid is not None and tob.best_ask is not None) else None,
+                "best_bid": book.best_bid,
+                "best_ask": book.best_ask,
+                "spread": book.spread,
                 "walks": walks,
+                "curve": book.curve(),
             }
 
         enriched.append({**p, "sims": sims, "orderbook": ob})
@@ -128,16 +156,45 @@ def main():
         "params": {"cities": cities, "limit": limit, "min_div": min_div, "top": top, "notionals": notionals},
         "picks": enriched,
     }
+    if calibration:
+        row["calibration"] = calibration
 
-    with log_path.open("a", encoding="utf-8") as f:
-        f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    seg = SimLogWriter(log_dir).append(row)
 
     # concise stdout for cron
-    print(f"Status=OK logged={log_path} picks={len(enriched)}")
+    print(f"Status=OK logged={log_dir / seg['file']} picks={len(enriched)} remote_dry_runs={len(remote)}")
+    if calibration:
+        print(f"calibration: {calibration}")
     for p in enriched[:3]:
         print(f"- |div|={abs(p['divergence']):.3f} price={p['simmer_price']} {p['question']}")
         if p.get("url"):
             print(f"  {p['url']}")
+    print(f"http simmer: {c.client.transport.stats.summary()}")
+    if c.client.cache:
+        print(f"cache simmer: {c.client.cache.summary()}")
+    print(f"http clob: {clob.clob.transport.stats.summary()}")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--concurrency", type=int, default=4, help="max in-flight HTTP requests per API")
+    ap.add_argument(
+        "--calibrate-rate",
+        type=float,
+        default=0.1,
+        help="probability per run of checking one local sim against a remote dry_run",
+    )
+    return ap
+
+
+def run_job(args, ctx=None):
+    import asyncio
+
+    asyncio.run(run(concurrency=max(1, args.concurrency), calibrate_rate=args.calibrate_rate, ctx=ctx))
+
+
+def main():
+    run_job(build_parser().parse_args())
 
 
 if __name__ == "__main__":
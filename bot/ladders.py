@@ -0,0 +1,437 @@
+"""Whole-ladder checks for weather events.
+
+A weather event ("highest temperature in NYC on February 14") is listed as
+mutually exclusive temperature buckets; exactly one resolves YES. The
+scanners score each bucket on its own divergence and only fetch books for a
+few picks. Here every event's ladder is checked at once:
+
+- markets are grouped by (city, metric, target date, unit) from the parsed
+  question (bot.questions) and ordered by bucket; a ladder is `complete` when
+  it runs from an "or below" bucket through contiguous ranges to an "or
+  higher" bucket;
+- every bucket's book comes from ONE `PolymarketCLOB.books` call (the client
+  chunks it into 500-token POSTs);
+- the books become padded (books x levels) arrays and the ladders a
+  (ladders x buckets) index into them, so all checks are array ops:
+  * sum of best asks (and bids) vs 1: buying one YES of every bucket of a
+    complete ladder pays exactly $1;
+  * basket cost: walking every bucket's asks for N shares each, for several
+    N at once; edge = N - cost;
+  * Simmer-implied (price + divergence) vs market-implied (book mid)
+    distributions, both normalized over the ladder: total variation
+    distance, the bucket with the largest gap, and the expected temperature
+    under each.
+
+Usage:
+  python -m bot.ladders scan --limit 500 --shares 1,10,100
+  python -m bot.ladders bench --ladders 500
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .questions import Question, default_cache
+
+DEFAULT_SHARES = (1.0, 10.0, 100.0)
+_KIND_ORDER = {"below": 0, "range": 1, "exact": 1, "above": 2}
+
+
+def safe_float(x):
+    try:
+        return float(x)
+    except Exception:
+        return None
+
+
+def _f(x) -> float:
+    v = safe_float(x)
+    return np.nan if v is None else v
+
+
+@dataclass
+class Ladder:
+    city: Optional[str]
+    metric: str
+    date: str  # ISO date, or "--MM-DD" when the year is unknown
+    unit: str
+    rows: List[int]  # indices into the market list, ordered by bucket
+    buckets: List[Question]
+    complete: bool
+
+    @property
+    def key(self) -> str:
+        return f"{self.city or '?'}:{self.metric}:{self.date}:{self.unit}"
+
+
+def _bucket_sort_key(q: Question) -> Tuple[int, float]:
+    return _KIND_ORDER[q.kind], q.low if q.low is not None else -np.inf
+
+
+def _is_complete(buckets: Sequence[Question]) -> bool:
+    """"or below" first, "or higher" last, and no gaps or overlaps between them
+    (buckets are whole degrees, so 38-39 is followed by 40-41)."""
+    if len(buckets) < 2 or buckets[0].kind != "below" or buckets[-1].kind != "above":
+        return False
+    for prev, cur in zip(buckets, buckets[1:]):
+        if cur.kind == "below" or prev.kind == "above" or cur.low != prev.high + 1:
+            return False
+    return True
+
+
+def build_ladders(markets: Sequence[Dict[str, Any]], parsed: Optional[Sequence[Question]] = None, min_buckets: int = 2) -> List[Ladder]:
+    """Group parsed bucket markets into ladders; unparsed questions are skipped.
+    A market repeated in the listing is counted once."""
+    parsed = list(parsed) if parsed is not None else default_cache().many(markets)
+    groups: Dict[tuple, List[int]] = {}
+    seen = set()
+    for i, (m, q) in enumerate(zip(markets, parsed)):
+        if not q.parsed or m.get("id") in seen:
+            continue
+        seen.add(m.get("id"))
+        d = q.target_date(m.get("resolves_at"))
+        day = d.isoformat() if d else f"--{q.month:02d}-{q.day:02d}"
+        groups.setdefault((q.city, q.metric, day, q.unit), []).append(i)
+
+    ladders = []
+    for (city, metric, day, unit), rows in groups.items():
+        if len(rows) < min_buckets:
+            continue
+        rows.sort(key=lambda i: _bucket_sort_key(parsed[i]))
+        buckets = [parsed[i] for i in rows]
+        ladders.append(Ladder(city, metric, day, unit, rows, buckets, _is_complete(buckets)))
+    ladders.sort(key=lambda lad: lad.key)
+    return ladders
+
+
+def ladder_token_ids(ladders: Sequence[Ladder], markets: Sequence[Dict[str, Any]]) -> List[str]:
+    return list(dict.fromkeys(str(markets[i]["polymarket_token_id"]) for lad in ladders for i in lad.rows if markets[i].get("polymarket_token_id")))
+
+
+def fetch_books(clob, ladders: Sequence[Ladder], markets: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Every bucket's book in one `clob.books` call."""
+    token_ids = ladder_token_ids(ladders, markets)
+    return clob.books(token_ids) if token_ids else []
+
+
+def _floats(values: List[Any]) -> np.ndarray:
+    try:
+        return np.array(values, dtype=np.float64)  # numeric strings parse in C; None -> nan
+    except (TypeError, ValueError):
+        return np.array([_f(v) for v in values], dtype=np.float64)
+
+
+def _pad_side(sides: List[Any], best_low: bool) -> Tuple[np.ndarray, np.ndarray]:
+    """(price, size) arrays of shape (books, max levels), best level first.
+    Levels without a positive price and size are dropped, like OrderBook."""
+    n = len(sides)
+    levels = [lv if isinstance(lv, list) else [] for lv in sides]
+    counts = [len(lv) for lv in levels]
+    flat = [lvl if isinstance(lvl, dict) else {} for lv in levels for lvl in lv]
+    px = _floats([lvl.get("price") for lvl in flat])
+    sz = _floats([lvl.get("size") for lvl in flat])
+    book = np.repeat(np.arange(n), counts)
+    keep = (px > 0) & (sz > 0)
+    px, sz, book = px[keep], sz[keep], book[keep]
+    order = np.lexsort((px if best_low else -px, book))
+    px, sz, book = px[order], sz[order], book[order]
+    pos = np.arange(len(book)) - np.searchsorted(book, book, side="left")
+    width = int(pos.max()) + 1 if len(pos) else 1
+    out_px, out_sz = np.zeros((n, width)), np.zeros((n, width))
+    out_px[book, pos] = px
+    out_sz[book, pos] = sz
+    return out_px, out_sz
+
+
+@dataclass
+class BookArrays:
+    """Books as padded arrays: row per book, best level first, zeros past the end."""
+
+    token_ids: List[str]
+    ask_px: np.ndarray
+    ask_sz: np.ndarray
+    bid_px: np.ndarray
+    bid_sz: np.ndarray
+
+    @classmethod
+    def from_books(cls, books: Sequence[Dict[str, Any]]) -> "BookArrays":
+        books = [b for b in books if (b or {}).get("asset_id") or (b or {}).get("token_id")]
+        tids = [str(b.get("asset_id") or b.get("token_id")) for b in books]
+        ask_px, ask_sz = _pad_side([b.get("asks") for b in books], best_low=True)
+        bid_px, bid_sz = _pad_side([b.get("bids") for b in books], best_low=False)
+        return cls(tids, ask_px, ask_sz, bid_px, bid_sz)
+
+    def best(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(best_ask, best_bid) per book, NaN where the side is empty."""
+        ask = np.where(self.ask_sz[:, 0] > 0, self.ask_px[:, 0], np.nan)
+        bid = np.where(self.bid_sz[:, 0] > 0, self.bid_px[:, 0], np.nan)
+        return ask, bid
+
+    def buy_shares(self, shares: Sequence[float]) -> Tuple[np.ndarray, np.ndarray]:
+        """(cost, filled) of buying each of `shares` per book, as (books, len(shares))."""
+        s = np.asarray(shares, dtype=np.float64)[None, None, :]
+        before = (np.cumsum(self.ask_sz, axis=1) - self.ask_sz)[:, :, None]
+        take = np.clip(s - before, 0.0, self.ask_sz[:, :, None])
+        return (take * self.ask_px[:, :, None]).sum(axis=1), take.sum(axis=1)
+
+
+def _representative(q: Question) -> float:
+    """Temperature standing in for a bucket in expectations."""
+    if q.kind == "below":
+        return q.high - 1
+    if q.kind == "above":
+        return q.low + 1
+    return (q.low + q.high) / 2
+
+
+def evaluate(
+    ladders: Sequence[Ladder],
+    markets: Sequence[Dict[str, Any]],
+    books: Sequence[Dict[str, Any]],
+    shares: Sequence[float] = DEFAULT_SHARES,
+) -> Dict[str, Any]:
+    """All ladder checks as arrays (one row per ladder; `shares` columns for basket fields)."""
+    L = len(ladders)
+    if not L:
+        return {"shares": list(shares)}
+    B = max([len(lad.rows) for lad in ladders] + [1])
+    arrays = BookArrays.from_books(books)
+    book_row = {t: r for r, t in enumerate(arrays.token_ids)}
+
+    # (L, B) gathers; -1 / NaN where a ladder is shorter or a book is missing
+    idx = np.full((L, B), -1, dtype=np.int64)
+    present = np.zeros((L, B), dtype=bool)
+    price = np.full((L, B), np.nan)
+    div = np.full((L, B), np.nan)
+    rep = np.full((L, B), np.nan)
+    for li, lad in enumerate(ladders):
+        for bi, (i, q) in enumerate(zip(lad.rows, lad.buckets)):
+            m = markets[i]
+            present[li, bi] = True
+            idx[li, bi] = book_row.get(str(m.get("polymarket_token_id") or ""), -1)
+            price[li, bi] = _f(m.get("current_probability"))
+            div[li, bi] = _f(m.get("divergence"))
+            rep[li, bi] = _representative(q)
+    has_book = idx >= 0
+    safe_idx = np.where(has_book, idx, 0)
+
+    ask1, bid1 = arrays.best()
+    ask = np.where(has_book, ask1[safe_idx] if len(ask1) else np.nan, np.nan)
+    bid = np.where(has_book, bid1[safe_idx] if len(bid1) else np.nan, np.nan)
+    all_asks = (~present | ~np.isnan(ask)).all(axis=1)
+    all_bids = (~present | ~np.isnan(bid)).all(axis=1)
+    sum_ask = np.where(all_asks, np.nansum(ask, axis=1), np.nan)
+    sum_bid = np.where(all_bids, np.nansum(bid, axis=1), np.nan)
+
+    # basket: N shares of every bucket
+    cost_b, filled_b = arrays.buy_shares(shares) if len(arrays.token_ids) else (np.zeros((0, len(shares))),) * 2
+    cost = np.where(has_book[:, :, None], cost_b[safe_idx] if len(cost_b) else 0.0, 0.0)
+    filled = np.where(has_book[:, :, None], filled_b[safe_idx] if len(filled_b) else 0.0, 0.0)
+    n = np.asarray(shares, dtype=np.float64)[None, None, :]
+    fillable = (~present[:, :, None] | (filled >= n * (1 - 1e-9))).all(axis=1)
+    basket_cost = np.where(fillable, cost.sum(axis=1), np.nan)
+    complete = np.array([lad.complete for lad in ladders], dtype=bool)
+    # only a complete ladder is guaranteed to pay N
+    basket_edge = np.where(complete[:, None], np.asarray(shares)[None, :] - basket_cost, np.nan)
+
+    # distributions over each ladder's buckets
+    mid = np.where(np.isnan(bid), ask, (ask + bid) / 2)
+    sim = np.clip(price + np.nan_to_num(div), 0.0, 1.0)
+    sim_sum = np.nansum(np.where(present, sim, np.nan), axis=1)
+    mkt_sum = np.nansum(np.where(present, mid, np.nan), axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        p_sim = np.where(present, sim, 0.0) / sim_sum[:, None]
+        p_mkt = np.where(present & ~np.isnan(mid), mid, 0.0) / mkt_sum[:, None]
+        gap = np.where(present, p_sim - p_mkt, 0.0)
+        tvd = 0.5 * np.abs(gap).sum(axis=1)
+        worst = np.abs(gap).argmax(axis=1)
+        e_sim = np.nansum(p_sim * np.nan_to_num(rep), axis=1)
+        e_mkt = np.nansum(p_mkt * np.nan_to_num(rep), axis=1)
+    priced = all_asks & all_bids & (mkt_sum > 0) & (sim_sum > 0)
+
+    return {
+        "shares": list(shares),
+        "n_buckets": present.sum(axis=1),
+        "complete": complete,
+        "books": has_book.sum(axis=1),
+        "sum_ask": sum_ask,
+        "sum_bid": sum_bid,
+        "basket_cost": basket_cost,
+        "basket_edge": basket_edge,
+        "sim_sum": sim_sum,
+        "tvd": np.where(priced, tvd, np.nan),
+        "worst_bucket": worst,
+        "worst_gap": np.where(priced, gap[np.arange(L), worst], np.nan),
+        "exp_temp_sim": np.where(priced, e_sim, np.nan),
+        "exp_temp_mkt": np.where(priced, e_mkt, np.nan),
+    }
+
+
+def rows_for(ladders: Sequence[Ladder], res: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """`evaluate` output as one JSON-able dict per ladder."""
+
+    def num(x):
+        x = float(x)
+        return None if np.isnan(x) else round(x, 6)
+
+    out = []
+    for li, lad in enumerate(ladders):
+        out.append(
+            {
+                "ladder": lad.key,
+                "buckets": [q.bucket for q in lad.buckets],
+                "complete": bool(res["complete"][li]),
+                "books": int(res["books"][li]),
+                "sum_ask": num(res["sum_ask"][li]),
+                "sum_bid": num(res["sum_bid"][li]),
+                "basket": {f"{n:g}": {"cost": num(c), "edge": num(e)} for n, c, e in zip(res["shares"], res["basket_cost"][li], res["basket_edge"][li])},
+                "sim_sum": num(res["sim_sum"][li]),
+                "tvd": num(res["tvd"][li]),
+                "worst_bucket": lad.buckets[int(res["worst_bucket"][li])].bucket,
+                "worst_gap": num(res["worst_gap"][li]),
+                "exp_temp_sim": num(res["exp_temp_sim"][li]),
+                "exp_temp_mkt": num(res["exp_temp_mkt"][li]),
+            }
+        )
+    return out
+
+
+def _fmt(x: Optional[float], spec: str = ".3f") -> str:
+    return "-" if x is None else format(x, spec)
+
+
+def scan(args) -> None:
+    from .market_catalog import weather_markets
+    from .polymarket_clob import PolymarketCLOB
+    from .simmer_client import SimmerClient
+
+    shares = [float(x) for x in (args.shares or "").split(",") if x.strip()] or list(DEFAULT_SHARES)
+    markets = weather_markets(SimmerClient(), limit=args.limit)
+    t0 = time.perf_counter()
+    ladders = build_ladders(markets)
+    if args.complete_only:
+        ladders = [lad for lad in ladders if lad.complete]
+    t1 = time.perf_counter()
+    books = fetch_books(PolymarketCLOB(), ladders, markets)
+    t2 = time.perf_counter()
+    rows = rows_for(ladders, evaluate(ladders, markets, books, shares))
+    t3 = time.perf_counter()
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+    print(
+        f"markets={len(markets)} ladders={len(ladders)} complete={sum(lad.complete for lad in ladders)} "
+        f"books={len(books)}  group={1000 * (t1 - t0):.1f}ms books_call={1000 * (t2 - t1):.0f}ms eval={1000 * (t3 - t2):.1f}ms"
+    )
+    # cheapest complete ladders first, then the rest by distribution gap
+    rows.sort(key=lambda r: (not r["complete"], r["sum_ask"] if r["sum_ask"] is not None else 9.0, -(r["tvd"] or 0)))
+    for r in rows[: args.top]:
+        flag = "complete" if r["complete"] else "partial"
+        basket = " ".join(f"{n}:{_fmt(b['edge'], '+.2f')}" for n, b in r["basket"].items())
+        print(f"- {r['ladder']} ({len(r['buckets'])} buckets, {flag}, books={r['books']})")
+        print(f"  sum_ask={_fmt(r['sum_ask'])} sum_bid={_fmt(r['sum_bid'])} basket_edge {basket}")
+        print(
+            f"  simmer_sum={_fmt(r['sim_sum'])} tvd={_fmt(r['tvd'])} worst={r['worst_bucket']} gap={_fmt(r['worst_gap'], '+.3f')} "
+            f"E[temp] simmer={_fmt(r['exp_temp_sim'], '.1f')} market={_fmt(r['exp_temp_mkt'], '.1f')}"
+        )
+
+
+def _synthetic(n_ladders: int, seed: int = 0) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    rng = np.random.default_rng(seed)
+    cities = ["New York City", "Chicago", "Miami", "Los Angeles", "Seattle", "Boston"]
+    markets, books = [], []
+    for li in range(n_ladders):
+        city = cities[li % len(cities)]
+        day = 1 + (li // len(cities)) % 28
+        mi = (li // (len(cities) * 28)) % 4
+        month = ["January", "February", "March", "April"][mi]
+        lo = int(rng.integers(20, 80)) // 2 * 2
+        k = int(rng.integers(5, 10))
+        probs = rng.dirichlet(np.ones(k + 2))
+        labels = [f"{lo - 1}°F or below"] + [f"between {lo + 2 * j}-{lo + 2 * j + 1}°F" for j in range(k)] + [f"{lo + 2 * k}°F or higher"]
+        for bi, (label, p) in enumerate(zip(labels, probs)):
+            tid = f"{li}-{bi}"
+            markets.append(
+                {
+                    "id": f"m{tid}",
+                    "question": f"Will the highest temperature in {city} be {label} on {month} {day}?",
+                    "current_probability": float(p),
+                    "divergence": float(rng.normal(0, 0.03)),
+                    "resolves_at": f"2026-{mi + 1:02d}-{day:02d}T12:00:00Z",
+                    "polymarket_token_id": tid,
+                }
+            )
+            ask = min(0.999, max(0.001, p + 0.01))
+            books.append(
+                {
+                    "asset_id": tid,
+                    "asks": [{"price": f"{ask + 0.01 * j:.3f}", "size": f"{rng.uniform(5, 200):.2f}"} for j in range(8)],
+                    "bids": [{"price": f"{max(0.001, ask - 0.02 - 0.01 * j):.3f}", "size": f"{rng.uniform(5, 200):.2f}"} for j in range(8)],
+                }
+            )
+    return markets, books
+
+
+def _bench(n_ladders: int, shares: Sequence[float]) -> None:
+    from .polymarket_clob import OrderBook
+    from .questions import parse_question
+
+    markets, books = _synthetic(n_ladders)
+    parsed = [parse_question(m["question"]) for m in markets]
+
+    t0 = time.perf_counter()
+    ladders = build_ladders(markets, parsed)
+    t1 = time.perf_counter()
+    res = evaluate(ladders, markets, books, shares)
+    t2 = time.perf_counter()
+
+    # reference: OrderBook per bucket, Python sums per ladder
+    obs = {ob.token_id: ob for ob in map(OrderBook.from_book, books)}
+    ref_sum, ref_cost = [], []
+    for lad in ladders:
+        bs = [obs[markets[i]["polymarket_token_id"]] for i in lad.rows]
+        ref_sum.append(sum(b.best_ask for b in bs))
+        costs = []
+        for n in shares:
+            walks = [b.cost_for_shares(n) for b in bs]
+            ok = all(w and w[1] >= n * (1 - 1e-9) for w in walks)
+            costs.append(sum(w[0] * w[1] for w in walks) if ok else np.nan)
+        ref_cost.append(costs)
+    t3 = time.perf_counter()
+
+    same_sum = np.allclose(res["sum_ask"], ref_sum)
+    same_cost = np.allclose(res["basket_cost"], np.array(ref_cost), equal_nan=True)
+    print(f"ladders={len(ladders)} buckets={len(markets)} complete={int(res['complete'].sum())}")
+    print(f"group {1000 * (t1 - t0):.1f} ms   evaluate {1000 * (t2 - t1):.1f} ms   per-bucket OrderBook loop {1000 * (t3 - t2):.1f} ms")
+    print(f"matches OrderBook walks: sum_ask={same_sum} basket_cost={same_cost}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("scan", help="check every weather ladder against live books")
+    p.add_argument("--limit", type=int, default=500, help="markets to pull from the catalog")
+    p.add_argument("--shares", type=str, default=",".join(f"{n:g}" for n in DEFAULT_SHARES), help="basket sizes (shares per bucket)")
+    p.add_argument("--top", type=int, default=20)
+    p.add_argument("--complete-only", action="store_true")
+    p.add_argument("--json", action="store_true", help="print every ladder as JSON")
+    p = sub.add_parser("bench", help="time the checks on synthetic ladders")
+    p.add_argument("--ladders", type=int, default=500)
+    p.add_argument("--shares", type=str, default="1,10,100")
+    args = ap.parse_args()
+
+    if args.cmd == "scan":
+        scan(args)
+    else:
+        _bench(args.ladders, [float(x) for x in args.shares.split(",") if x.strip()])
+
+
+if __name__ == "__main__":
+    main()
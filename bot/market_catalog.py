@@ -0,0 +1,305 @@
+"""Local SQLite catalog of Simmer markets.
+
+Every entrypoint used to call GET /api/sdk/markets and refilter the whole
+payload. The catalog keeps one copy in data/markets.sqlite, indexed by
+market id, tag, city, status and resolves_at, and entrypoints read from it.
+
+`refresh` pulls one listing and only rewrites rows whose payload changed.
+Active markets that dropped out of the listing lose their rank; once their
+resolves_at has passed they are re-fetched by id (status=resolved, then
+status=active) at most once per `RECHECK_INTERVAL_S`, so resolved ones get
+their final status, ones still awaiting resolution stay active, and ones the
+API no longer returns at all become 'delisted'. `weather_markets` is what the entrypoints call: it refreshes
+only when the catalog is older than `max_age_s`, so one refresh feeds every
+job in the same cron minute.
+
+Usage:
+  python -m bot.market_catalog --refresh --limit 200
+  python -m bot.market_catalog --city nyc --limit 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from .questions import parse_question
+
+DEFAULT_DB_PATH = Path(__file__).resolve().parent.parent / "data" / "markets.sqlite"
+DEFAULT_MAX_AGE_S = 300
+DEFAULT_REFRESH_LIMIT = 200
+IDS_PER_REQUEST = 50
+RECHECK_INTERVAL_S = 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS markets (
+    id TEXT PRIMARY KEY,
+    question TEXT,
+    city TEXT,
+    status TEXT,
+    resolves_at TEXT,
+    resolves_ts REAL,
+    divergence REAL,
+    current_probability REAL,
+    polymarket_token_id TEXT,
+    payload TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    list_rank INTEGER,
+    updated_at REAL NOT NULL,
+    checked_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_markets_city ON markets(city);
+CREATE INDEX IF NOT EXISTS idx_markets_status_rank ON markets(status, list_rank);
+CREATE INDEX IF NOT EXISTS idx_markets_resolves ON markets(resolves_ts);
+CREATE TABLE IF NOT EXISTS market_tags (
+    tag TEXT NOT NULL,
+    market_id TEXT NOT NULL,
+    PRIMARY KEY (tag, market_id)
+);
+CREATE TABLE IF NOT EXISTS refreshes (
+    tags TEXT PRIMARY KEY,
+    refreshed_at REAL NOT NULL
+);
+"""
+
+
+def safe_float(x):
+    try:
+        return float(x)
+    except Exception:
+        return None
+
+
+def city_of(question: str) -> Optional[str]:
+    return parse_question(question or "").city
+
+
+def _resolves_ts(raw: Optional[str]) -> Optional[float]:
+    if not raw:
+        return None
+    from dateutil.parser import isoparse
+
+    try:
+        return isoparse(raw).timestamp()
+    except Exception:
+        return None
+
+
+def _fingerprint(m: Dict[str, Any]) -> str:
+    return hashlib.sha1(json.dumps(m, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class MarketCatalog:
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path or DEFAULT_DB_PATH)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(self.path), timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+        cols = {r[1] for r in self.db.execute("PRAGMA table_info(markets)")}
+        if "checked_at" not in cols:  # catalogs created before rechecks were throttled
+            self.db.execute("ALTER TABLE markets ADD COLUMN checked_at REAL")
+
+    def close(self) -> None:
+        self.db.close()
+
+    def age(self, tags: str) -> float:
+        row = self.db.execute("SELECT refreshed_at FROM refreshes WHERE tags = ?", (tags,)).fetchone()
+        return time.time() - row[0] if row else float("inf")
+
+    def _upsert(self, m: Dict[str, Any], tags: Iterable[str], rank: Optional[int], now: float) -> bool:
+        """Insert or update one market; returns True if the stored payload changed."""
+        mid = m.get("id")
+        if not mid:
+            return False
+        fp = _fingerprint(m)
+        row = self.db.execute("SELECT fingerprint FROM markets WHERE id = ?", (mid,)).fetchone()
+        changed = row is None or row[0] != fp
+        if changed:
+            token_id = m.get("polymarket_token_id")
+            self.db.execute(
+                """
+                INSERT INTO markets (id, question, city, status, resolves_at, resolves_ts, divergence,
+                    current_probability, polymarket_token_id, payload, fingerprint, list_rank, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET
+                    question = excluded.question, city = excluded.city, status = excluded.status,
+                    resolves_at = excluded.resolves_at, resolves_ts = excluded.resolves_ts,
+                    divergence = excluded.divergence, current_probability = excluded.current_probability,
+                    polymarket_token_id = excluded.polymarket_token_id, payload = excluded.payload,
+                    fingerprint = excluded.fingerprint, list_rank = excluded.list_rank,
+                    updated_at = excluded.updated_at
+                """,
+                (
+                    mid,
+                    m.get("question"),
+                    city_of(m.get("question") or ""),
+                    m.get("status") or "active",
+                    m.get("resolves_at"),
+                    _resolves_ts(m.get("resolves_at")),
+                    safe_float(m.get("divergence")),
+                    safe_float(m.get("current_probability")),
+                    str(token_id) if token_id else None,
+                    json.dumps(m, ensure_ascii=False),
+                    fp,
+                    rank,
+                    now,
+                ),
+            )
+        else:
+            self.db.execute("UPDATE markets SET list_rank = ? WHERE id = ?", (rank, mid))
+        for tag in tags:
+            self.db.execute("INSERT OR IGNORE INTO market_tags (tag, market_id) VALUES (?, ?)", (tag, mid))
+        return changed
+
+    def refresh(self, client, *, tags: str = "weather", limit: int = DEFAULT_REFRESH_LIMIT) -> Dict[str, int]:
+        """Sync the catalog with one /api/sdk/markets listing for `tags`."""
+        tag_list = [t.strip() for t in tags.split(",") if t.strip()]
+        listing = client.list_markets(tags=tags, limit=limit).get("markets", []) or []
+        now = time.time()
+        stats = {"listed": len(listing), "changed": 0, "rechecked": 0, "resolved": 0}
+
+        with self.db:
+            seen = set()
+            for rank, m in enumerate(listing):
+                seen.add(m.get("id"))
+                stats["changed"] += self._upsert(m, tag_list, rank, now)
+            marks = ",".join("?" * len(tag_list))
+            dropped = [
+                (r[0], r[1], r[2])
+                for r in self.db.execute(
+                    f"""
+                    SELECT DISTINCT m.id, m.resolves_ts, m.checked_at FROM markets m
+                    JOIN market_tags t ON t.market_id = m.id
+                    WHERE t.tag IN ({marks}) AND m.status = 'active'
+                    """,
+                    tag_list,
+                )
+                if r[0] not in seen
+            ]
+            # ranked out of this listing: keep them, but behind everything listed
+            self.db.executemany("UPDATE markets SET list_rank = NULL WHERE id = ?", [(d[0],) for d in dropped])
+
+        # Only markets past resolves_at can have resolved; ask for those by id, at
+        # most once per RECHECK_INTERVAL_S, to learn whether they resolved, are
+        # still awaiting resolution, or are gone.
+        due = [
+            mid
+            for mid, resolves_ts, checked_at in dropped
+            if (resolves_ts is None or resolves_ts <= now)
+            and (checked_at is None or now - checked_at >= RECHECK_INTERVAL_S)
+        ]
+        for i in range(0, len(due), IDS_PER_REQUEST):
+            ids = due[i : i + IDS_PER_REQUEST]
+            resolved = client.list_markets(ids=ids, status="resolved").get("markets", []) or []
+            returned = {m.get("id") for m in resolved}
+            rest = [mid for mid in ids if mid not in returned]
+            active = (client.list_markets(ids=rest, status="active").get("markets", []) or []) if rest else []
+            returned |= {m.get("id") for m in active}
+            with self.db:
+                for m in resolved + active:
+                    stats["changed"] += self._upsert(m, tag_list, None, now)
+                    stats["resolved"] += (m.get("status") or "active") != "active"
+                for mid in ids:
+                    if mid not in returned:
+                        self.db.execute("UPDATE markets SET status = 'delisted', list_rank = NULL WHERE id = ?", (mid,))
+                self.db.executemany("UPDATE markets SET checked_at = ? WHERE id = ?", [(now, mid) for mid in ids])
+            stats["rechecked"] += len(ids)
+
+        with self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO refreshes (tags, refreshed_at) VALUES (?, ?)",
+                (tags, now),
+            )
+        return stats
+
+    def markets(
+        self,
+        *,
+        tag: Optional[str] = "weather",
+        status: Optional[str] = "active",
+        cities: Optional[List[str]] = None,
+        resolves_after: Optional[float] = None,
+        resolves_before: Optional[float] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Market payloads in listing order, filtered on indexed columns."""
+        sql = "SELECT m.payload FROM markets m"
+        where: List[str] = []
+        args: List[Any] = []
+        if tag:
+            sql += " JOIN market_tags t ON t.market_id = m.id AND t.tag = ?"
+            args.append(tag)
+        if status:
+            where.append("m.status = ?")
+            args.append(status)
+        if cities:
+            where.append(f"m.city IN ({','.join('?' * len(cities))})")
+            args.extend(cities)
+        if resolves_after is not None:
+            where.append("m.resolves_ts >= ?")
+            args.append(resolves_after)
+        if resolves_before is not None:
+            where.append("m.resolves_ts < ?")
+            args.append(resolves_before)
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY m.list_rank IS NULL, m.list_rank, m.resolves_ts"
+        if limit is not None:
+            sql += " LIMIT ?"
+            args.append(int(limit))
+        return [json.loads(r[0]) for r in self.db.execute(sql, args)]
+
+
+def weather_markets(
+    client,
+    *,
+    limit: int,
+    tags: str = "weather",
+    max_age_s: float = DEFAULT_MAX_AGE_S,
+    catalog: Optional[MarketCatalog] = None,
+) -> List[Dict[str, Any]]:
+    """Drop-in for `client.list_markets(tags=..., limit=...)["markets"]` served from the catalog."""
+    cat = catalog or MarketCatalog()
+    try:
+        if cat.age(tags) > max_age_s:
+            cat.refresh(client, tags=tags, limit=max(limit, DEFAULT_REFRESH_LIMIT))
+        return cat.markets(tag=tags.split(",")[0].strip(), limit=limit)
+    finally:
+        if catalog is None:
+            cat.close()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--refresh", action="store_true", help="pull the listing before querying")
+    ap.add_argument("--tags", type=str, default="weather")
+    ap.add_argument("--limit", type=int, default=20)
+    ap.add_argument("--refresh-limit", type=int, default=DEFAULT_REFRESH_LIMIT)
+    ap.add_argument("--city", type=str, default=None, help="comma-separated canonical city keys, e.g. nyc,chicago")
+    ap.add_argument("--status", type=str, default="active")
+    args = ap.parse_args()
+
+    cat = MarketCatalog()
+    if args.refresh:
+        from .simmer_client import SimmerClient
+
+        stats = cat.refresh(SimmerClient(), tags=args.tags, limit=args.refresh_limit)
+        print(f"refresh: {stats}")
+
+    cities = [c.strip().lower() for c in (args.city or "").split(",") if c.strip()]
+    t0 = time.perf_counter()
+    rows = cat.markets(tag=args.tags.split(",")[0], status=args.status or None, cities=cities or None, limit=args.limit)
+    ms = (time.perf_counter() - t0) * 1000
+    print(f"catalog={cat.path} rows={len(rows)} query_ms={ms:.2f} age_s={cat.age(args.tags):.0f}")
+    for m in rows:
+        print(f"- div={safe_float(m.get('divergence'))} price={safe_float(m.get('current_probability'))} {m.get('question')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,425 @@
+"""Per-market time series pivoted out of the snapshot store.
+
+The backtests rebuild each market's history implicitly: the cooldown state
+machine (grid_backtest.select_trades, and the dict-per-market loop in
+backtest_pnl_compare.simulate_trades) walks every pick in order and looks up
+its market's clock. `MarketSeries.from_store` sorts the store rows once by
+(market, ts, row) and keeps each column contiguous per market, with
+`offsets` as the market -> slice index:
+
+  ts, snap, divergence, simmer_price, best_bid, best_ask, spread, resolves_ts
+  walk_notional, walk_avg_price, walk_shares    (rows, walk_width)
+  fill_price, shares                            for `notional=`, as the backtests fill
+
+Per-market work then runs on all markets at once:
+
+- `cooldown_chains`: with a cooldown, a market trades at its first eligible
+  pick and then at the first eligible pick at least `cooldown` later. One
+  searchsorted over the (market, ts) keys gives every pick's successor, and
+  the chains are followed for all markets together (one step per trade of
+  the busiest market);
+- `select_trades_by_market` is a drop-in for grid_backtest.select_trades
+  (same result, same `last_trade` update). Cooldown-only runs are chains per
+  cell. A per-snapshot cap couples the markets of a snapshot, so there the
+  per-market clocks are a (cells, markets) array stepped once per snapshot
+  instead of once per pick;
+- `first_true` / `entry_table`: first pick per market meeting a condition,
+  and hours to resolution when it was first seen / first tradeable.
+
+`python -m bot.market_series bench --repeat 20` (cooldown 360 min; the log's
+candidates repeated 20x with fresh markets, shifted in time; 5900 picks):
+
+  cap   cells   select_trades (loop)   select_trades_by_market
+    1       1          36 ms                    4 ms
+    1      25          38 ms                   28 ms
+  none      1          40 ms                    1 ms
+  none     25          61 ms                    9 ms
+
+Usage:
+  python -m bot.market_series info
+  python -m bot.market_series market <market_id>
+  python -m bot.market_series entries --min-div 0.10 --max-price 0.20
+  python -m bot.market_series bench --repeat 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .grid_backtest import NEVER_TRADED, NO_TS, Candidates, _threshold_mask, closest_walk, curve_fills
+from .snapshot_store import FLOAT_COLUMNS, WALK_COLUMNS, SnapshotStore
+
+KEY_LIMIT = 2**62  # keep (group, ts) composite keys inside int64
+
+
+@dataclass
+class MarketSeries:
+    """Store rows grouped by market; market i's rows are [offsets[i], offsets[i+1])."""
+
+    market_ids: List[str]
+    offsets: np.ndarray
+    rows: np.ndarray  # store row of each series row
+    columns: Dict[str, np.ndarray] = field(default_factory=dict)
+    _pos: Dict[str, int] = field(default_factory=dict, repr=False)
+
+    def __post_init__(self):
+        self._pos = {mid: i for i, mid in enumerate(self.market_ids)}
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    @property
+    def counts(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    @property
+    def group(self) -> np.ndarray:
+        """Market index of every series row."""
+        return np.repeat(np.arange(len(self.market_ids)), self.counts)
+
+    def slice(self, market_id: str) -> slice:
+        i = self._pos[market_id]
+        return slice(int(self.offsets[i]), int(self.offsets[i + 1]))
+
+    def market(self, market_id: str) -> Dict[str, np.ndarray]:
+        s = self.slice(market_id)
+        return {k: v[s] for k, v in self.columns.items()}
+
+    @classmethod
+    def from_store(cls, store: SnapshotStore, notional: Optional[float] = None) -> "MarketSeries":
+        market = np.asarray(store["market"])
+        ts = np.asarray(store["ts"])
+        keep = np.flatnonzero(market >= 0)
+        order = keep[np.lexsort((keep, ts[keep], market[keep]))]
+        offsets = np.searchsorted(market[order], np.arange(len(store.markets) + 1))
+        cols = {k: np.asarray(store[k])[order] for k in ("ts", "snap", "question", *FLOAT_COLUMNS, *WALK_COLUMNS)}
+        if notional is not None:
+            # same fill rule as grid_backtest.extract_candidates
+            fill, shares = closest_walk(store, notional)
+            c_fill, c_shares, has_curve = curve_fills(store, notional)
+            cols["fill_price"] = np.where(has_curve, c_fill, fill)[order]
+            cols["shares"] = np.where(has_curve, c_shares, shares)[order]
+        return cls(market_ids=list(store.markets), offsets=offsets, rows=order, columns=cols)
+
+
+def cooldown_chains(group: np.ndarray, ts: np.ndarray, eligible: np.ndarray, cooldown_us: int) -> np.ndarray:
+    """Greedy cooldown per group: which eligible rows trade.
+
+    Rows must be ordered by group, and by ts within a group (non-decreasing).
+    A group trades at its first eligible row, then at the first eligible row
+    with ts >= last trade + cooldown_us, and so on.
+    """
+    out = np.zeros(len(eligible), dtype=bool)
+    idx = np.flatnonzero(eligible)
+    if idx.size == 0:
+        return out
+    if cooldown_us <= 0:
+        out[idx] = True
+        return out
+    g, t = group[idx], ts[idx]
+    heads = np.r_[True, g[1:] != g[:-1]]
+    dense = np.cumsum(heads) - 1
+    t = t - t.min()
+    width = int(t.max()) + cooldown_us + 1
+    nxt = np.full(idx.size, -1, dtype=np.int64)
+    per_key = max(1, KEY_LIMIT // width)
+    for g0 in range(0, int(dense[-1]) + 1, per_key):
+        # a composite (group, ts) key per chunk of groups, so one searchsorted finds every successor
+        lo, hi = np.searchsorted(dense, [g0, g0 + per_key])
+        key = (dense[lo:hi] - g0) * width + t[lo:hi]
+        found = np.searchsorted(key, key + cooldown_us, side="left")
+        ok = found < len(key)
+        ok[ok] = dense[lo:hi][found[ok]] == dense[lo:hi][ok]
+        nxt[lo:hi] = np.where(ok, found + lo, -1)
+    taken = np.zeros(idx.size, dtype=bool)
+    cur = np.flatnonzero(heads)
+    while cur.size:
+        taken[cur] = True
+        cur = nxt[cur]
+        cur = cur[cur >= 0]
+    out[idx[taken]] = True
+    return out
+
+
+def select_trades_by_market(
+    c: Candidates,
+    divs: List[float],
+    prices: List[float],
+    *,
+    cooldown_minutes: Optional[float] = None,
+    max_trades_per_snapshot: Optional[int] = None,
+    last_trade: Optional[Dict[str, np.ndarray]] = None,
+) -> np.ndarray:
+    """Same (cells, N) result and `last_trade` update as grid_backtest.select_trades.
+
+    Without a cap each cell is one `cooldown_chains` call over the picks
+    grouped by market (falling back to select_trades if a market's picks are
+    not in ts order in `c`). With a cap, the per-market clocks are a
+    (cells, markets) array stepped once per snapshot rather than once per pick.
+    """
+    from .grid_backtest import select_trades
+
+    divs_a = np.asarray(divs, dtype=np.float64)
+    prices_a = np.asarray(prices, dtype=np.float64)
+    mask = _threshold_mask(c, divs_a, prices_a)
+    if cooldown_minutes is None and max_trades_per_snapshot is None:
+        return mask
+
+    mask &= ((c.market >= 0) & (c.ts != NO_TS))[None, :]
+    cells = mask.shape[0]
+    cooldown_us = int(round((cooldown_minutes or 0) * 60_000_000))
+    n_markets = int(c.market.max()) + 1 if len(c) else 0
+    last = np.full((cells, n_markets), NEVER_TRADED, dtype=np.int64)
+    if last_trade:
+        for m in range(n_markets):
+            if c.market_ids[m] in last_trade:
+                last[:, m] = last_trade[c.market_ids[m]]
+
+    if max_trades_per_snapshot is None:
+        taken = _chains_by_cell(c, mask, last, cooldown_us, seeded=bool(last_trade))
+        if taken is None:
+            return select_trades(
+                c, divs, prices, cooldown_minutes=cooldown_minutes, last_trade=last_trade
+            )
+    else:
+        taken = _step_by_snapshot(c, mask, last, cooldown_us, max_trades_per_snapshot)
+
+    if last_trade is not None:
+        for m in np.flatnonzero((last != NEVER_TRADED).any(axis=0)):
+            last_trade[c.market_ids[m]] = last[:, m].copy()
+    return taken
+
+
+def _chains_by_cell(c: Candidates, mask: np.ndarray, last: np.ndarray, cooldown_us: int, seeded: bool):
+    """Cooldown-only selection per cell; updates `last`. None if picks are out of ts order per market."""
+    n = len(c)
+    order = np.lexsort((np.arange(n), c.market))  # by market, processing order within
+    g, ts = c.market[order], c.ts[order]
+    valid = ts != NO_TS
+    vg, vts = g[valid], ts[valid]
+    if np.any(np.diff(vts)[vg[1:] == vg[:-1]] < 0):
+        return None
+    gm = np.maximum(g, 0)
+    taken = np.zeros_like(mask)
+    for k in range(mask.shape[0]):
+        elig = mask[k][order]
+        if not elig.any():
+            continue
+        if cooldown_us and seeded:
+            elig &= (ts - last[k, gm]) >= cooldown_us
+        taken[k, order] = cooldown_chains(g, ts, elig, cooldown_us)
+        idx = np.flatnonzero(taken[k])[::-1]
+        if idx.size:
+            mk, first = np.unique(c.market[idx], return_index=True)
+            last[k, mk] = c.ts[idx[first]]
+    return taken
+
+
+def _step_by_snapshot(c: Candidates, mask: np.ndarray, last: np.ndarray, cooldown_us: int, cap: int) -> np.ndarray:
+    """Cooldown + per-snapshot cap, one vectorized step per snapshot; updates `last`."""
+    taken = np.zeros_like(mask)
+    live = np.flatnonzero(mask.any(axis=0))  # picks no cell can take never touch the clocks
+    if live.size == 0:
+        return taken
+    run = np.cumsum(np.r_[True, c.snap[1:] != c.snap[:-1]])[live]  # the loop resets its count on every snap change
+    bounds = np.flatnonzero(np.r_[True, run[1:] != run[:-1], True])
+    mk_all, ts_all, ok_all = c.market[live], c.ts[live], mask[:, live]
+    pairs = np.lexsort((mk_all, run))
+    dup = (run[pairs][1:] == run[pairs][:-1]) & (mk_all[pairs][1:] == mk_all[pairs][:-1])
+    dup_runs = set(run[pairs][1:][dup].tolist())
+    out = np.zeros_like(ok_all)
+    for a, b in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+        mk, ts = mk_all[a:b], ts_all[a:b]
+        if run[a] in dup_runs:
+            # a market twice in one snapshot: its second pick sees the first's trade
+            placed = np.zeros(mask.shape[0], dtype=np.int64)
+            for j in range(a, b):
+                m = mk_all[j]
+                ok = ok_all[:, j] & (placed < cap)
+                if cooldown_us:
+                    ok &= (ts_all[j] - last[:, m]) >= cooldown_us
+                out[:, j] = ok
+                last[ok, m] = ts_all[j]
+                placed += ok
+            continue
+        ok = ok_all[:, a:b]
+        prev = last[:, mk]
+        if cooldown_us:
+            ok = ok & ((ts - prev) >= cooldown_us)
+        ok &= np.cumsum(ok, axis=1) <= cap
+        out[:, a:b] = ok
+        last[:, mk] = np.where(ok, ts, prev)
+    taken[:, live] = out
+    return taken
+
+
+def first_true(series: MarketSeries, mask: np.ndarray) -> np.ndarray:
+    """Per market, the series row of its first True in `mask` (-1 if none)."""
+    out = np.full(len(series.market_ids), -1, dtype=np.int64)
+    idx = np.flatnonzero(mask)
+    if idx.size:
+        mk, first = np.unique(series.group[idx], return_index=True)
+        out[mk] = idx[first]
+    return out
+
+
+def hours_to_resolution(series: MarketSeries) -> np.ndarray:
+    """Hours from each snapshot to its market's resolves_at (NaN where unknown)."""
+    ts = series["ts"]
+    secs = np.where(ts == NO_TS, np.nan, ts / 1e6)
+    return (series["resolves_ts"] - secs) / 3600.0
+
+
+def entry_table(series: MarketSeries, min_div: float, max_price: float) -> Dict[str, np.ndarray]:
+    """Per market: snapshots seen, first seen / first entry (div >= min_div and
+    price <= max_price, with a fill when the series has fills) and the hours
+    to resolution at both. Entry columns are NaN (or -1) for markets never entered."""
+    ok = (series["divergence"] >= min_div) & (series["simmer_price"] <= max_price)
+    if "fill_price" in series.columns:
+        ok &= ~np.isnan(series["fill_price"])
+    entry = first_true(series, ok)
+    seen = series.offsets[:-1]
+    htr = hours_to_resolution(series)
+    has = entry >= 0
+    at = np.where(has, entry, 0)
+
+    def pick(col: np.ndarray) -> np.ndarray:
+        return np.where(has, col[at], np.nan) if len(series) else np.full(len(entry), np.nan)
+
+    out = {
+        "snapshots": series.counts,
+        "first_seen_ts": series["ts"][seen] if len(series) else np.zeros(0, dtype=np.int64),
+        "first_seen_hours": htr[seen] if len(series) else np.zeros(0),
+        "entry_row": entry,
+        "entry_ts": np.where(has, series["ts"][at], NO_TS) if len(series) else entry.copy(),
+        "entry_hours": pick(htr),
+        "entry_divergence": pick(series["divergence"]),
+        "entry_price": pick(series["simmer_price"]),
+    }
+    if "fill_price" in series.columns:
+        out["entry_fill"] = pick(series["fill_price"])
+    return out
+
+
+def _iso(us: int) -> str:
+    if us == NO_TS:
+        return "-"
+    return datetime.fromtimestamp(us / 1e6, timezone.utc).strftime("%Y-%m-%dT%H:%MZ")
+
+
+def _bench(store: SnapshotStore, repeat: int) -> None:
+    """select_trades vs select_trades_by_market on the store's candidates repeated with fresh markets."""
+    from .grid_backtest import extract_candidates, select_trades
+
+    base = extract_candidates(store, 10.0)
+    base = base.take(np.argsort(base.ts, kind="stable"))
+    if not len(base):
+        raise SystemExit("no candidates in the store")
+    span = int(base.ts.max() - base.ts.min()) + 3_600_000_000
+    n_m = len(base.market_ids)
+    n_s = int(base.snap.max()) + 1
+    parts = [base.take(np.arange(len(base))) for _ in range(repeat)]
+    for k, p in enumerate(parts):
+        p.ts = p.ts + k * span
+        p.snap = p.snap + k * n_s
+        p.market = np.where(p.market >= 0, p.market + k * n_m, -1)
+    cols = ("snap", "ts", "market", "city", "divergence", "simmer_price", "fill_price", "shares")
+    c = Candidates(
+        **{k: np.concatenate([getattr(p, k) for p in parts]) for k in cols},
+        market_ids=[f"{mid}#{k}" for k in range(repeat) for mid in base.market_ids],
+    )
+    grids = {1: ([0.10], [0.20]), 25: ([0.02, 0.04, 0.06, 0.08, 0.10], [0.10, 0.15, 0.20, 0.30, 0.50])}
+    for cap in (1, None):
+        for cells, (divs, prices) in grids.items():
+            kw = {"cooldown_minutes": 360, "max_trades_per_snapshot": cap}
+            best = {"loop": float("inf"), "by_market": float("inf")}
+            for _ in range(3):
+                t0 = time.perf_counter()
+                a = select_trades(c, divs, prices, **kw)
+                best["loop"] = min(best["loop"], time.perf_counter() - t0)
+                t0 = time.perf_counter()
+                b = select_trades_by_market(c, divs, prices, **kw)
+                best["by_market"] = min(best["by_market"], time.perf_counter() - t0)
+            print(
+                f"cap={str(cap):>4s} cells={cells:3d} picks={len(c)} trades={int(b.sum())} "
+                f"loop={best['loop'] * 1000:.1f} ms by_market={best['by_market'] * 1000:.1f} ms "
+                f"identical={np.array_equal(a, b)}"
+            )
+
+
+def main():
+    from .simlog import default_log_source
+    from .snapshot_store import DEFAULT_STORE_DIR, open_store
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("command", choices=["info", "market", "entries", "bench"])
+    ap.add_argument("market_id", nargs="?", default=None)
+    ap.add_argument("--min-div", type=float, default=0.10)
+    ap.add_argument("--max-price", type=float, default=0.20)
+    ap.add_argument("--notional", type=float, default=10.0)
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--top", type=int, default=20, help="rows to print")
+    args = ap.parse_args()
+
+    store = open_store(default_log_source(), DEFAULT_STORE_DIR)
+    if args.command == "bench":
+        _bench(store, max(1, args.repeat))
+        return
+
+    t0 = time.perf_counter()
+    series = MarketSeries.from_store(store, notional=args.notional)
+    ms = (time.perf_counter() - t0) * 1000
+    counts = series.counts
+    if args.command == "info":
+        print(
+            f"markets={len(series.market_ids)} rows={len(series)} build_ms={ms:.2f} "
+            f"snapshots/market median={np.median(counts) if len(counts) else 0:.0f} max={counts.max() if len(counts) else 0}"
+        )
+        return
+
+    if args.command == "market":
+        if args.market_id not in series.market_ids:
+            raise SystemExit(f"unknown market {args.market_id!r}")
+        m = series.market(args.market_id)
+        htr = hours_to_resolution(series)[series.slice(args.market_id)]
+        print(f"{args.market_id}: {len(m['ts'])} snapshots  {store.questions[int(m['question'][0])]}")
+        for i in range(len(m["ts"])):
+            print(
+                f"{_iso(int(m['ts'][i]))} div={m['divergence'][i]:+.3f} price={m['simmer_price'][i]:.3f} "
+                f"bid={m['best_bid'][i]:.3f} ask={m['best_ask'][i]:.3f} fill={m['fill_price'][i]:.4f} "
+                f"to_resolve={htr[i]:.1f}h"
+            )
+        return
+
+    t = entry_table(series, args.min_div, args.max_price)
+    entered = np.flatnonzero(t["entry_row"] >= 0)
+    print(
+        f"markets={len(series.market_ids)} entered={len(entered)} (div>={args.min_div:g}, price<={args.max_price:g}, "
+        f"${args.notional:g} fill)"
+    )
+    if len(entered):
+        lead = t["entry_hours"][entered]
+        wait = (t["entry_ts"][entered] - t["first_seen_ts"][entered]) / 3.6e9
+        print(
+            f"hours to resolution at entry: median={np.nanmedian(lead):.1f} min={np.nanmin(lead):.1f} max={np.nanmax(lead):.1f}; "
+            f"hours from first seen to entry: median={np.median(wait):.1f}"
+        )
+    for i in entered[np.argsort(t["entry_ts"][entered], kind="stable")][: args.top]:
+        q = store.questions[int(series["question"][series.offsets[i]])]
+        print(
+            f"{_iso(int(t['entry_ts'][i]))} {t['entry_hours'][i]:6.1f}h div={t['entry_divergence'][i]:+.3f} "
+            f"price={t['entry_price'][i]:.3f} fill={t['entry_fill'][i]:.4f} seen={t['snapshots'][i]:3d} {q[:60]}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -9,14 +9,11 @@ Key improvements:
 """
 from __future__ import annotations
 import argparse
-import json
+import math
 from dataclasses import dataclass
-from datetime import datetime, timedelta, timezone
-from pathlib import Path
+from datetime import datetime, timezone
 from typing import Optional
-from dateutil.parser import isoparse
 
-from .simmer_client import SimmerClient
 
 DEFAULT_MIN_DIV = 0.10
 DEFAULT_MAX_ENTRY_PRICE = 0.20
@@ -25,13 +22,6 @@ DEFAULT_MIN_HOURS = 12
 DEFAULT_COOLDOWN_MIN = 360
 
 
-def safe_float(x):
-    try:
-        return float(x)
-    except Exception:
-        return None
-
-
 @dataclass
 class TradeCandidate:
     market_id: str
@@ -43,43 +33,7 @@ class TradeCandidate:
     url: Optional[str]
 
 
-def load_state(state_path: Path) -> dict:
-    if state_path.exists():
-        try:
-            return json.loads(state_path.read_text("utf-8"))
-        except Exception:
-            pass
-    return {"last_trade": {}}
-
-
-def in_cooldown(mid: str, state: dict, now: datetime, cooldown: int) -> bool:
-    last = state.get("last_trade", {}).get(mid)
-    if not last:
-        return False
-    try:
-        last_dt = datetime.fromisoformat(last.replace("Z", "+00:00"))
-        cutoff = now - timedelta(minutes=cooldown)
-        return last_dt > cutoff
-    except Exception:
-        return False
-
-
-def matches_city(q: str, cities: list[str]) -> bool:
-    ql = q.lower()
-    return any(c in ql for c in cities)
-
-
-def hours_to_resolve(ts: Optional[str], now: datetime) -> float:
-    if not ts:
-        return float("inf")
-    try:
-        r = isoparse(ts)
-        return (r - now).total_seconds() / 3600
-    except Exception:
-        return float("inf")
-
-
-def main():
+def build_parser() -> argparse.ArgumentParser:
     ap = argparse.ArgumentParser()
     ap.add_argument("--limit", type=int, default=120)
     ap.add_argument("--cities", type=str, default=None)
@@ -90,87 +44,119 @@ def main():
     ap.add_argument("--amount", type=float, default=10.0)
     ap.add_argument("--max-trades", type=int, default=1)
     ap.add_argument("--cooldown-min", type=int, default=DEFAULT_COOLDOWN_MIN)
-    args = ap.parse_args()
-
-    base = Path(__file__).resolve().parent.parent
-    state_path = base / "data" / "paper_state.json"
-    state = load_state(state_path)
+    return ap
+
+
+def run_job(args, ctx=None):
+    """One executor pass; `ctx` (bot.context.JobContext) shares clients, markets and state."""
+    from .market_catalog import weather_markets
+    from .simmer_client import BatchTradeError, SimmerClient
+    from .pipeline import (
+        CityTerms,
+        HasId,
+        MarketFrame,
+        MaxPrice,
+        MaxSpread,
+        MinDivergence,
+        MinHoursToResolve,
+        NotInCooldown,
+        Pipeline,
+        SpreadAdjustedScore,
+        hours_to_resolve,
+    )
+    from .state_store import PaperStateStore
+
+    store = ctx.state if ctx else PaperStateStore()
 
     cities = [c.strip().lower() for c in (args.cities or "nyc,new york,chicago,la,los angeles,miami").split(",") if c.strip()]
     now = datetime.now(timezone.utc)
 
-    c = SimmerClient()
-    data = c.list_markets(tags="weather", limit=args.limit)
-    markets = data.get("markets", [])
+    c = ctx.simmer if ctx else SimmerClient()
+    markets = ctx.markets(args.limit) if ctx else weather_markets(c, limit=args.limit)
 
-    candidates = []
-    for m in markets:
-        q = (m.get("question") or "").strip()
-        if not matches_city(q, cities):
-            continue
+    frame = MarketFrame(markets)
+    # Rank: highest divergence, lowest spread
+    pipe = Pipeline(
+        [
+            CityTerms(cities),
+            HasId(),
+            NotInCooldown(store.last_trades(frame.ids), args.cooldown_min, now),
+            MinDivergence(args.min_div),
+            MaxPrice(args.max_price),
+            MinHoursToResolve(args.min_hours, now),
+            MaxSpread(args.max_spread),  # only where an inline orderbook has both sides
+        ],
+        rank=SpreadAdjustedScore(),
+    )
+    ranked = pipe.select(frame)
+    claimed = set(
+        store.claim([frame.ids[i] for i in ranked], args.cooldown_min, now=now.timestamp(), limit=args.max_trades, source="optimized_paper_trade")
+    )
+    hours = hours_to_resolve(frame, now)
+    picks = [
+        TradeCandidate(
+            market_id=frame.ids[i],
+            question=frame.questions[i],
+            divergence=float(frame.divergence[i]),
+            price=float(frame.price[i]),
+            spread=None if math.isnan(frame.spread[i]) else float(frame.spread[i]),
+            hours=float(hours[i]),
+            url=markets[i].get("url"),
+        )
+        for i in ranked
+        if str(frame.ids[i]) in claimed
+    ]
 
-        mid = m.get("id")
-        if not mid or in_cooldown(mid, state, now, args.cooldown_min):
-            continue
+    print(f"optimized_paper_trade: picks={len(picks)} from {len(ranked)} candidates")
+
+    error = None
+    unsent, unknown = set(), set()
+    try:
+        batch = c.trade_batch(
+            [
+                {
+                    "market_id": p.market_id,
+                    "side": "yes",
+                    "amount": args.amount,
+                    "reasoning": f"div={p.divergence:.3f} price={p.price:.3f}",
+                }
+                for p in picks
+            ],
+            venue="simmer",
+            source="sdk:optimized",
+        ) if picks else {"results": []}
+    except BatchTradeError as e:
+        error, batch = e, e.partial
+        unsent, unknown = set(e.unsent), set(e.unknown)
+    results = {r.get("market_id"): r for r in batch.get("results") or []}
 
-        div = safe_float(m.get("divergence"))
-        price = safe_float(m.get("current_probability"))
-        if div is None or price is None:
+    traded, failed = [], list(unsent)
+    for p in picks:
+        if p.market_id in unsent:
+            print(f"  - not sent: {p.question[:60]}")
             continue
-        if div < args.min_div or price > args.max_price:
+        r = results.get(p.market_id)
+        if p.market_id in unknown or r is None:
+            # may have executed: keep the claim so the cooldown still applies
+            print(f"  - unknown, left claimed: {p.question[:60]}")
             continue
-
-        hrs = hours_to_resolve(m.get("resolves_at"), now)
-        if hrs < args.min_hours:
+        if not r.get("success"):
+            print(f"  - failed: {p.question[:60]} ({r.get('error') or 'unknown'})")
+            failed.append(p.market_id)
             continue
+        traded.append(p.market_id)
+        print(f"  - traded: {p.question[:60]}")
 
-        # Spread check if orderbook available
-        spread = None
-        ob = m.get("orderbook")
-        if isinstance(ob, dict):
-            ba = safe_float(ob.get("best_ask"))
-            bb = safe_float(ob.get("best_bid"))
-            if ba is not None and bb is not None:
-                spread = ba - bb
-                if spread > args.max_spread:
-                    continue
-
-        candidates.append(TradeCandidate(
-            market_id=mid,
-            question=q,
-            divergence=div,
-            price=price,
-            spread=spread,
-            hours=hrs,
-            url=m.get("url"),
-        ))
-
-    # Rank: highest divergence, lowest spread
-    def score(tc: TradeCandidate) -> float:
-        s = tc.spread if tc.spread else 0.01
-        return tc.divergence / (tc.price * s + 0.001)
-
-    candidates.sort(key=score, reverse=True)
-    picks = candidates[: max(0, args.max_trades)]
+    store.confirm(traded)
+    store.release(failed)
+    if not ctx:
+        store.close()
+    if error is not None:
+        raise error
 
-    print(f"optimized_paper_trade: picks={len(picks)} from {len(candidates)} candidates")
 
-    trades = []
-    for p in picks:
-        r = c.trade(
-            market_id=p.market_id,
-            side="yes",
-            amount=args.amount,
-            venue="simmer",
-            reasoning=f"div={p.divergence:.3f} price={p.price:.3f}",
-            source="sdk:optimized",
-            dry_run=False,
-        )
-        trades.append({"market": p.question, "response": r})
-        print(f"  - traded: {p.question[:60]}")
-        state.setdefault("last_trade", {})[p.market_id] = now.isoformat()
-
-    state_path.write_text(json.dumps(state, indent=2), encoding="utf-8")
+def main():
+    run_job(build_parser().parse_args())
 
 
 if __name__ == "__main__":
@@ -4,7 +4,12 @@ Safety:
 - Trades are on venue="simmer" only (virtual currency).
 - Hard caps: max_trades_per_run and amount.
 - Only trades if divergence is positive (Simmer thinks probability > market yes price).
-- Avoid repeat-trading same market within a cooldown window.
+- Avoid repeat-trading same market within a cooldown window (bot.state_store;
+  picks are claimed atomically, so concurrent runs can't double up).
+- All picks go out in one /api/sdk/trades/batch request; only markets whose
+  trade succeeded start a cooldown. Markets whose outcome is unknown (the
+  request failed after it may have reached the server) stay claimed, so they
+  are not retried before the cooldown runs out.
 
 Run under op:
   SIMMER_API_KEY='op://SterlingArcherVault/Simmer API Key/password' \
@@ -14,21 +19,10 @@ Run under op:
 from __future__ import annotations
 
 import argparse
-import json
-from datetime import datetime, timedelta, timezone
-from pathlib import Path
+from datetime import datetime, timezone
 
-from .simmer_client import SimmerClient
 
-
-def safe_float(x):
-    try:
-        return float(x)
-    except Exception:
-        return None
-
-
-def main():
+def build_parser() -> argparse.ArgumentParser:
     ap = argparse.ArgumentParser()
     ap.add_argument("--limit", type=int, default=80)
     ap.add_argument("--cities", type=str, default="nyc,new york,chicago")
@@ -37,79 +31,109 @@ def main():
     ap.add_argument("--amount", type=float, default=10.0, help="$SIM notional to buy")
     ap.add_argument("--max-trades", type=int, default=1)
     ap.add_argument("--cooldown-min", type=int, default=360, help="avoid re-trading same market within cooldown")
-    args = ap.parse_args()
+    return ap
+
 
-    cities = [c.strip().lower() for c in (args.cities or "").split(",") if c.strip()]
+def run_job(args, ctx=None):
+    """One paper-trade pass; `ctx` (bot.context.JobContext) shares clients, markets and state."""
+    from .market_catalog import weather_markets
+    from .simmer_client import BatchTradeError, SimmerClient
+    from .pipeline import ByDivergence, CityTerms, HasId, MarketFrame, MaxPrice, MinDivergence, NotInCooldown, Pipeline, split_terms
+    from .state_store import PaperStateStore
 
-    base = Path(__file__).resolve().parent.parent
-    state_path = base / "data" / "paper_state.json"
-    state_path.parent.mkdir(parents=True, exist_ok=True)
-    state = {"last_trade": {}}
-    if state_path.exists():
-        try:
-            state = json.loads(state_path.read_text("utf-8"))
-        except Exception:
-            state = {"last_trade": {}}
+    store = ctx.state if ctx else PaperStateStore()
 
-    c = SimmerClient()
-    data = c.list_markets(tags="weather", limit=args.limit)
-    markets = data.get("markets", [])
+    c = ctx.simmer if ctx else SimmerClient()
+    markets = ctx.markets(args.limit) if ctx else weather_markets(c, limit=args.limit)
 
     now = datetime.now(timezone.utc)
-    cutoff = now - timedelta(minutes=args.cooldown_min)
 
-    candidates = []
-    for m in markets:
-        q = (m.get("question") or "").strip()
-        q_l = q.lower()
-        if cities and not any(t in q_l for t in cities):
-            continue
-        div = safe_float(m.get("divergence"))
-        price = safe_float(m.get("current_probability"))
-        if div is None or price is None:
-            continue
-        if div < args.min_div:
-            continue
-        if price > args.max_entry_price:
-            continue
-        market_id = m.get("id")
-        if not market_id:
-            continue
-        last = state.get("last_trade", {}).get(market_id)
-        if last:
-            try:
-                last_dt = datetime.fromisoformat(last.replace("Z", "+00:00"))
-                if last_dt > cutoff:
-                    continue
-            except Exception:
-                pass
-        candidates.append({"id": market_id, "q": q, "div": div, "price": price, "url": m.get("url")})
-
-    candidates.sort(key=lambda r: r["div"], reverse=True)
-    picks = candidates[: max(0, args.max_trades)]
+    frame = MarketFrame(markets)
+    pipe = Pipeline(
+        [
+            CityTerms(split_terms(args.cities)),
+            MinDivergence(args.min_div),
+            MaxPrice(args.max_entry_price),
+            HasId(),
+            NotInCooldown(store.last_trades(frame.ids), args.cooldown_min, now),
+        ],
+        rank=ByDivergence(),
+    )
+    ranked = pipe.select(frame)
+    # the claim re-checks cooldowns atomically, so a concurrent run can't take the same markets
+    claimed = set(
+        store.claim([frame.ids[i] for i in ranked], args.cooldown_min, now=now.timestamp(), limit=args.max_trades, source="paper_trade")
+    )
+    picks = [
+        {
+            "id": frame.ids[i],
+            "q": frame.questions[i],
+            "div": float(frame.divergence[i]),
+            "price": float(frame.price[i]),
+            "url": markets[i].get("url"),
+        }
+        for i in ranked
+        if str(frame.ids[i]) in claimed
+    ]
 
     print(f"paper_trade_at={now.isoformat().replace('+00:00','Z')} picks={len(picks)}")
 
-    trades = []
-    for p in picks:
-        reasoning = f"paper trade ($SIM): div={p['div']:+.3f} yes_price={p['price']:.3f}"
-        res = c.trade(
-            market_id=p["id"],
-            side="yes",
-            amount=float(args.amount),
+    error = None
+    unsent, unknown = set(), set()
+    try:
+        batch = c.trade_batch(
+            [
+                {
+                    "market_id": p["id"],
+                    "side": "yes",
+                    "amount": float(args.amount),
+                    "reasoning": f"paper trade ($SIM): div={p['div']:+.3f} yes_price={p['price']:.3f}",
+                }
+                for p in picks
+            ],
             venue="simmer",
-            reasoning=reasoning,
             source="sdk:weather:paper",
-            dry_run=False,
-        )
+        ) if picks else {"results": []}
+    except BatchTradeError as e:
+        error, batch = e, e.partial
+        unsent, unknown = set(e.unsent), set(e.unknown)
+    results = {r.get("market_id"): r for r in batch.get("results") or []}
+
+    trades = []
+    failed = list(unsent)
+    for p in picks:
+        if p["id"] in unsent or p["id"] in unknown:
+            state = "NOT SENT" if p["id"] in unsent else "UNKNOWN (left claimed)"
+            print(f"- {state}: div={p['div']:+.3f} price={p['price']:.3f}")
+            print(f"  {p['q']}")
+            continue
+        res = results.get(p["id"])
+        if res is None:
+            print(f"- NO RESULT (left claimed): div={p['div']:+.3f} price={p['price']:.3f}")
+            print(f"  {p['q']}")
+            continue
+        if not res.get("success"):
+            failed.append(p["id"])
+            print(f"- FAILED: div={p['div']:+.3f} price={p['price']:.3f} error={res.get('error') or 'unknown'}")
+            print(f"  {p['q']}")
+            continue
         trades.append({"market_id": p["id"], "url": p.get("url"), "question": p["q"], "amount": args.amount, "response": res})
-        state.setdefault("last_trade", {})[p["id"]] = now.isoformat().replace("+00:00", "Z")
         print(f"- TRADED: div={p['div']:+.3f} price={p['price']:.3f} amount={args.amount} $SIM")
         print(f"  {p['q']}")
         if p.get("url"):
             print(f"  {p['url']}")
 
-    state_path.write_text(json.dumps(state, indent=2), encoding="utf-8")
+    # only markets whose trade succeeded start a cooldown
+    store.confirm(t["market_id"] for t in trades)
+    store.release(failed)
+    if not ctx:
+        store.close()
+    if error is not None:
+        raise error
+
+
+def main():
+    run_job(build_parser().parse_args())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,389 @@
+"""Candidate selection shared by the scanners and executors.
+
+Every entrypoint used to run its own per-market loop: city substring test,
+safe_float on divergence/price, thresholds, cooldown, sort. Here a market
+list becomes a `MarketFrame` of typed columns once, and a `Pipeline` of
+declarative stages turns it into row indices:
+
+  frame = MarketFrame(markets)
+  idx = Pipeline([CityTerms(cities), MinDivergence(0.12), MaxPrice(0.20)],
+                 rank=ByDivergence(), top=1).select(frame)
+
+- Each filter stage is a boolean mask over the whole frame; they are ANDed,
+  so their order doesn't matter.
+- City terms are matched with one precompiled alternation over all
+  questions joined into one string (one regex pass per scan, not one
+  `in` test per term per market).
+- Ranking is a stable descending argsort, so ties keep listing order
+  exactly like `list.sort(key=..., reverse=True)` did.
+- Missing or unparseable numbers are NaN and fail every threshold.
+
+Timestamps (resolves_at, cooldown entries) are parsed once per distinct
+string. `python -m bot.pipeline --bench 50000` times the stages on
+synthetic markets.
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+SEP = "\x00"  # between questions in the joined match text
+
+
+def _f(x) -> float:
+    if x is None:  # the common miss; raising TypeError for it is the slow path
+        return np.nan
+    try:
+        return float(x)
+    except Exception:
+        return np.nan
+
+
+def _column(values: Iterable[Any], n: int) -> np.ndarray:
+    return np.fromiter((_f(v) for v in values), dtype=np.float64, count=n)
+
+
+def parse_epoch(raw: Optional[str]) -> float:
+    """Epoch seconds for an ISO-8601 string, NaN if missing, unparseable or naive."""
+    if not raw:
+        return np.nan
+    return _parse_epoch(str(raw))
+
+
+def _epoch(v) -> float:
+    return float(v) if isinstance(v, (int, float)) else parse_epoch(v)
+
+
+@lru_cache(maxsize=65536)
+def _parse_epoch(raw: str) -> float:
+    try:
+        dt = datetime.fromisoformat(raw.replace("Z", "+00:00"))
+    except ValueError:
+        from dateutil.parser import isoparse
+
+        try:
+            dt = isoparse(raw)
+        except Exception:
+            return np.nan
+    if dt.tzinfo is None:
+        return np.nan
+    return dt.timestamp()
+
+
+@lru_cache(maxsize=64)
+def _term_pattern(terms: tuple) -> "re.Pattern[str]":
+    # longest first so overlapping terms don't matter; the tail skips to the next question
+    alts = "|".join(re.escape(t) for t in sorted(set(terms), key=len, reverse=True))
+    return re.compile(f"(?:{alts})[^{SEP}]*")
+
+
+class MarketFrame:
+    """Columns for a list of market payloads (GET /markets shape)."""
+
+    def __init__(self, markets: Sequence[Dict[str, Any]]):
+        self.markets = list(markets)
+        n = len(self.markets)
+        self.ids: List[Any] = [m.get("id") for m in self.markets]
+        self.questions: List[str] = [(m.get("question") or "").strip() for m in self.markets]
+        self.token_ids: List[Optional[str]] = [
+            str(t) if t else None for t in (m.get("polymarket_token_id") for m in self.markets)
+        ]
+        self.divergence = _column((m.get("divergence") for m in self.markets), n)
+        self.price = _column((m.get("current_probability") for m in self.markets), n)
+        self.has_id = np.fromiter((bool(i) for i in self.ids), dtype=bool, count=n)
+        self.has_token = np.fromiter((t is not None for t in self.token_ids), dtype=bool, count=n)
+        self._text: Optional[tuple] = None
+        self._resolves_ts: Optional[np.ndarray] = None
+        self._spread: Optional[np.ndarray] = None
+        self._parsed: Optional[list] = None
+
+    def __len__(self) -> int:
+        return len(self.markets)
+
+    def matches(self, terms: Sequence[str]) -> np.ndarray:
+        """True where the lower-cased question contains any of `terms`."""
+        out = np.zeros(len(self), dtype=bool)
+        terms = tuple(t for t in terms if t)
+        if not terms or not len(self):
+            return out
+        if self._text is None:
+            lowered = [q.lower().replace(SEP, " ") for q in self.questions]
+            starts = np.zeros(len(lowered), dtype=np.int64)
+            np.cumsum([len(q) + 1 for q in lowered[:-1]], out=starts[1:])
+            self._text = (SEP.join(lowered), starts)
+        text, starts = self._text
+        hits = [m.start() for m in _term_pattern(terms).finditer(text)]
+        out[np.searchsorted(starts, hits, side="right") - 1] = True
+        return out
+
+    @property
+    def resolves_ts(self) -> np.ndarray:
+        if self._resolves_ts is None:
+            self._resolves_ts = np.fromiter(
+                (parse_epoch(m.get("resolves_at")) for m in self.markets), dtype=np.float64, count=len(self)
+            )
+        return self._resolves_ts
+
+    @property
+    def parsed(self) -> list:
+        """bot.questions.Question per row, memoized per market id across runs."""
+        if self._parsed is None:
+            from .questions import default_cache
+
+            self._parsed = default_cache().many(self.markets)
+        return self._parsed
+
+    @property
+    def spread(self) -> np.ndarray:
+        """best_ask - best_bid from an inline `orderbook`, NaN where absent."""
+        if self._spread is None:
+            obs = [m.get("orderbook") if isinstance(m.get("orderbook"), dict) else {} for m in self.markets]
+            ask = _column((ob.get("best_ask") for ob in obs), len(self))
+            bid = _column((ob.get("best_bid") for ob in obs), len(self))
+            self._spread = ask - bid
+        return self._spread
+
+
+# --- filter stages: mask(frame) -> bool array ---
+
+
+@dataclass(frozen=True)
+class CityTerms:
+    """Question contains one of `terms` (case-insensitive); no terms = keep all."""
+
+    terms: tuple
+
+    def __init__(self, terms: Iterable[str]):
+        object.__setattr__(self, "terms", tuple(t.strip().lower() for t in terms if t and t.strip()))
+
+    def mask(self, frame: MarketFrame) -> np.ndarray:
+        return frame.matches(self.terms) if self.terms else np.ones(len(frame), dtype=bool)
+
+
+@dataclass(frozen=True)
+class HasId:
+    def mask(self, frame: MarketFrame) -> np.ndarray:
+        return frame.has_id
+
+
+@dataclass(frozen=True)
+class HasToken:
+    def mask(self, frame: MarketFrame) -> np.ndarray:
+        return frame.has_token
+
+
+@dataclass(frozen=True)
+class MinAbsDivergence:
+    min_div: float
+
+    def mask(self, frame: MarketFrame) -> np.ndarray:
+        return np.abs(frame.divergence) >= self.min_div
+
+
+@dataclass(frozen=True)
+class MinDivergence:
+    min_div: float
+
+    def mask(self, frame: MarketFrame) -> np.ndarray:
+        return frame.divergence >= self.min_div
+
+
+@dataclass(frozen=True)
+class HasPrice:
+    def mask(self, frame: MarketFrame) -> np.ndarray:
+        return ~np.isnan(frame.price)
+
+
+@dataclass(frozen=True)
+class MaxPrice:
+    max_price: float
+
+    def mask(self, frame: MarketFrame) -> np.ndarray:
+        return frame.price <= self.max_price
+
+
+@dataclass(frozen=True)
+class MinHoursToResolve:
+    """Resolves at least `hours` after `now`; unknown resolution times pass."""
+
+    hours: float
+    now: datetime
+
+    def mask(self, frame: MarketFrame) -> np.ndarray:
+        return hours_to_resolve(frame, self.now) >= self.hours
+
+
+@dataclass(frozen=True)
+class MaxSpread:
+    """Inline orderbook spread at most `max_spread`; markets without one pass."""
+
+    max_spread: float
+
+    def mask(self, frame: MarketFrame) -> np.ndarray:
+        s = frame.spread
+        return np.isnan(s) | (s <= self.max_spread)
+
+
+@dataclass(frozen=True)
+class NotInCooldown:
+    """No entry in `last_trade` (market id -> ISO time or epoch seconds) newer
+    than `minutes` before `now`."""
+
+    last_trade: Mapping[str, str]
+    minutes: float
+    now: datetime
+
+    def __hash__(self) -> int:
+        return id(self)
+
+    def mask(self, frame: MarketFrame) -> np.ndarray:
+        if not self.last_trade:
+            return np.ones(len(frame), dtype=bool)
+        last = np.fromiter(
+            (_epoch(self.last_trade[i]) if i in self.last_trade else np.nan for i in frame.ids),
+            dtype=np.float64,
+            count=len(frame),
+        )
+        cutoff = self.now.timestamp() - self.minutes * 60
+        return ~(last > cutoff)
+
+
+def hours_to_resolve(frame: MarketFrame, now: datetime) -> np.ndarray:
+    """Hours from `now` to resolution; +inf where unknown."""
+    h = (frame.resolves_ts - now.timestamp()) / 3600
+    return np.where(np.isnan(h), np.inf, h)
+
+
+# --- rank keys: key(frame) -> float array, larger first ---
+
+
+@dataclass(frozen=True)
+class ByAbsDivergence:
+    def key(self, frame: MarketFrame) -> np.ndarray:
+        return np.abs(frame.divergence)
+
+
+@dataclass(frozen=True)
+class ByDivergence:
+    def key(self, frame: MarketFrame) -> np.ndarray:
+        return frame.divergence
+
+
+@dataclass(frozen=True)
+class SpreadAdjustedScore:
+    """divergence / (price * spread + 0.001), with a missing or zero spread counted as 0.01."""
+
+    def key(self, frame: MarketFrame) -> np.ndarray:
+        s = frame.spread
+        s = np.where(np.isnan(s) | (s == 0), 0.01, s)
+        return frame.divergence / (frame.price * s + 0.001)
+
+
+@dataclass
+class Pipeline:
+    stages: Sequence[Any]
+    rank: Optional[Any] = None
+    top: Optional[int] = None
+
+    def mask(self, frame: MarketFrame) -> np.ndarray:
+        keep = np.ones(len(frame), dtype=bool)
+        for stage in self.stages:
+            keep &= stage.mask(frame)
+        return keep
+
+    def select(self, frame: MarketFrame) -> np.ndarray:
+        """Indices of the kept rows, best first, at most `top`."""
+        idx = np.flatnonzero(self.mask(frame))
+        if self.rank is not None:
+            idx = idx[np.argsort(-self.rank.key(frame)[idx], kind="stable")]
+        if self.top is not None:
+            idx = idx[: max(0, self.top)]
+        return idx
+
+    def run(self, markets: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        frame = markets if isinstance(markets, MarketFrame) else MarketFrame(markets)
+        return [frame.markets[i] for i in self.select(frame)]
+
+
+def split_terms(raw: Optional[str]) -> List[str]:
+    return [c.strip().lower() for c in (raw or "").split(",") if c.strip()]
+
+
+def _synthetic(n: int, seed: int = 0) -> List[Dict[str, Any]]:
+    rng = np.random.default_rng(seed)
+    cities = ["New York City", "NYC", "Chicago", "Los Angeles", "Miami", "Seattle", "Boston", "Denver", "Austin"]
+    out = []
+    for i in range(n):
+        city = cities[int(rng.integers(len(cities)))]
+        lo = int(rng.integers(20, 90))
+        out.append(
+            {
+                "id": f"m{i}",
+                "question": f"Will the highest temperature in {city} be between {lo}-{lo + 1}°F on February {1 + i % 28}?",
+                "divergence": float(rng.normal(0, 0.1)),
+                "current_probability": float(rng.uniform(0, 1)),
+                "resolves_at": f"2026-02-{1 + i % 28:02d} 12:00:00Z",
+                "polymarket_token_id": str(rng.integers(1 << 62)),
+                "orderbook": {"best_bid": 0.1, "best_ask": 0.1 + float(rng.uniform(0, 0.1))} if i % 3 == 0 else None,
+            }
+        )
+    return out
+
+
+def _bench(n: int) -> None:
+    markets = _synthetic(n)
+    cities = split_terms("nyc,new york,chicago,la,los angeles,miami")
+    now = datetime(2026, 2, 10, tzinfo=timezone.utc)
+    last_trade = {f"m{i}": "2026-02-09T23:00:00Z" for i in range(0, n, 50)}
+
+    def loop():
+        out = []
+        for m in markets:
+            q = (m.get("question") or "").strip()
+            if not any(t in q.lower() for t in cities):
+                continue
+            div, price = _f(m.get("divergence")), _f(m.get("current_probability"))
+            if not (div >= 0.1 and price <= 0.2) or not m.get("id"):
+                continue
+            last = last_trade.get(m["id"])
+            if last and parse_epoch(last) > now.timestamp() - 360 * 60:
+                continue
+            out.append((div, m))
+        out.sort(key=lambda r: r[0], reverse=True)
+        return [m for _, m in out[:5]]
+
+    pipe = Pipeline(
+        [CityTerms(cities), MinDivergence(0.1), MaxPrice(0.2), HasId(), NotInCooldown(last_trade, 360, now)],
+        rank=ByDivergence(),
+        top=5,
+    )
+    for name, fn in (("per-market loop", loop), ("pipeline (incl. frame)", lambda: pipe.run(markets))):
+        best = float("inf")
+        for _ in range(3):
+            t0 = time.perf_counter()
+            res = fn()
+            best = min(best, time.perf_counter() - t0)
+        print(f"{name:24s} {best * 1000:8.1f} ms  picks={[m['id'] for m in res]}")
+    frame = MarketFrame(markets)
+    t0 = time.perf_counter()
+    pipe.select(frame)
+    print(f"{'pipeline (frame built)':24s} {(time.perf_counter() - t0) * 1000:8.1f} ms  markets={n}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--bench", type=int, default=50_000, help="number of synthetic markets")
+    args = ap.parse_args()
+    _bench(args.bench)
+
+
+if __name__ == "__main__":
+    main()
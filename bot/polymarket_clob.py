@@ -10,14 +10,25 @@ Endpoints:
 
 Gotchas:
 - /book arrays may not be sorted; always compute best bid/ask yourself.
+
+`OrderBook.curve()` is the compact form of a book's buy side that hourly_log
+stores: cumulative (notional, shares) at each ask level boundary, from which
+`curve_fill` gives the exact fill for any notional.
 """
 
 from __future__ import annotations
 
+from array import array
+from bisect import bisect_right
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional, Tuple
+from itertools import accumulate
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from .transport import Transport
 
-import requests
+CURVE_MAX_NOTIONAL = 1000.0
+CURVE_DECIMALS = 6
 
 
 @dataclass
@@ -27,15 +38,27 @@ class TopOfBook:
 
 
 class PolymarketCLOB:
-    def __init__(self, base_url: str = "https://clob.polymarket.com"):
+    def __init__(
+        self,
+        base_url: str = "https://clob.polymarket.com",
+        *,
+        transport: Optional[Transport] = None,
+        pool_maxsize: int = 8,
+    ):
         self.base_url = base_url.rstrip("/")
-        self.s = requests.Session()
-        self.s.headers.update({"User-Agent": "pm-weather-scanner/0.1", "Accept": "application/json"})
+        if transport is None:
+            from .transport import Transport
+
+            transport = Transport(
+                headers={"User-Agent": "pm-weather-scanner/0.1", "Accept": "application/json"},
+                pool_maxsize=pool_maxsize,
+            )
+        self.transport = transport
+        self.s = self.transport.session
 
     def post(self, path: str, json: Any) -> Any:
         url = f"{self.base_url}{path}"
-        r = self.s.post(url, json=json, timeout=30)
-        r.raise_for_status()
+        r = self.transport.request("POST", url, json=json, idempotent=True)  # reads only
         return r.json()
 
     def prices(self, token_ids: List[str]) -> Dict[str, Dict[str, str]]:
@@ -63,6 +86,52 @@ class PolymarketCLOB:
         return out
 
 
+class AsyncPolymarketCLOB:
+    """asyncio front-end for PolymarketCLOB.
+
+    `prices`/`books` send their 500-item chunks concurrently (bounded by
+    `max_concurrency`) and return results in request order.
+    """
+
+    def __init__(self, clob: Optional[PolymarketCLOB] = None, *, max_concurrency: int = 4, **kwargs):
+        self.clob = clob or PolymarketCLOB(pool_maxsize=max(8, max_concurrency), **kwargs)
+        import asyncio
+
+        self._sem = asyncio.Semaphore(max_concurrency)
+
+    async def post(self, path: str, json: Any) -> Any:
+        import asyncio
+
+        async with self._sem:
+            return await asyncio.to_thread(self.clob.post, path, json)
+
+    async def prices(self, token_ids: List[str]) -> Dict[str, Dict[str, str]]:
+        import asyncio
+
+        body = []
+        for tid in token_ids:
+            body.append({"token_id": str(tid), "side": "BUY"})
+            body.append({"token_id": str(tid), "side": "SELL"})
+        chunks = [body[i : i + 500] for i in range(0, len(body), 500)]
+        out: Dict[str, Dict[str, str]] = {}
+        for res in await asyncio.gather(*(self.post("/prices", json=ch) for ch in chunks)):
+            out.update(res)
+        return out
+
+    async def books(self, token_ids: List[str]) -> List[Dict[str, Any]]:
+        import asyncio
+
+        body = [{"token_id": str(t)} for t in token_ids]
+        chunks = [body[i : i + 500] for i in range(0, len(body), 500)]
+        out: List[Dict[str, Any]] = []
+        for res in await asyncio.gather(*(self.post("/books", json=ch) for ch in chunks)):
+            if isinstance(res, list):
+                out.extend(res)
+            else:
+                out.append(res)
+        return out
+
+
 def _to_float(x) -> Optional[float]:
     try:
         return float(x)
@@ -70,46 +139,177 @@ def _to_float(x) -> Optional[float]:
         return None
 
 
+def _levels(raw: Any) -> List[Tuple[float, float]]:
+    out = []
+    for lvl in raw or []:
+        p = _to_float(lvl.get("price"))
+        s = _to_float(lvl.get("size"))
+        if p is None or s is None or p <= 0 or s < 0:
+            continue
+        out.append((p, s))
+    return out
+
+
+class OrderBook:
+    """One CLOB book, parsed once.
+
+    Asks are kept best (lowest) first and bids best (highest) first as
+    array('d') columns, with prefix sums of cost (price * size) and shares, so
+    a walk for any notional or share count is a bisect plus one partial level
+    instead of a pass over the levels. Levels without a positive price or a
+    size are dropped. Sizes are in shares.
+    """
+
+    __slots__ = (
+        "token_id",
+        "ask_px",
+        "ask_sz",
+        "ask_cum_cost",
+        "ask_cum_shares",
+        "bid_px",
+        "bid_sz",
+        "bid_cum_value",
+        "bid_cum_shares",
+        "_bid_neg_px",
+    )
+
+    def __init__(self, bids=(), asks=(), token_id: Optional[str] = None):
+        self.token_id = token_id
+        asks = sorted(asks, key=lambda lvl: lvl[0])
+        bids = sorted(bids, key=lambda lvl: -lvl[0])
+        self.ask_px = array("d", (p for p, _ in asks))
+        self.ask_sz = array("d", (s for _, s in asks))
+        self.bid_px = array("d", (p for p, _ in bids))
+        self.bid_sz = array("d", (s for _, s in bids))
+        self.ask_cum_cost = array("d", accumulate((p * s for p, s in asks), initial=0.0))
+        self.ask_cum_shares = array("d", accumulate((s for _, s in asks), initial=0.0))
+        self.bid_cum_value = array("d", accumulate((p * s for p, s in bids), initial=0.0))
+        self.bid_cum_shares = array("d", accumulate((s for _, s in bids), initial=0.0))
+        self._bid_neg_px = array("d", (-p for p in self.bid_px))  # ascending, for bisect
+
+    @classmethod
+    def from_book(cls, book: Dict[str, Any]) -> "OrderBook":
+        tid = book.get("asset_id") or book.get("token_id")
+        return cls(_levels(book.get("bids")), _levels(book.get("asks")), str(tid) if tid else None)
+
+    @property
+    def best_bid(self) -> Optional[float]:
+        return self.bid_px[0] if self.bid_px else None
+
+    @property
+    def best_ask(self) -> Optional[float]:
+        return self.ask_px[0] if self.ask_px else None
+
+    @property
+    def spread(self) -> Optional[float]:
+        if not self.bid_px or not self.ask_px:
+            return None
+        return self.ask_px[0] - self.bid_px[0]
+
+    def top(self) -> TopOfBook:
+        return TopOfBook(best_bid=self.best_bid, best_ask=self.best_ask)
+
+    def depth_at_price(self, price: float, side: str = "ask") -> float:
+        """Shares available at `price` or better: asks <= price, or bids >= price."""
+        if side == "ask":
+            return self.ask_cum_shares[bisect_right(self.ask_px, price)]
+        return self.bid_cum_shares[bisect_right(self._bid_neg_px, -price)]
+
+    def buy(self, notional_usd: float) -> Optional[Tuple[float, float]]:
+        """(avg_price, shares) for spending `notional_usd` on the asks; capped at full depth."""
+        cum = self.ask_cum_cost
+        if not self.ask_px or notional_usd <= 0:
+            return None
+        k = bisect_right(cum, notional_usd) - 1  # levels fully taken
+        if k >= len(self.ask_px):
+            spent, shares = cum[-1], self.ask_cum_shares[-1]
+        else:
+            spent = float(notional_usd)
+            shares = self.ask_cum_shares[k] + (spent - cum[k]) / self.ask_px[k]
+        if shares <= 0 or spent <= 0:
+            return None
+        return (spent / shares, shares)
+
+    def buy_many(self, notionals: List[float]) -> List[Optional[Tuple[float, float]]]:
+        return [self.buy(n) for n in notionals]
+
+    def curve(self, max_notional: float = CURVE_MAX_NOTIONAL) -> Dict[str, Any]:
+        """Buy-side breakpoints for `curve_fill`: cumulative notional and shares
+        after each ask level, up to the first level reaching `max_notional`."""
+        ns: List[float] = []
+        ss: List[float] = []
+        for i in range(1, len(self.ask_cum_cost)):
+            if self.ask_sz[i - 1] <= 0:
+                continue
+            ns.append(round(self.ask_cum_cost[i], CURVE_DECIMALS))
+            ss.append(round(self.ask_cum_shares[i], CURVE_DECIMALS))
+            if ns[-1] >= max_notional:
+                break
+        complete = not ns or ns[-1] == round(self.ask_cum_cost[-1], CURVE_DECIMALS)
+        return {"notional": ns, "shares": ss, "complete": complete}
+
+    def cost_for_shares(self, shares: float) -> Optional[Tuple[float, float]]:
+        """(avg_price, cost) to buy `shares` from the asks; capped at full depth."""
+        return self._walk_shares(self.ask_px, self.ask_cum_shares, self.ask_cum_cost, shares)
+
+    def sell(self, shares: float) -> Optional[Tuple[float, float]]:
+        """(avg_price, proceeds) for selling `shares` into the bids; capped at full depth."""
+        return self._walk_shares(self.bid_px, self.bid_cum_shares, self.bid_cum_value, shares)
+
+    @staticmethod
+    def _walk_shares(px, cum_shares, cum_value, shares: float) -> Optional[Tuple[float, float]]:
+        if not px or shares <= 0:
+            return None
+        k = bisect_right(cum_shares, shares) - 1
+        if k >= len(px):
+            filled, value = cum_shares[-1], cum_value[-1]
+        else:
+            filled = float(shares)
+            value = cum_value[k] + (filled - cum_shares[k]) * px[k]
+        if filled <= 0 or value <= 0:
+            return None
+        return (value / filled, filled)
+
+
+def curve_fill(curve: Dict[str, Any], notional_usd: float) -> Optional[Tuple[float, float]]:
+    """(avg_price, shares) for buying `notional_usd` from a logged curve.
+
+    Shares are linear in notional within an ask level, so interpolating
+    between the breakpoints (with an implicit (0, 0) start) is exact. Past the
+    last breakpoint the fill is capped at full depth if the curve is
+    `complete`, and unknown (None) if it was cut at CURVE_MAX_NOTIONAL.
+    """
+    ns, ss = curve.get("notional") or [], curve.get("shares") or []
+    if len(ns) != len(ss):
+        m = min(len(ns), len(ss))
+        ns, ss = ns[:m], ss[:m]
+    n = float(notional_usd)
+    if not ns or n <= 0:
+        return None
+    k = bisect_right(ns, n)
+    if k < len(ns):
+        n0 = ns[k - 1] if k else 0.0
+        s0 = ss[k - 1] if k else 0.0
+        spent = n
+        shares = s0 + (n - n0) * (ss[k] - s0) / (ns[k] - n0)
+    elif curve.get("complete"):
+        spent, shares = float(ns[-1]), float(ss[-1])
+    else:
+        return None
+    if shares <= 0 or spent <= 0:
+        return None
+    return (spent / shares, shares)
+
+
 def best_bid_ask_from_book(book: Dict[str, Any]) -> TopOfBook:
-    bids = [_to_float(b.get("price")) for b in (book.get("bids") or [])]
-    asks = [_to_float(a.get("price")) for a in (book.get("asks") or [])]
-    bids = [b for b in bids if b is not None]
-    asks = [a for a in asks if a is not None]
-    return TopOfBook(best_bid=max(bids) if bids else None, best_ask=min(asks) if asks else None)
+    return OrderBook.from_book(book).top()
 
 
 def walk_cost_from_asks(book: Dict[str, Any], notional_usd: float) -> Optional[Tuple[float, float]]:
     """Approximate average price + shares when buying with USD notional.
 
     Uses asks levels; assumes size is in shares.
-    Returns (avg_price, shares).
+    Returns (avg_price, shares). Parse the book once with `OrderBook` when
+    walking several notionals.
     """
-    asks = book.get("asks") or []
-    levels = []
-    for a in asks:
-        p = _to_float(a.get("price"))
-        s = _to_float(a.get("size"))
-        if p is None or s is None:
-            continue
-        levels.append((p, s))
-    if not levels:
-        return None
-    # best ask first
-    levels.sort(key=lambda x: x[0])
-
-    remaining = float(notional_usd)
-    got_shares = 0.0
-    spent = 0.0
-    for price, size in levels:
-        if remaining <= 0:
-            break
-        max_cost = price * size
-        take_cost = min(max_cost, remaining)
-        take_shares = take_cost / price if price > 0 else 0.0
-        remaining -= take_cost
-        spent += take_cost
-        got_shares += take_shares
-
-    if got_shares <= 0 or spent <= 0:
-        return None
-    return (spent / got_shares, got_shares)
+    return OrderBook.from_book(book).buy(notional_usd)
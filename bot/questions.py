@@ -0,0 +1,404 @@
+"""Structured fields parsed from weather market questions.
+
+Everything downstream used to re-derive what it needed from the free-text
+question with lower() and substring tests. `parse_question` turns
+
+  "Will the highest temperature in New York City be between 46-47°F on February 14?"
+
+into a `Question(city="nyc", metric="high", kind="range", low=46, high=47,
+unit="F", month=2, day=14)` with a few precompiled patterns:
+
+- kind "range": "between 46-47°F" -> low=46, high=47 (both inclusive)
+- kind "below": "57°F or below" -> low=None, high=57
+- kind "above": "46°F or higher" -> low=46, high=None
+- kind "exact": "46°F" -> low=high=46
+
+Questions that don't fit the template still get a `city` (the same alias scan
+as before); the other fields stay None.
+
+Parsing is memoized twice: in-process per question text, and per market id in
+`QuestionCache`, a bounded JSON file (data/question_cache.json) whose entries
+carry a hash of the question so an edited question is re-parsed. Use
+`default_cache()` for the process-wide instance; it is saved at exit.
+
+Usage:
+  python -m bot.questions parse "Will the highest temperature in Chicago be 39°F or below on February 17?"
+  python -m bot.questions bench --n 50000
+  python -m bot.questions info
+"""
+
+from __future__ import annotations
+
+import argparse
+import atexit
+import fcntl
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from datetime import date
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+DEFAULT_CACHE_PATH = Path(__file__).resolve().parent.parent / "data" / "question_cache.json"
+DEFAULT_MAX_ENTRIES = 20_000
+CACHE_VERSION = 1
+
+# question substring -> canonical city key (first match wins)
+CITY_ALIASES = {
+    "new york": "nyc",
+    "nyc": "nyc",
+    "chicago": "chicago",
+    "los angeles": "la",
+    "miami": "miami",
+    "seattle": "seattle",
+    "boston": "boston",
+}
+
+MONTHS = {
+    m: i + 1
+    for i, m in enumerate(
+        ["january", "february", "march", "april", "may", "june", "july", "august", "september", "october", "november", "december"]
+    )
+}
+MONTHS.update({m[:3]: n for m, n in list(MONTHS.items())})
+MONTHS["sept"] = 9
+
+_NUM = r"-?\d+(?:\.\d+)?"
+_DEG = r"\s*°?\s*"
+QUESTION_RE = re.compile(
+    r"(?P<metric>highest|lowest|high|low)\s+temp(?:erature)?\s+in\s+(?P<city>.+?)\s+(?:be|reach|hit)\s+"
+    r"(?P<bucket>.+?)\s+on\s+(?P<month>[a-z]+)\.?\s+(?P<day>\d{1,2})(?:st|nd|rd|th)?(?:,?\s+(?P<year>\d{4}))?\s*\??\s*$",
+    re.IGNORECASE,
+)
+RANGE_RE = re.compile(rf"^(?:between\s+)?(?P<low>{_NUM}){_DEG}(?P<unit1>[fc])?\s*(?:-|–|to|and)\s*(?P<high>{_NUM}){_DEG}(?P<unit>[fc])$", re.IGNORECASE)
+BOUND_RE = re.compile(rf"^(?P<value>{_NUM}){_DEG}(?P<unit>[fc])\s+or\s+(?P<dir>below|lower|less|higher|above|more)$", re.IGNORECASE)
+EXACT_RE = re.compile(rf"^(?:exactly\s+)?(?P<value>{_NUM}){_DEG}(?P<unit>[fc])$", re.IGNORECASE)
+
+
+def city_key(text: str) -> Optional[str]:
+    """Canonical city for the first alias that occurs in `text` (CITY_ALIASES order)."""
+    t = (text or "").lower()
+    for alias, city in CITY_ALIASES.items():
+        if alias in t:
+            return city
+    return None
+
+
+@dataclass(frozen=True)
+class Question:
+    city: Optional[str] = None
+    metric: Optional[str] = None  # "high" | "low"
+    kind: Optional[str] = None  # "range" | "below" | "above" | "exact"
+    low: Optional[float] = None
+    high: Optional[float] = None
+    unit: Optional[str] = None  # "F" | "C"
+    month: Optional[int] = None
+    day: Optional[int] = None
+    year: Optional[int] = None
+
+    @property
+    def parsed(self) -> bool:
+        return self.kind is not None
+
+    @property
+    def bucket(self) -> str:
+        """Short label: "46-47F", "<=57F", ">=46F", "46F" ("?" if unparsed)."""
+        if self.kind == "range":
+            return f"{self.low:g}-{self.high:g}{self.unit}"
+        if self.kind == "below":
+            return f"<={self.high:g}{self.unit}"
+        if self.kind == "above":
+            return f">={self.low:g}{self.unit}"
+        if self.kind == "exact":
+            return f"{self.low:g}{self.unit}"
+        return "?"
+
+    def contains(self, value: float) -> bool:
+        """Whether an observed value (in `unit`, rounded as the market resolves) lands in the bucket."""
+        if not self.parsed:
+            return False
+        return (self.low is None or value >= self.low) and (self.high is None or value <= self.high)
+
+    def target_date(self, resolves_at: Optional[str] = None) -> Optional[date]:
+        """Calendar date the question is about. The year comes from the
+        question if present, else from `resolves_at` (ISO-8601)."""
+        if self.month is None or self.day is None:
+            return None
+        year = self.year
+        if year is None and resolves_at:
+            try:
+                year = int(str(resolves_at)[:4])
+                # a Dec 31 question can resolve on Jan 1
+                if self.month == 12 and str(resolves_at)[5:7] == "01":
+                    year -= 1
+            except ValueError:
+                year = None
+        if year is None:
+            return None
+        try:
+            return date(year, self.month, self.day)
+        except ValueError:
+            return None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {k: v for k, v in asdict(self).items() if v is not None}
+
+
+def _parse_bucket(text: str):
+    m = RANGE_RE.match(text)
+    if m:
+        return "range", float(m["low"]), float(m["high"]), m["unit"].upper()
+    m = BOUND_RE.match(text)
+    if m:
+        v = float(m["value"])
+        if m["dir"].lower() in ("below", "lower", "less"):
+            return "below", None, v, m["unit"].upper()
+        return "above", v, None, m["unit"].upper()
+    m = EXACT_RE.match(text)
+    if m:
+        v = float(m["value"])
+        return "exact", v, v, m["unit"].upper()
+    return None
+
+
+@lru_cache(maxsize=65536)
+def parse_question(question: str) -> Question:
+    q = (question or "").strip()
+    m = QUESTION_RE.search(q)
+    if not m:
+        return Question(city=city_key(q))
+    city = city_key(m["city"]) or city_key(q)
+    month = MONTHS.get(m["month"].lower())
+    bucket = _parse_bucket(m["bucket"].strip())
+    if bucket is None or month is None:
+        return Question(city=city)
+    kind, low, high, unit = bucket
+    return Question(
+        city=city,
+        metric="high" if m["metric"].lower().startswith("high") else "low",
+        kind=kind,
+        low=low,
+        high=high,
+        unit=unit,
+        month=month,
+        day=int(m["day"]),
+        year=int(m["year"]) if m["year"] else None,
+    )
+
+
+FIELDS = tuple(Question.__dataclass_fields__)
+
+
+def question_hash(question: str) -> int:
+    """Stable across processes (unlike hash()); only has to tell one market's edits apart."""
+    return zlib.crc32((question or "").strip().encode("utf-8"))
+
+
+class QuestionCache:
+    """market_id -> parsed Question, bounded (least recently used out) and
+    persisted as JSON. An entry is reused only while the market's question
+    text hashes the same."""
+
+    def __init__(self, path: Optional[Path] = None, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = Path(path or DEFAULT_CACHE_PATH)
+        self.max_entries = max(1, int(max_entries))
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()  # id -> (hash, Question)
+        self.dirty = False
+        self.stats = {"hits": 0, "misses": 0}
+        self._lock = threading.Lock()
+        self._touched: set = set()  # ids parsed here since the last save
+        self.entries = self._load()
+
+    def _load(self) -> "OrderedDict[str, tuple]":
+        entries: "OrderedDict[str, tuple]" = OrderedDict()
+        if not self.path.exists():
+            return entries
+        try:
+            raw = json.loads(self.path.read_text("utf-8"))
+            if raw.get("version") == CACHE_VERSION and raw.get("fields") == list(FIELDS):
+                # rows are [hash, *FIELDS]; many markets share a parse (same bucket, other day)
+                shared: Dict[tuple, Question] = {}
+                for mid, row in raw.get("entries", {}).items():
+                    key = tuple(row[1:])
+                    q = shared.get(key)
+                    if q is None:
+                        q = shared[key] = Question(*key)
+                    entries[mid] = (row[0], q)
+        except Exception:
+            return OrderedDict()
+        return entries
+
+    def _get(self, market_id: Any, question: str) -> Question:
+        # caller holds the lock
+        mid = str(market_id)
+        h = question_hash(question)
+        hit = self.entries.get(mid)
+        if hit is not None and hit[0] == h:
+            self.entries.move_to_end(mid)
+            self.stats["hits"] += 1
+            return hit[1]
+        self.stats["misses"] += 1
+        parsed = parse_question(question or "")
+        self.entries[mid] = (h, parsed)
+        self.entries.move_to_end(mid)
+        self._touched.add(mid)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        self.dirty = True
+        return parsed
+
+    def get(self, market_id: Optional[str], question: str) -> Question:
+        if not market_id:
+            return parse_question(question or "")
+        with self._lock:
+            return self._get(market_id, question)
+
+    def many(self, markets: Iterable[Dict[str, Any]]) -> List[Question]:
+        """Parsed questions for GET /markets payloads, in order."""
+        out = []
+        with self._lock:
+            for m in markets:
+                mid, q = m.get("id"), m.get("question") or ""
+                out.append(self._get(mid, q) if mid else parse_question(q))
+        return out
+
+    def save(self) -> None:
+        """Merge into the file on disk under a lock, so overlapping processes keep
+        each other's entries; ours win for the markets parsed here."""
+        with self._lock:
+            if not self.dirty:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.with_name(self.path.name + ".lock").open("a") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    merged = self._load()
+                    for mid, entry in self.entries.items():
+                        if mid in self._touched or mid not in merged:
+                            merged[mid] = entry
+                            merged.move_to_end(mid)
+                    while len(merged) > self.max_entries:
+                        merged.popitem(last=False)
+                    payload = {
+                        "version": CACHE_VERSION,
+                        "fields": list(FIELDS),
+                        "entries": {mid: [h, *(getattr(q, f) for f in FIELDS)] for mid, (h, q) in merged.items()},
+                    }
+                    fd, tmp = tempfile.mkstemp(dir=self.path.parent, prefix=self.path.name + ".", suffix=".tmp")
+                    try:
+                        with os.fdopen(fd, "w", encoding="utf-8") as f:
+                            f.write(json.dumps(payload, separators=(",", ":")))
+                        os.replace(tmp, self.path)
+                    except BaseException:
+                        try:
+                            os.unlink(tmp)
+                        except OSError:
+                            pass
+                        raise
+                finally:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+            self.entries = merged
+            self._touched.clear()
+            self.dirty = False
+
+
+_default: Optional[QuestionCache] = None
+_default_lock = threading.Lock()
+
+
+def default_cache() -> QuestionCache:
+    """Process-wide cache at DEFAULT_CACHE_PATH, saved when the process exits."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = QuestionCache()
+            atexit.register(_default.save)
+        return _default
+
+
+def _bench(n: int) -> None:
+    from .pipeline import _synthetic
+
+    markets = _synthetic(n)
+    for i, m in enumerate(markets[::3]):
+        m["question"] = f"Will the lowest temperature in Chicago be {20 + i % 40}°F or below on March {1 + i % 28}?"
+    questions = [m["question"] for m in markets]
+    unique = len(set(questions))
+
+    t0 = time.perf_counter()
+    for q in questions:
+        ql = q.lower()
+        any(t in ql for t in ("nyc", "new york", "chicago"))
+        city_key(q)
+    t_old = time.perf_counter() - t0
+
+    parse_question.cache_clear()
+    t0 = time.perf_counter()
+    parsed = [parse_question(q) for q in questions]
+    t_cold = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for q in questions:
+        parse_question(q)
+    t_text = time.perf_counter() - t0
+
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as d:
+        cache = QuestionCache(Path(d) / "q.json", max_entries=n)
+        cache.many(markets)
+        t0 = time.perf_counter()
+        cache.save()
+        t_save = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        cache = QuestionCache(Path(d) / "q.json", max_entries=n)
+        t_load = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        cache.many(markets)
+        t_id = time.perf_counter() - t0
+        size = (Path(d) / "q.json").stat().st_size
+
+    ok = sum(p.parsed for p in parsed)
+    print(f"questions={n} unique={unique} parsed={ok} ({ok / max(1, n):.1%})")
+    print(f"{'lower+substring (old)':28s} {t_old * 1000:8.1f} ms")
+    print(f"{'parse, cold':28s} {t_cold * 1000:8.1f} ms")
+    print(f"{'parse, text memo':28s} {t_text * 1000:8.1f} ms")
+    print(f"{'id cache lookup':28s} {t_id * 1000:8.1f} ms  hits={cache.stats['hits']}")
+    print(f"{'id cache save / load':28s} {t_save * 1000:8.1f} / {t_load * 1000:.1f} ms  file={size / 1024:.0f} KiB")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("parse", help="parse question strings")
+    p.add_argument("question", nargs="+")
+    p = sub.add_parser("bench", help="time parsing and cache lookups on synthetic questions")
+    p.add_argument("--n", type=int, default=50_000)
+    sub.add_parser("info", help="summarize data/question_cache.json")
+    args = ap.parse_args()
+
+    if args.cmd == "parse":
+        for q in args.question:
+            pq = parse_question(q)
+            print(json.dumps({"question": q, "bucket": pq.bucket, **pq.to_dict()}))
+    elif args.cmd == "bench":
+        _bench(args.n)
+    else:
+        cache = QuestionCache()
+        qs = [q for _, q in cache.entries.values()]
+        by_city: Dict[str, int] = {}
+        for q in qs:
+            by_city[q.city or "?"] = by_city.get(q.city or "?", 0) + 1
+        print(f"path={cache.path} entries={len(qs)}/{cache.max_entries} parsed={sum(q.parsed for q in qs)}")
+        print("cities: " + " ".join(f"{k}={v}" for k, v in sorted(by_city.items(), key=lambda kv: -kv[1])))
+
+
+if __name__ == "__main__":
+    main()
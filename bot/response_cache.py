@@ -0,0 +1,207 @@
+"""Shared on-disk TTL cache for Simmer read endpoints.
+
+Sits under `SimmerClient.get`. Entries are keyed by the client's scope (base
+URL + a hash of the API key, so agents and environments sharing the directory
+never see each other's responses), path and normalised params, and stored
+one JSON file each under data/cache/simmer/, written atomically (temp file +
+rename) so concurrent cron processes never read a torn entry.
+Only endpoints with a TTL in `ttls` are cached; everything else passes through.
+
+- LRU: hits touch the entry's mtime; once there are more than `max_entries`
+  files the least recently used are deleted.
+- stale-while-revalidate: with `stale_while_revalidate=N`, an entry up to N
+  seconds past its TTL is returned immediately while one background thread
+  (one per key across processes, via an O_EXCL claim file) refreshes it.
+- Hit/miss/stale counts per endpoint are kept per process (`summary()`) and
+  added to data/cache/simmer/stats.json by `flush_stats()` (also run at
+  exit) for TTL tuning.
+"""
+
+from __future__ import annotations
+
+import atexit
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import urlencode
+
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parent.parent / "data" / "cache" / "simmer"
+DEFAULT_TTLS = {
+    "/api/sdk/markets": 60,
+    "/api/sdk/briefing": 120,
+    "/api/sdk/agents/me": 300,
+}
+DEFAULT_MAX_ENTRIES = 256
+REFRESH_CLAIM_TTL_S = 60
+
+
+def normalize_params(params: Optional[Dict[str, Any]]) -> str:
+    items = []
+    for k, v in (params or {}).items():
+        if v is None:
+            continue
+        if isinstance(v, (list, tuple)):
+            v = ",".join(str(x) for x in v)
+        items.append((str(k), str(v)))
+    return urlencode(sorted(items))
+
+
+def endpoint_for(path: str, ttls: Dict[str, float]) -> Optional[str]:
+    path = path.split("?", 1)[0].rstrip("/")
+    best = None
+    for ep in ttls:
+        if (path == ep or path.startswith(ep + "/")) and (best is None or len(ep) > len(best)):
+            best = ep
+    return best
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        cache_dir: Optional[Path] = None,
+        *,
+        ttls: Optional[Dict[str, float]] = None,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        stale_while_revalidate: float = 0.0,
+    ):
+        self.dir = Path(cache_dir or os.environ.get("SIMMER_CACHE_DIR") or DEFAULT_CACHE_DIR)
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.max_entries = max_entries
+        self.swr = stale_while_revalidate
+        self.counts: Dict[str, Dict[str, int]] = {}
+        self._pending: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+        atexit.register(self.flush_stats)
+
+    def _count(self, endpoint: str, kind: str) -> None:
+        with self._lock:
+            for counts in (self.counts, self._pending):
+                counts.setdefault(endpoint, {"hit": 0, "stale": 0, "miss": 0})[kind] += 1
+
+    def _entry_path(self, path: str, params: Optional[Dict[str, Any]], scope: str = "") -> Path:
+        raw = f"{scope}\n{path}?{normalize_params(params)}"
+        return self.dir / (hashlib.sha1(raw.encode("utf-8")).hexdigest() + ".json")
+
+    def _read(self, p: Path) -> Optional[Dict[str, Any]]:
+        try:
+            return json.loads(p.read_text("utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, p: Path, path: str, value: Any) -> None:
+        self.dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.dir, prefix=".tmp-", suffix=".json")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"ts": time.time(), "path": path, "value": value}, f)
+            os.replace(tmp, p)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+        self._evict()
+
+    def _evict(self) -> None:
+        entries = []
+        for e in self.dir.glob("*.json"):
+            if e.name == "stats.json" or e.name.startswith(".tmp-"):
+                continue
+            try:
+                entries.append((e.stat().st_mtime, e))
+            except OSError:
+                continue
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort()
+        for _, e in entries[: len(entries) - self.max_entries]:
+            try:
+                e.unlink()
+            except OSError:
+                pass
+
+    def _revalidate(self, p: Path, path: str, fetch: Callable[[], Any]) -> None:
+        claim = p.with_suffix(".refresh")
+        try:
+            if time.time() - claim.stat().st_mtime > REFRESH_CLAIM_TTL_S:
+                claim.unlink()
+        except OSError:
+            pass
+        try:
+            os.close(os.open(claim, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            return  # another thread or process is already refreshing this key
+
+        def run():
+            try:
+                self._write(p, path, fetch())
+            except Exception:
+                pass
+            finally:
+                try:
+                    claim.unlink()
+                except OSError:
+                    pass
+
+        threading.Thread(target=run, name=f"cache-revalidate:{path}").start()
+
+    def get(self, path: str, params: Optional[Dict[str, Any]], fetch: Callable[[], Any], *, scope: str = "") -> Any:
+        """Return a cached response for (scope, path, params) or call `fetch` and store it."""
+        endpoint = endpoint_for(path, self.ttls)
+        if endpoint is None:
+            return fetch()
+        ttl = float(self.ttls[endpoint])
+        p = self._entry_path(path, params, scope)
+        entry = self._read(p)
+        if entry is not None:
+            age = time.time() - float(entry.get("ts") or 0)
+            if age <= ttl or (self.swr and age <= ttl + self.swr):
+                try:
+                    os.utime(p)
+                except OSError:
+                    pass
+                if age <= ttl:
+                    self._count(endpoint, "hit")
+                else:
+                    self._count(endpoint, "stale")
+                    self._revalidate(p, path, fetch)
+                return entry.get("value")
+        self._count(endpoint, "miss")
+        value = fetch()
+        self._write(p, path, value)
+        return value
+
+    def summary(self) -> str:
+        parts = []
+        for ep, c in sorted(self.counts.items()):
+            parts.append(f"{ep} hit={c['hit']} stale={c['stale']} miss={c['miss']}")
+        return "; ".join(parts) or "no cacheable requests"
+
+    def flush_stats(self) -> None:
+        """Add counts not yet flushed to the shared stats.json."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        self.dir.mkdir(parents=True, exist_ok=True)
+        stats_path = self.dir / "stats.json"
+        with (self.dir / "stats.lock").open("a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                total = self._read(stats_path) or {}
+                for ep, c in pending.items():
+                    t = total.setdefault(ep, {"hit": 0, "stale": 0, "miss": 0})
+                    for k, v in c.items():
+                        t[k] = t.get(k, 0) + v
+                tmp = stats_path.with_suffix(".tmp")
+                tmp.write_text(json.dumps(total, indent=2), encoding="utf-8")
+                os.replace(tmp, stats_path)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
@@ -4,8 +4,8 @@ Usage:
   python -m bot.scan_weather --limit 30
 
 Notes:
-- Uses GET /api/sdk/markets?tags=weather
-- Ranks by absolute divergence when available.
+- Uses GET /api/sdk/markets?tags=weather via the local market catalog (bot.market_catalog)
+- Ranks by absolute divergence when available (bot.pipeline).
 """
 
 from __future__ import annotations
@@ -13,10 +13,6 @@ from __future__ import annotations
 import argparse
 from datetime import datetime, timedelta, timezone
 
-from dateutil.parser import isoparse
-
-from .simmer_client import SimmerClient
-
 
 def safe_float(x):
     try:
@@ -38,6 +34,11 @@ def main():
     )
     args = ap.parse_args()
 
+    from dateutil.parser import isoparse
+
+    from .market_catalog import weather_markets
+    from .simmer_client import SimmerClient
+
     c = SimmerClient()
     me = c.me()
 
@@ -51,24 +52,16 @@ def main():
     print(f"briefing.checked_at={briefing.get('checked_at')}  high_divergence={len(hd)}")
 
     # Weather market list
-    data = c.list_markets(tags="weather", limit=args.limit)
-    markets = data.get("markets", [])
+    markets = weather_markets(c, limit=args.limit)
+
+    from .pipeline import ByAbsDivergence, CityTerms, MarketFrame, MinAbsDivergence, Pipeline, split_terms
 
-    city_terms = [c.strip().lower() for c in (args.cities or "").split(",") if c.strip()]
+    frame = MarketFrame(markets)
+    pipe = Pipeline([CityTerms(split_terms(args.cities)), MinAbsDivergence(args.min_div)], rank=ByAbsDivergence(), top=20)
 
     rows = []
-    for m in markets:
-        q = (m.get("question") or "").strip()
-        if city_terms:
-            q_l = q.lower()
-            if not any(t in q_l for t in city_terms):
-                continue
-
-        div = safe_float(m.get("divergence"))
-        if div is None:
-            continue
-        if abs(div) < args.min_div:
-            continue
+    for i in pipe.select(frame):
+        m = markets[i]
         resolves_at = m.get("resolves_at")
         try:
             resolves_dt = isoparse(resolves_at) if resolves_at else None
@@ -78,22 +71,25 @@ def main():
         rows.append(
             {
                 "id": m.get("id"),
-                "question": q,
-                "div": div,
+                "question": frame.questions[i],
+                "div": float(frame.divergence[i]),
                 "score": safe_float(m.get("opportunity_score")),
                 "price": safe_float(m.get("current_probability")),
                 "resolves_at": resolves_dt,
                 "url": m.get("url"),
+                "parsed": frame.parsed[i],
             }
         )
 
-    rows.sort(key=lambda r: abs(r["div"]), reverse=True)
-
     print("\nTop weather markets by |divergence|:\n")
-    for r in rows[: min(len(rows), 20)]:
+    for r in rows:
         ra = r["resolves_at"].isoformat() if r["resolves_at"] else "?"
         print(f"- |div|={abs(r['div']):.3f}  div={r['div']:+.3f}  price={r['price']}  score={r['score']}  resolves={ra}")
         print(f"  {r['question']}")
+        pq = r["parsed"]
+        if pq.parsed:
+            day = pq.target_date(ra if r["resolves_at"] else None) or f"{pq.month:02d}-{pq.day:02d}"
+            print(f"  [{pq.city or '?'} {pq.metric} {pq.bucket} {day}]")
         if r.get("url"):
             print(f"  {r['url']}")
 
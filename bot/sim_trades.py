@@ -1,4 +1,8 @@
-"""Simulate trades for top candidates using Simmer dry_run.
+"""Simulate trades for top candidates.
+
+For venue=polymarket fills are simulated locally from one CLOB /books call
+(see bot.execution_sim); other venues, picks without a book, and --remote use
+the Simmer dry_run endpoint.
 
 This does NOT place real trades.
 
@@ -10,9 +14,13 @@ Example:
 from __future__ import annotations
 
 import argparse
+import random
 from datetime import datetime, timezone
 
-from .simmer_client import SimmerClient
+from .simmer_client import AsyncSimmerClient
+from .market_catalog import weather_markets
+from .polymarket_clob import AsyncPolymarketCLOB, OrderBook
+from .execution_sim import FeeCache, calibration_record, should_calibrate, simulate_buys, sims_from_dry_run
 
 
 def safe_float(x):
@@ -22,45 +30,27 @@ def safe_float(x):
         return None
 
 
-def main():
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--limit", type=int, default=50)
-    ap.add_argument("--min-div", type=float, default=0.02)
-    ap.add_argument("--cities", type=str, default="nyc,new york,chicago")
-    ap.add_argument("--amount", type=float, default=5.0, help="USD amount for dry-run buy (deprecated; use --amounts)")
-    ap.add_argument("--amounts", type=str, default="2,5,10", help="comma-separated USD notionals for dry-run buys")
-    ap.add_argument("--top", type=int, default=3)
-    ap.add_argument("--venue", type=str, default="polymarket", choices=["polymarket", "simmer", "kalshi"])
-    args = ap.parse_args()
+async def run(args):
+    import asyncio
 
-    city_terms = [c.strip().lower() for c in (args.cities or "").split(",") if c.strip()]
-
-    c = SimmerClient()
-    data = c.list_markets(tags="weather", limit=args.limit)
-    markets = data.get("markets", [])
-
-    candidates = []
-    for m in markets:
-        q = (m.get("question") or "").strip()
-        if city_terms:
-            q_l = q.lower()
-            if not any(t in q_l for t in city_terms):
-                continue
-        div = safe_float(m.get("divergence"))
-        if div is None or abs(div) < args.min_div:
-            continue
-        candidates.append(
-            {
-                "id": m.get("id"),
-                "question": q,
-                "div": div,
-                "price": safe_float(m.get("current_probability")),
-                "url": m.get("url"),
-            }
-        )
+    from .pipeline import ByAbsDivergence, CityTerms, MarketFrame, MinAbsDivergence, Pipeline, split_terms
 
-    candidates.sort(key=lambda r: abs(r["div"]), reverse=True)
-    picks = candidates[: max(0, args.top)]
+    c = AsyncSimmerClient(max_concurrency=args.concurrency)
+    markets = await asyncio.to_thread(weather_markets, c.client, limit=args.limit)
+
+    frame = MarketFrame(markets)
+    pipe = Pipeline([CityTerms(split_terms(args.cities)), MinAbsDivergence(args.min_div)], rank=ByAbsDivergence(), top=args.top)
+    picks = [
+        {
+            "id": frame.ids[i],
+            "question": frame.questions[i],
+            "div": float(frame.divergence[i]),
+            "price": safe_float(markets[i].get("current_probability")),
+            "url": markets[i].get("url"),
+            "token_id": frame.token_ids[i],
+        }
+        for i in pipe.select(frame)
+    ]
 
     now = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
     print(f"sim_trades_at={now} picks={len(picks)}")
@@ -77,30 +67,79 @@ def main():
     if not amounts:
         amounts = [float(args.amount)]
 
-    for p in picks:
-        market_id = p["id"]
-        if not market_id:
-            continue
-
+    picks = [p for p in picks if p["id"]]
+
+    fees = FeeCache()
+    sims = {}
+    if args.venue == "polymarket" and not args.remote:
+        clob = AsyncPolymarketCLOB(max_concurrency=args.concurrency)
+        token_ids = [p["token_id"] for p in picks if p["token_id"]]
+        books = await clob.books(token_ids) if token_ids else []
+        by_tid = {ob.token_id: ob for ob in map(OrderBook.from_book, books) if ob.token_id}
+        for i, p in enumerate(picks):
+            book = by_tid.get(p["token_id"] or "")
+            if book is not None:
+                sims[i] = simulate_buys(book, amounts, fees.get(p["id"]))
+
+    remote = [(i, amt) for i in range(len(picks)) if i not in sims for amt in amounts]
+    cal = None
+    if sims and should_calibrate(args.calibrate_rate):
+        cal = (random.choice(sorted(sims)), random.randrange(len(amounts)))
+        remote.append((cal[0], amounts[cal[1]]))
+
+    results = await asyncio.gather(
+        *(
+            c.dry_run_trade(
+                market_id=picks[i]["id"],
+                side="yes",
+                amount=amt,
+                venue=args.venue,
+                reasoning=f"dry_run sim: divergence={picks[i]['div']:+.3f} price={picks[i]['price']} amount={amt}",
+                source="sdk:weather:dry_run",
+            )
+            for i, amt in remote
+        )
+    )
+    for k, ((i, amt), res) in enumerate(zip(remote, results)):
+        sim = sims_from_dry_run(amt, res)
+        fees.set(picks[i]["id"], sim["fee_rate_bps"])
+        if cal and k == len(remote) - 1:
+            print(f"calibration: {calibration_record(picks[i]['id'], sims[i][cal[1]], sim)}")
+        else:
+            sims.setdefault(i, []).append(sim)
+    fees.save()
+
+    for i, p in enumerate(picks):
         print(f"- {p['question']}")
         if p.get("url"):
             print(f"  {p['url']}")
         print(f"  div={p['div']:+.3f} price={p['price']}")
 
-        for amt in amounts:
-            reasoning = f"dry_run sim: divergence={p['div']:+.3f} price={p['price']} amount={amt}"
-            res = c.dry_run_trade(
-                market_id=market_id,
-                side="yes",
-                amount=amt,
-                venue=args.venue,
-                reasoning=reasoning,
-                source="sdk:weather:dry_run",
+        for sim in sims.get(i, []):
+            print(
+                f"    sim amount={sim['amount']} venue={args.venue} est_shares={sim['est_shares']} "
+                f"fee_bps={sim['fee_rate_bps']} cost={sim['cost']} source={sim['source']}"
             )
-            est_shares = res.get("shares_bought") or res.get("shares") or res.get("estimated_shares")
-            cost = res.get("cost") or res.get("amount")
-            fee_bps = res.get("fee_rate_bps")
-            print(f"    sim amount={amt} venue={args.venue} est_shares={est_shares} fee_bps={fee_bps} cost={cost}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--limit", type=int, default=50)
+    ap.add_argument("--min-div", type=float, default=0.02)
+    ap.add_argument("--cities", type=str, default="nyc,new york,chicago")
+    ap.add_argument("--amount", type=float, default=5.0, help="USD amount for dry-run buy (deprecated; use --amounts)")
+    ap.add_argument("--amounts", type=str, default="2,5,10", help="comma-separated USD notionals for dry-run buys")
+    ap.add_argument("--top", type=int, default=3)
+    ap.add_argument("--concurrency", type=int, default=4, help="max in-flight dry-run requests")
+    ap.add_argument("--venue", type=str, default="polymarket", choices=["polymarket", "simmer", "kalshi"])
+    ap.add_argument("--remote", action="store_true", help="always use the Simmer dry_run endpoint")
+    ap.add_argument("--calibrate-rate", type=float, default=0.0, help="probability of one remote calibration check")
+    args = ap.parse_args()
+    args.concurrency = max(1, args.concurrency)
+
+    import asyncio
+
+    asyncio.run(run(args))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,636 @@
+"""Segmented, dictionary-encoded sim_log with a manifest.
+
+hourly_log used to append every run to one data/sim_log.jsonl that repeats the
+same question, url, token id, resolves_at, agent and params strings every
+hour. `SimLogWriter` appends to data/sim_log/ instead:
+
+- rows go to the open segment `<YYYYMMDD>-<n>.jsonl`. It is closed when a row
+  from another UTC day arrives or it holds more than `max_bytes` of raw JSON;
+  closed segments are gzipped (`.jsonl.gz`, `.dict.gz`). The `.jsonl.gz` is a
+  series of independent gzip members of ~BLOCK_BYTES of whole lines each,
+  listed in the manifest as `blocks` ([raw offset, gz offset] pairs), so
+  bot.snapshot_index can inflate just the block holding a row (`read_block`);
+  a plain gunzip still reads the whole file;
+- the pick fields in ENCODED_PICK_FIELDS and the agent/params objects (as JSON
+  text) are stored once per segment in `<segment>.dict`, one JSON string per
+  line, and rows carry their index. `ts` stays the first key and market_id
+  stays literal, so the byte prefilters in bot/snapshot_reader.py still work;
+- manifest.json lists each segment's file, time range, row count, raw and
+  stored bytes and market ids. It is replaced atomically after every append;
+- the bot.snapshot_index sidecar (index.sqlite) is updated after every append.
+
+`iter_snapshots(<dir>)` reads this layout transparently and skips segments
+outside since/until from the manifest alone. The first append imports an
+existing data/sim_log.jsonl (the file itself is left in place), and from then
+on `default_log_source()` points the readers at the directory.
+
+`python -m bot.simlog bench --repeat 50` (the 99-row log written 50 times,
+shifted in time, Python 3.11, best of 3):
+
+  disk                 jsonl 16.2 MB -> 242 segments 2.0 MB
+  full scan            ~0.75-0.85x the jsonl rate (index lookups + inflate)
+  since=<last 10%>     opens 25 of 242 segments, on par with the jsonl ts
+                       prefilter here and independent of total history
+
+Migrating the current data/sim_log.jsonl: 323 KB -> 43 KB in 6 segments.
+
+Usage:
+  python -m bot.simlog migrate
+  python -m bot.simlog info
+  python -m bot.simlog seal
+  python -m bot.simlog reblock    # segments closed before block tables existed
+  python -m bot.simlog bench --repeat 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import bisect
+import fcntl
+import gzip
+import json
+import os
+import re
+import time
+import zlib
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from .snapshot_reader import decode_line, iter_snapshots, parse_ts_us
+
+BASE = Path(__file__).resolve().parent.parent
+DEFAULT_LOG_DIR = BASE / "data" / "sim_log"
+LEGACY_LOG_PATH = BASE / "data" / "sim_log.jsonl"
+MANIFEST_VERSION = 1
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+BLOCK_BYTES = 64 * 1024  # raw bytes per gzip member of a closed segment
+ENCODED_PICK_FIELDS = ("question", "url", "polymarket_token_id", "resolves_at")
+ENCODED_ROW_FIELDS = ("agent", "params")
+
+
+def default_log_source() -> Path:
+    """data/sim_log/ once it has a manifest, else the legacy data/sim_log.jsonl."""
+    return DEFAULT_LOG_DIR if (DEFAULT_LOG_DIR / "manifest.json").exists() else LEGACY_LOG_PATH
+
+
+def load_manifest(root: Path) -> Dict[str, Any]:
+    try:
+        return json.loads((Path(root) / "manifest.json").read_text("utf-8"))
+    except FileNotFoundError:
+        return {"version": MANIFEST_VERSION, "segments": []}
+
+
+def save_manifest(root: Path, manifest: Dict[str, Any]) -> None:
+    path = Path(root) / "manifest.json"
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=1), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def segments_in_range(manifest: Dict[str, Any], lo: Optional[int] = None, hi: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Segments that may hold rows with lo <= ts < hi (epoch µs); no ts range means keep."""
+    out = []
+    for seg in manifest.get("segments") or []:
+        first, last = seg.get("first_us"), seg.get("last_us")
+        if first is not None and ((lo is not None and last < lo) or (hi is not None and first >= hi)):
+            continue
+        out.append(seg)
+    return out
+
+
+def _lines(path: Path) -> Iterator[bytes]:
+    """Complete lines of a plain or gzipped file; a plain file's unterminated tail is not yet written.
+
+    A closed segment is inflated whole (at most one day or `max_bytes`):
+    GzipFile.readline costs more than the JSON decode on day-sized segments.
+    """
+    if path.suffix == ".gz":
+        yield from gzip.decompress(path.read_bytes()).splitlines(keepends=True)
+        return
+    with path.open("rb") as f:
+        for line in f:
+            if line.endswith(b"\n"):
+                yield line
+
+
+def _manifest_segment(root: Path, name: str) -> Dict[str, Any]:
+    seg = next((s for s in load_manifest(root).get("segments") or [] if s["name"] == name), None)
+    if seg is None:
+        raise FileNotFoundError(f"{root}: no segment {name}")
+    return seg
+
+
+def _segment_lines(root: Path, seg: Dict[str, Any]) -> Iterator[bytes]:
+    """Complete lines of segment `seg`. If the writer closed it since the manifest
+    was loaded (plain file replaced by .gz), the manifest is re-read and the
+    lines already yielded are skipped."""
+    done = 0
+    for _ in range(2):
+        try:
+            for i, line in enumerate(_lines(Path(root) / seg["file"])):
+                if i >= done:
+                    done += 1
+                    yield line
+            return
+        except FileNotFoundError:
+            seg = _manifest_segment(root, seg["name"])
+    raise FileNotFoundError(f"{root}: segment {seg['name']} moved twice while reading")
+
+
+def gzip_blocks(data: bytes, block_bytes: int = BLOCK_BYTES):
+    """(gzip bytes, [[raw_off, gz_off], ...]): `data` as one gzip member per ~block_bytes of whole lines."""
+    out: List[bytes] = []
+    blocks: List[List[int]] = []
+    raw = gz = 0
+    while raw < len(data):
+        end = data.find(b"\n", raw + block_bytes - 1)
+        end = len(data) if end < 0 else end + 1
+        member = gzip.compress(data[raw:end], compresslevel=6, mtime=0)
+        blocks.append([raw, gz])
+        out.append(member)
+        raw, gz = end, gz + len(member)
+    return b"".join(out), blocks
+
+
+def read_block(root: Path, seg: Dict[str, Any], offset: int):
+    """(raw start, bytes) of the block of closed segment `seg` holding raw byte `offset`."""
+    blocks = seg["blocks"]
+    i = bisect.bisect_right(blocks, [offset, float("inf")]) - 1
+    start = blocks[i][1]
+    stop = blocks[i + 1][1] if i + 1 < len(blocks) else None
+    with (Path(root) / seg["file"]).open("rb") as f:
+        f.seek(start)
+        member = f.read() if stop is None else f.read(stop - start)
+    return blocks[i][0], zlib.decompressobj(wbits=31).decompress(member)
+
+
+def read_strings(root: Path, seg: Dict[str, Any]) -> List[str]:
+    path = Path(root) / seg["dict"]
+    if not path.exists():
+        return []
+    # one decode for the whole dictionary instead of one json.loads per string
+    return json.loads(b"[" + b",".join(line.rstrip() for line in _lines(path) if line.strip()) + b"]")
+
+
+def encode_row(row: Dict[str, Any], ref) -> Dict[str, Any]:
+    """Copy of `row` with repeated strings replaced by `ref(string)` indices.
+
+    Non-string values of encoded pick fields are wrapped in a one-item list so
+    a literal int can't be mistaken for an index.
+    """
+    out = dict(row)
+    for k in ENCODED_ROW_FIELDS:
+        if out.get(k) is not None:
+            out[k] = ref(json.dumps(out[k], ensure_ascii=False))
+    picks = out.get("picks")
+    if isinstance(picks, list):
+        enc = []
+        for p in picks:
+            if isinstance(p, dict):
+                p = dict(p)
+                for k in ENCODED_PICK_FIELDS:
+                    v = p.get(k)
+                    if isinstance(v, str):
+                        p[k] = ref(v)
+                    elif v is not None:
+                        p[k] = [v]
+            enc.append(p)
+        out["picks"] = enc
+    return out
+
+
+def decode_row(row: Dict[str, Any], strings: List[str], skip: frozenset) -> Dict[str, Any]:
+    """Drop the `skip` fields and resolve the remaining indices in place."""
+    for k in skip & row.keys():
+        del row[k]
+    for k in ENCODED_ROW_FIELDS:
+        v = row.get(k)
+        if type(v) is int:
+            row[k] = json.loads(strings[v])
+    picks = row.get("picks")
+    if isinstance(picks, list):
+        for p in picks:
+            if not isinstance(p, dict):
+                continue
+            for k in skip & p.keys():
+                del p[k]
+            for k in ENCODED_PICK_FIELDS:
+                v = p.get(k)
+                if type(v) is int:
+                    p[k] = strings[v]
+                elif type(v) is list:
+                    p[k] = v[0]
+    return row
+
+
+def _ref_pattern(strings: List[str], needles: List[bytes]) -> Optional["re.Pattern[bytes]"]:
+    """Regex for encoded references to dictionary strings that contain a needle."""
+    hits = [
+        i
+        for i, s in enumerate(strings)
+        if any(n in json.dumps(s, ensure_ascii=False).encode("utf-8") for n in needles)
+    ]
+    if not hits:
+        return None
+    keys = "|".join(ENCODED_PICK_FIELDS + ENCODED_ROW_FIELDS)
+    refs = "|".join(str(i) for i in hits)
+    return re.compile(rf'"(?:{keys})": (?:{refs})[,}}]'.encode("ascii"))
+
+
+def iter_segmented(
+    root: Path,
+    *,
+    skip: frozenset,
+    lo: Optional[int] = None,
+    hi: Optional[int] = None,
+    needles: Optional[List[bytes]] = None,
+    resume: Optional[Dict[str, int]] = None,
+    progress: Optional[Dict[str, int]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Decoded rows of a segment directory in manifest order.
+
+    resume: {segment name: rows to skip}; segments before the first one named
+    are skipped whole. progress, if given, is filled with {segment name: rows
+    consumed} (complete lines, decodable or not) for the segments read.
+    """
+    root = Path(root)
+    segments = segments_in_range(load_manifest(root), lo, hi)
+    if resume:
+        names = [s["name"] for s in segments]
+        first = min((names.index(n) for n in resume if n in names), default=0)
+        segments = segments[first:]
+    for seg in segments:
+        name = seg["name"]
+        strings = read_strings(root, seg)
+        refs = _ref_pattern(strings, needles) if needles else None
+        skip_rows = (resume or {}).get(name, 0)
+        n = 0
+        for line in _segment_lines(root, seg):
+            raw = line.strip()
+            if not raw:
+                continue
+            n += 1
+            if n <= skip_rows:
+                continue
+            if progress is not None:
+                progress[name] = n
+            if needles and not any(x in raw for x in needles) and not (refs and refs.search(raw)):
+                continue
+            row = decode_line(raw, lo, hi)
+            if row is None:
+                continue
+            try:
+                yield decode_row(row, strings, skip)
+            except IndexError:  # a writer appended strings (or closed the segment) after we read the dictionary
+                seg = _manifest_segment(root, name)
+                strings = read_strings(root, seg)
+                yield decode_row(row, strings, skip)
+        if progress is not None:
+            progress.setdefault(name, n)
+
+
+def iter_raw_lines(root: Path) -> Iterator[bytes]:
+    """Stripped, still encoded lines of every segment in manifest order."""
+    root = Path(root)
+    for seg in load_manifest(root).get("segments") or []:
+        for line in _segment_lines(root, seg):
+            raw = line.strip()
+            if raw:
+                yield raw
+
+
+def source_signature(root: Path) -> List[List[Any]]:
+    """[[segment name, rows], ...] from the manifest; changes on every append or roll."""
+    return [[s["name"], s["rows"]] for s in load_manifest(root).get("segments") or []]
+
+
+def _day(us: Optional[int]) -> Optional[str]:
+    if us is None:
+        return None
+    return datetime.fromtimestamp(us / 1e6, timezone.utc).strftime("%Y%m%d")
+
+
+class SimLogWriter:
+    """Appends rows to a segment directory; one writer at a time via manifest.lock."""
+
+    def __init__(
+        self,
+        root: Path = DEFAULT_LOG_DIR,
+        *,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        legacy_path: Optional[Path] = LEGACY_LOG_PATH,
+        index: bool = True,
+    ):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.legacy_path = Path(legacy_path) if legacy_path else None
+        self.index = index
+
+    def append(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        """Append one row; returns the manifest entry of the segment it went to."""
+        return self.append_many([row])[-1]
+
+    def append_many(self, rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        self.root.mkdir(parents=True, exist_ok=True)
+        with (self.root / "manifest.lock").open("a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                manifest = load_manifest(self.root)
+                if not (self.root / "manifest.json").exists() and self.legacy_path and self.legacy_path.exists():
+                    manifest["imported"] = {"path": str(self.legacy_path), "at": time.time()}
+                    self._write(manifest, iter_snapshots(self.legacy_path, skip=()))
+                touched = self._write(manifest, rows)
+                if self.index:
+                    self._update_index()
+                return touched
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def seal(self) -> Optional[Dict[str, Any]]:
+        """Close and compress the open segment now; returns its entry (None if there was none)."""
+        if not (self.root / "manifest.json").exists():
+            return None
+        with (self.root / "manifest.lock").open("a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                manifest = load_manifest(self.root)
+                seg = self._open_segment(manifest)
+                if seg is not None:
+                    self._close(manifest, seg)
+                return seg
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _update_index(self) -> None:
+        """Bring the bot.snapshot_index sidecar up to the rows just written."""
+        from .snapshot_index import SnapshotIndex
+
+        idx = SnapshotIndex(self.root)
+        try:
+            idx.update()
+        finally:
+            idx.close()
+
+    @staticmethod
+    def _open_segment(manifest: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        segs = manifest.get("segments") or []
+        return segs[-1] if segs and segs[-1]["status"] == "open" else None
+
+    def _write(self, manifest: Dict[str, Any], rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        segs = manifest.setdefault("segments", [])
+        touched: List[Dict[str, Any]] = []
+        seg = self._open_segment(manifest)
+        out = strings = index = ids = None
+        try:
+            for row in rows:
+                us = parse_ts_us(row.get("ts"))
+                day = _day(us) or (seg["day"] if seg else _day(int(time.time() * 1e6)))
+                line = json.dumps(row, ensure_ascii=False)
+                if seg is not None and (seg["day"] != day or seg["raw_bytes"] >= self.max_bytes):
+                    if out is not None:
+                        out.close()
+                        out = None
+                    self._close(manifest, seg)
+                    seg = None
+                if seg is None:
+                    n = sum(1 for s in segs if s["day"] == day)
+                    name = f"{day}-{n:03d}"
+                    seg = {
+                        "name": name,
+                        "day": day,
+                        "status": "open",
+                        "file": f"{name}.jsonl",
+                        "dict": f"{name}.dict",
+                        "first_ts": None,
+                        "last_ts": None,
+                        "first_us": None,
+                        "last_us": None,
+                        "rows": 0,
+                        "raw_bytes": 0,
+                        "bytes": 0,
+                        "strings": 0,
+                        "market_ids": [],
+                    }
+                    segs.append(seg)
+                if out is None:
+                    out, strings, index = self._resume(seg)
+                    ids = set(seg["market_ids"])
+
+                new: List[str] = []
+
+                def ref(s: str) -> int:
+                    i = index.get(s)
+                    if i is None:
+                        i = index[s] = len(strings)
+                        strings.append(s)
+                        new.append(s)
+                    return i
+
+                encoded = json.dumps(encode_row(row, ref), ensure_ascii=False)
+                if new:
+                    with (self.root / seg["dict"]).open("a", encoding="utf-8") as d:
+                        d.write("".join(json.dumps(s, ensure_ascii=False) + "\n" for s in new))
+                out.write(encoded.encode("utf-8") + b"\n")
+
+                seg["rows"] += 1
+                seg["raw_bytes"] += len(line.encode("utf-8")) + 1
+                seg["strings"] = len(strings)
+                if us is not None:
+                    if seg["first_us"] is None or us < seg["first_us"]:
+                        seg["first_us"], seg["first_ts"] = us, row.get("ts")
+                    if seg["last_us"] is None or us >= seg["last_us"]:
+                        seg["last_us"], seg["last_ts"] = us, row.get("ts")
+                for p in row.get("picks") or []:
+                    if isinstance(p, dict) and p.get("market_id"):
+                        ids.add(str(p["market_id"]))
+                seg["market_ids"] = sorted(ids)
+                if not touched or touched[-1] is not seg:
+                    touched.append(seg)
+        finally:
+            if out is not None:
+                out.close()
+        for s in touched:
+            if s["status"] == "open":
+                s["bytes"] = self._stored_bytes(s)
+        save_manifest(self.root, manifest)
+        return touched
+
+    def _resume(self, seg: Dict[str, Any]):
+        """Open the segment for appending; drop a torn last line and recount rows if a writer died."""
+        path = self.root / seg["file"]
+        with path.open("ab+") as f:
+            size = f.seek(0, os.SEEK_END)
+            if size:
+                f.seek(0)
+                data = f.read()
+                keep = data.rfind(b"\n") + 1
+                if keep != size:
+                    f.truncate(keep)
+                seg["rows"] = sum(1 for line in data[:keep].split(b"\n") if line.strip())
+        strings = read_strings(self.root, seg)
+        return path.open("ab"), strings, {s: i for i, s in enumerate(strings)}
+
+    def _stored_bytes(self, seg: Dict[str, Any]) -> int:
+        return sum((self.root / seg[k]).stat().st_size for k in ("file", "dict") if (self.root / seg[k]).exists())
+
+    def _close(self, manifest: Dict[str, Any], seg: Dict[str, Any]) -> None:
+        """gzip the open segment (in blocks) and its dictionary, then point the manifest at the .gz files."""
+        old = [seg["file"], seg["dict"]]
+        for k in ("file", "dict"):
+            src = self.root / seg[k]
+            dst = src.with_name(src.name + ".gz")
+            tmp = dst.with_name(dst.name + ".tmp")
+            data = src.read_bytes() if src.exists() else b""
+            if k == "file":
+                packed, seg["blocks"] = gzip_blocks(data)
+                tmp.write_bytes(packed)
+            else:
+                with gzip.open(tmp, "wb", compresslevel=6) as g:
+                    g.write(data)
+            os.replace(tmp, dst)
+            seg[k] = dst.name
+        seg["status"] = "closed"
+        seg["bytes"] = self._stored_bytes(seg)
+        save_manifest(self.root, manifest)
+        for name in old:
+            (self.root / name).unlink(missing_ok=True)
+
+
+def reblock(root: Path = DEFAULT_LOG_DIR) -> int:
+    """Rewrite closed segments that predate block tables as blocked gzip; returns how many."""
+    root = Path(root)
+    done = 0
+    with (root / "manifest.lock").open("a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            manifest = load_manifest(root)
+            for seg in manifest.get("segments") or []:
+                if seg["status"] != "closed" or "blocks" in seg:
+                    continue
+                path = root / seg["file"]
+                packed, seg["blocks"] = gzip_blocks(gzip.decompress(path.read_bytes()))
+                tmp = path.with_name(path.name + ".tmp")
+                tmp.write_bytes(packed)
+                os.replace(tmp, path)
+                seg["bytes"] = sum((root / seg[k]).stat().st_size for k in ("file", "dict") if (root / seg[k]).exists())
+                done += 1
+            save_manifest(root, manifest)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+    return done
+
+
+def migrate(log_path: Path = LEGACY_LOG_PATH, root: Path = DEFAULT_LOG_DIR, max_bytes: int = DEFAULT_MAX_BYTES) -> Dict[str, Any]:
+    """Import a jsonl log into an empty segment directory; returns the manifest."""
+    if (Path(root) / "manifest.json").exists():
+        raise SystemExit(f"{root} already has a manifest")
+    SimLogWriter(root, max_bytes=max_bytes, legacy_path=log_path).append_many([])
+    return load_manifest(root)
+
+
+def _size(n: float) -> str:
+    return f"{n / 1e6:.2f} MB" if n >= 1e5 else f"{n / 1e3:.1f} KB"
+
+
+def _bench(log_path: Path, repeat: int) -> None:
+    """Write the log `repeat` times (shifted by the log's span each copy) both ways, then scan both."""
+    import tempfile
+    from datetime import timedelta
+
+    rows = list(iter_snapshots(log_path, skip=()))
+    stamps = [parse_ts_us(r.get("ts")) for r in rows]
+    stamps = [s for s in stamps if s is not None]
+    span = timedelta(microseconds=(max(stamps) - min(stamps)) + 3_600_000_000) if stamps else timedelta(days=1)
+
+    def shifted(k: int) -> Iterator[Dict[str, Any]]:
+        for r in rows:
+            us = parse_ts_us(r.get("ts"))
+            if us is not None:
+                ts = datetime.fromtimestamp(us / 1e6, timezone.utc) + span * k
+                r = {**r, "ts": ts.isoformat().replace("+00:00", "Z")}
+            yield r
+
+    with tempfile.TemporaryDirectory() as tmp:
+        flat = Path(tmp) / "sim_log.jsonl"
+        with flat.open("w", encoding="utf-8") as f:
+            for k in range(repeat):
+                for r in shifted(k):
+                    f.write(json.dumps(r, ensure_ascii=False) + "\n")
+        root = Path(tmp) / "sim_log"
+        writer = SimLogWriter(root, legacy_path=None, index=False)
+        t0 = time.perf_counter()
+        for k in range(repeat):
+            writer.append_many(shifted(k))
+        write_s = time.perf_counter() - t0
+        writer.seal()
+        manifest = load_manifest(root)
+        segs = manifest["segments"]
+        stored = sum(s["bytes"] for s in segs)
+        n = sum(s["rows"] for s in segs)
+        print(f"{n} rows: jsonl {_size(flat.stat().st_size)} -> {len(segs)} segments {_size(stored)} (write {write_s:.2f}s)")
+
+        last = sorted(s["last_us"] for s in segs)
+        since = last[int(len(last) * 0.9)] if last else None
+        cases = [
+            ("jsonl full scan", lambda: sum(1 for _ in iter_snapshots(flat))),
+            ("segments full scan", lambda: sum(1 for _ in iter_snapshots(root))),
+            ("jsonl since=p90", lambda: sum(1 for _ in iter_snapshots(flat, since=since))),
+            ("segments since=p90", lambda: sum(1 for _ in iter_snapshots(root, since=since))),
+        ]
+        best = {name: float("inf") for name, _ in cases}
+        got = {}
+        for _ in range(3):
+            for name, fn in cases:
+                t0 = time.perf_counter()
+                got[name] = fn()
+                best[name] = min(best[name], time.perf_counter() - t0)
+        for name, _ in cases:
+            print(f"{name:22s} rows={got[name]:6d} {best[name] * 1000:9.1f} ms {n / best[name]:10,.0f} rows/s")
+        print(f"since=p90 reads {len(segments_in_range(manifest, since))} of {len(segs)} segments")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("command", choices=["migrate", "info", "seal", "reblock", "bench"])
+    ap.add_argument("--log-dir", type=str, default=None)
+    ap.add_argument("--log-path", type=str, default=None, help="jsonl log to import / benchmark")
+    ap.add_argument("--max-mb", type=float, default=DEFAULT_MAX_BYTES / 1024 / 1024, help="roll segments past this raw size")
+    ap.add_argument("--repeat", type=int, default=50)
+    args = ap.parse_args()
+
+    root = Path(args.log_dir) if args.log_dir else DEFAULT_LOG_DIR
+    log_path = Path(args.log_path) if args.log_path else LEGACY_LOG_PATH
+    max_bytes = int(args.max_mb * 1024 * 1024)
+
+    if args.command == "bench":
+        _bench(log_path, args.repeat)
+        return
+    if args.command == "migrate":
+        t0 = time.perf_counter()
+        manifest = migrate(log_path, root, max_bytes)
+        segs = manifest["segments"]
+        print(f"migrated {log_path} -> {root}: {sum(s['rows'] for s in segs)} rows in {len(segs)} segments in {time.perf_counter() - t0:.2f}s")
+        return
+    if args.command == "seal":
+        seg = SimLogWriter(root, max_bytes=max_bytes, legacy_path=None).seal()
+        print(f"sealed {seg['name']}" if seg else "no open segment")
+        return
+    if args.command == "reblock":
+        print(f"reblocked {reblock(root)} segments")
+        return
+
+    manifest = load_manifest(root)
+    segs = manifest.get("segments") or []
+    raw = sum(s["raw_bytes"] for s in segs)
+    stored = sum(s["bytes"] for s in segs)
+    print(f"log={root} segments={len(segs)} rows={sum(s['rows'] for s in segs)} raw={_size(raw)} stored={_size(stored)}")
+    for s in segs:
+        print(
+            f"- {s['name']} {s['status']:6s} rows={s['rows']:5d} {s['first_ts']} .. {s['last_ts']} "
+            f"markets={len(s['market_ids'])} {_size(s['raw_bytes'])} -> {_size(s['bytes'])}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,45 +1,253 @@
+from __future__ import annotations
+
+import fcntl
+import hashlib
+import json
 import os
-from typing import Optional, Dict, Any
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional, Dict, Any, List
+
+from .response_cache import ResponseCache
+
+if TYPE_CHECKING:
+    from .transport import Transport
+
+DEFAULT_STATE_PATH = Path(__file__).resolve().parent.parent / "data" / "simmer_rate_state.json"
+
+# Per-key limits from the SDK docs; replaced by `rate_limits` from /agents/me when known.
+DEFAULT_RATE_LIMITS = {
+    "/api/sdk/markets": 30,
+    "/api/sdk/context": 12,
+    "/api/sdk/trade": 6,
+    "/api/sdk/trades/batch": 2,
+    "/api/sdk/trades": 30,
+    "/api/sdk/positions": 6,
+    "/api/sdk/portfolio": 3,
+    "/api/sdk/briefing": 3,
+}
+DEFAULT_REQUESTS_PER_MINUTE = 30
+BATCH_TRADE_LIMIT = 30
+DEFAULT_WINDOW_SECONDS = 60
+
+
+class BatchTradeError(RuntimeError):
+    """A /trades/batch chunk failed part-way through `trade_batch`.
+
+    `partial` is the merged response of the chunks that completed. Trades in
+    `unsent` never reached the server (or were rejected with a 4xx). Trades in
+    `unknown` were in the chunk that failed with a 5xx or a dropped connection,
+    so they may or may not have executed.
+    """
+
+    def __init__(self, message: str, *, partial: Dict[str, Any], unsent: List[str], unknown: List[str]):
+        super().__init__(message)
+        self.partial = partial
+        self.unsent = unsent
+        self.unknown = unknown
+
+
+def _never_sent(exc: Exception) -> bool:
+    """True if `exc` from a POST means the server did not act on it."""
+    import requests
+
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        return exc.response.status_code < 500
+    return isinstance(exc, requests.ConnectTimeout)
+
+
+class RateLimiter:
+    """Token bucket per endpoint family, shared across processes via a locked JSON file.
 
-import requests
+    Each family holds up to `requests_per_minute` tokens and refills continuously
+    over `window_seconds`. `acquire` blocks until a token is available instead of
+    letting the request fail with a 429. Limits are per API key, so buckets and
+    limits are kept per `scope` (SimmerClient passes its `cache_scope`: base URL
+    + key hash); clients with different keys or base URLs don't throttle each other.
+    """
+
+    def __init__(self, state_path: Optional[Path] = None, *, max_wait: float = 300.0):
+        self.state_path = Path(state_path or os.environ.get("SIMMER_RATE_STATE") or DEFAULT_STATE_PATH)
+        self.lock_path = self.state_path.with_suffix(self.state_path.suffix + ".lock")
+        self.max_wait = max_wait
+
+    @contextmanager
+    def _locked_state(self, scope: str = ""):
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        with self.lock_path.open("a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                state = {}
+                if self.state_path.exists():
+                    try:
+                        state = json.loads(self.state_path.read_text("utf-8"))
+                    except Exception:
+                        state = {}
+                state.pop("limits", None)  # unscoped layout from before keys were separated
+                state.pop("buckets", None)
+                scoped = state.setdefault("scopes", {}).setdefault(scope, {})
+                scoped.setdefault("limits", {})
+                scoped.setdefault("buckets", {})
+                yield scoped
+                tmp = self.state_path.with_suffix(self.state_path.suffix + ".tmp")
+                tmp.write_text(json.dumps(state, indent=2), encoding="utf-8")
+                os.replace(tmp, self.state_path)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _limits(state: Dict[str, Any]) -> Dict[str, Any]:
+        limits = state.get("limits") or {}
+        endpoints = {**DEFAULT_RATE_LIMITS, **(limits.get("endpoints") or {})}
+        return {
+            "endpoints": endpoints,
+            "default": limits.get("default") or DEFAULT_REQUESTS_PER_MINUTE,
+            "window": limits.get("window") or DEFAULT_WINDOW_SECONDS,
+        }
+
+    @staticmethod
+    def family(path: str, endpoints) -> str:
+        """Longest configured endpoint prefix matching `path` on a segment boundary."""
+        path = path.split("?", 1)[0].rstrip("/")
+        best = ""
+        for ep in endpoints:
+            if (path == ep or path.startswith(ep + "/")) and len(ep) > len(best):
+                best = ep
+        return best or "*"
+
+    def update_limits(self, rate_limits: Optional[Dict[str, Any]], *, scope: str = "") -> None:
+        """Store the `rate_limits` block from GET /api/sdk/agents/me for `scope`."""
+        if not isinstance(rate_limits, dict):
+            return
+        endpoints = {}
+        for ep, cfg in (rate_limits.get("endpoints") or {}).items():
+            rpm = cfg.get("requests_per_minute") if isinstance(cfg, dict) else cfg
+            try:
+                endpoints[ep.rstrip("/")] = float(rpm)
+            except Exception:
+                continue
+        with self._locked_state(scope) as state:
+            state["limits"] = {
+                "endpoints": endpoints,
+                "default": rate_limits.get("default_requests_per_minute"),
+                "window": rate_limits.get("window_seconds"),
+            }
+
+    def _try_take(self, path: str, scope: str = "") -> float:
+        """Take a token for `path` if one is available; otherwise return seconds to wait."""
+        with self._locked_state(scope) as state:
+            limits = self._limits(state)
+            fam = self.family(path, limits["endpoints"])
+            capacity = float(limits["endpoints"].get(fam, limits["default"]))
+            rate = capacity / float(limits["window"])
+            now = time.time()
+            bucket = state["buckets"].get(fam) or {"tokens": capacity, "ts": now}
+            tokens = min(capacity, bucket["tokens"] + max(0.0, now - bucket["ts"]) * rate)
+            if tokens >= 1.0:
+                state["buckets"][fam] = {"tokens": tokens - 1.0, "ts": now}
+                return 0.0
+            state["buckets"][fam] = {"tokens": tokens, "ts": now}
+            return (1.0 - tokens) / rate
+
+    def acquire(self, path: str, *, scope: str = "") -> float:
+        """Block until a request to `path` fits `scope`'s budget. Returns seconds waited."""
+        waited = 0.0
+        while True:
+            wait = self._try_take(path, scope)
+            if wait <= 0:
+                return waited
+            if waited + wait > self.max_wait:
+                raise RuntimeError(f"Rate limit wait for {path} exceeds {self.max_wait:.0f}s")
+            time.sleep(wait)
+            waited += wait
 
 
 class SimmerClient:
-    def __init__(self, api_key: Optional[str] = None, base_url: str = "https://api.simmer.markets"):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: str = "https://api.simmer.markets",
+        *,
+        rate_limiter: Optional[RateLimiter] = None,
+        rate_limit: bool = True,
+        transport: Optional[Transport] = None,
+        pool_maxsize: int = 8,
+        cache: Optional[ResponseCache] = None,
+        use_cache: bool = True,
+    ):
         self.api_key = api_key or os.environ.get("SIMMER_API_KEY")
         if not self.api_key:
             raise RuntimeError("Missing SIMMER_API_KEY env var")
         self.base_url = base_url.rstrip("/")
+        self.rate_limiter = rate_limiter or (RateLimiter() if rate_limit else None)
+        if transport is None:
+            from .transport import Transport
+
+            transport = Transport(headers=self.headers, pool_maxsize=pool_maxsize)
+        self.transport = transport
+        self.cache = cache or (ResponseCache() if use_cache else None)
+
+    @property
+    def cache_scope(self) -> str:
+        """Namespace for shared on-disk state (response cache, rate-limit buckets):
+        base URL + API key hash (the key itself never reaches disk)."""
+        key_hash = hashlib.sha256(self.api_key.encode("utf-8")).hexdigest()[:16]
+        return f"{self.base_url}|{key_hash}"
 
     @property
     def headers(self) -> Dict[str, str]:
         return {"Authorization": f"Bearer {self.api_key}"}
 
-    def get(self, path: str, params: Optional[Dict[str, Any]] = None) -> Any:
+    def _pace(self, path: str):
+        if self.rate_limiter:
+            return lambda: self.rate_limiter.acquire(path, scope=self.cache_scope)
+        return None
+
+    def _fetch(self, path: str, params: Optional[Dict[str, Any]] = None) -> Any:
         url = f"{self.base_url}{path}"
-        r = requests.get(url, headers=self.headers, params=params, timeout=30)
-        r.raise_for_status()
+        r = self.transport.request("GET", url, params=params, before_attempt=self._pace(path))
         return r.json()
 
+    def get(self, path: str, params: Optional[Dict[str, Any]] = None, *, fresh: bool = False) -> Any:
+        """GET `path`; cacheable endpoints are served from the response cache unless `fresh`."""
+        if self.cache and not fresh:
+            return self.cache.get(path, params, lambda: self._fetch(path, params), scope=self.cache_scope)
+        return self._fetch(path, params)
+
     def post(self, path: str, json: Optional[Dict[str, Any]] = None) -> Any:
         url = f"{self.base_url}{path}"
-        r = requests.post(url, headers={**self.headers, "Content-Type": "application/json"}, json=json, timeout=30)
-        r.raise_for_status()
+        r = self.transport.request(
+            "POST",
+            url,
+            headers={"Content-Type": "application/json"},
+            json=json,
+            before_attempt=self._pace(path),
+        )
         return r.json()
 
     def me(self):
-        return self.get("/api/sdk/agents/me")
+        res = self.get("/api/sdk/agents/me")
+        if self.rate_limiter and isinstance(res, dict):
+            self.rate_limiter.update_limits(res.get("rate_limits"), scope=self.cache_scope)
+        return res
 
     def list_markets(
         self,
         *,
-        status: str = "active",
+        status: Optional[str] = "active",
         tags: Optional[str] = None,
         q: Optional[str] = None,
         venue: Optional[str] = None,
+        ids: Optional[List[str]] = None,
         limit: int = 50,
     ) -> Any:
-        params: Dict[str, Any] = {"status": status, "limit": limit}
+        params: Dict[str, Any] = {"limit": limit}
+        if status:
+            params["status"] = status
+        if ids:
+            params["ids"] = ",".join(ids)
+            params["limit"] = max(limit, len(ids))
         if tags:
             params["tags"] = tags
         if q:
@@ -85,6 +293,44 @@ class SimmerClient:
             payload["source"] = source
         return self.post("/api/sdk/trade", json=payload)
 
+    def trade_batch(
+        self,
+        trades: List[Dict[str, Any]],
+        *,
+        venue: str = "simmer",
+        source: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Buy several markets via POST /api/sdk/trades/batch.
+
+        `trades` items are {"market_id", "side", "amount", "reasoning"?}. Lists
+        longer than the 30-trade API cap are sent in chunks; the merged response
+        keeps per-trade `results` in request order. Trades are independent: one
+        failure does not roll back the others. If a chunk fails, raises
+        `BatchTradeError` carrying the completed chunks' results.
+        """
+        merged: Dict[str, Any] = {"results": [], "total_cost": 0.0, "failed_count": 0, "warnings": []}
+        for i in range(0, len(trades), BATCH_TRADE_LIMIT):
+            payload: Dict[str, Any] = {"trades": trades[i : i + BATCH_TRADE_LIMIT], "venue": venue}
+            if source:
+                payload["source"] = source
+            try:
+                res = self.post("/api/sdk/trades/batch", json=payload) or {}
+            except Exception as e:
+                chunk = [str(t.get("market_id")) for t in payload["trades"]]
+                later = [str(t.get("market_id")) for t in trades[i + BATCH_TRADE_LIMIT :]]
+                sent = not _never_sent(e)
+                raise BatchTradeError(
+                    f"trade batch chunk {i // BATCH_TRADE_LIMIT + 1} failed: {e}",
+                    partial=merged,
+                    unsent=later if sent else chunk + later,
+                    unknown=chunk if sent else [],
+                ) from e
+            merged["results"].extend(res.get("results") or [])
+            merged["total_cost"] += float(res.get("total_cost") or 0.0)
+            merged["failed_count"] += int(res.get("failed_count") or 0)
+            merged["warnings"].extend(res.get("warnings") or [])
+        return merged
+
     def dry_run_trade(
         self,
         *,
@@ -104,3 +350,51 @@ class SimmerClient:
             source=source,
             dry_run=True,
         )
+
+
+class AsyncSimmerClient:
+    """asyncio front-end for SimmerClient with bounded concurrency.
+
+    Calls run on worker threads over the client's pooled transport, so rate
+    limiting and retries behave exactly as in the sync client. At most
+    `max_concurrency` requests are in flight at once.
+    """
+
+    def __init__(self, client: Optional[SimmerClient] = None, *, max_concurrency: int = 4, **kwargs):
+        self.client = client or SimmerClient(pool_maxsize=max(8, max_concurrency), **kwargs)
+        import asyncio
+
+        self._sem = asyncio.Semaphore(max_concurrency)
+
+    async def _call(self, fn, *args, **kwargs) -> Any:
+        async with self._sem:
+            import asyncio
+
+            return await asyncio.to_thread(fn, *args, **kwargs)
+
+    async def get(self, path: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        return await self._call(self.client.get, path, params=params)
+
+    async def post(self, path: str, json: Optional[Dict[str, Any]] = None) -> Any:
+        return await self._call(self.client.post, path, json=json)
+
+    async def me(self) -> Any:
+        return await self._call(self.client.me)
+
+    async def list_markets(self, **kwargs) -> Any:
+        return await self._call(self.client.list_markets, **kwargs)
+
+    async def briefing(self, since_iso: Optional[str] = None) -> Any:
+        return await self._call(self.client.briefing, since_iso)
+
+    async def trades(self, **kwargs) -> Any:
+        return await self._call(self.client.trades, **kwargs)
+
+    async def trade(self, **kwargs) -> Any:
+        return await self._call(self.client.trade, **kwargs)
+
+    async def trade_batch(self, trades: List[Dict[str, Any]], **kwargs) -> Any:
+        return await self._call(self.client.trade_batch, trades, **kwargs)
+
+    async def dry_run_trade(self, **kwargs) -> Any:
+        return await self._call(self.client.dry_run_trade, **kwargs)
@@ -0,0 +1,279 @@
+"""Streaming reader for data/sim_log.jsonl (or the data/sim_log/ segments).
+
+`iter_snapshots` walks the log through mmap and yields one decoded row at a
+time, so memory stays flat however long the log gets. Per line it:
+
+1. prefilters on raw bytes before any JSON work: the `"ts"` prefix that
+   hourly_log writes first is checked against `since`/`until`, and `contains`
+   keeps only lines holding one of the given byte strings (a market id, a
+   city name);
+2. decodes the line and drops the fields in `skip` (default: agent, params,
+   sims, url) at the top level and in each pick, so rows a consumer keeps
+   don't carry them. Cutting them out of the raw bytes before decoding was
+   tried and measured slower than letting the C decoder build them.
+
+Throughput (`python -m bot.snapshot_reader --bench`, the 99-line log repeated
+50x = 4950 lines / 16 MB, Python 3.11, best of 3):
+
+  readlines + json.loads          ~21-25k lines/s
+  iter_snapshots                  ~23-24k lines/s
+  iter_snapshots(contains=<id>)   ~220k lines/s  (1 line in 25 decoded)
+  iter_snapshots(since=<p90 ts>)  ~130-150k lines/s  (1 in 10 decoded)
+  peak memory: list of all rows 58 MB, streaming 0.02 MB
+
+`SnapshotLog` is a re-iterable view for consumers that make several passes,
+optionally in timestamp order (it only materialises and sorts the rows when a
+cheap scan of the ts prefixes finds the log out of order).
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import mmap
+import re
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+
+DEFAULT_LOG_PATH = Path(__file__).resolve().parent.parent / "data" / "sim_log.jsonl"
+DEFAULT_SKIP = frozenset({"agent", "params", "sims", "url"})
+
+TS_PREFIX = re.compile(rb'\{"ts": "([^"]*)"')
+TimeBound = Union[None, int, str, datetime]
+
+
+def parse_ts_us(ts: Optional[str]) -> Optional[int]:
+    ts = (ts or "").strip()
+    if not ts:
+        return None
+    if ts.endswith("Z"):
+        ts = ts[:-1] + "+00:00"
+    try:
+        dt = datetime.fromisoformat(ts)
+    except ValueError:
+        return None
+    return int(round(dt.timestamp() * 1_000_000))
+
+
+def _as_us(t: TimeBound) -> Optional[int]:
+    if t is None or isinstance(t, int):
+        return t
+    if isinstance(t, datetime):
+        return int(round(t.timestamp() * 1_000_000))
+    us = parse_ts_us(t)
+    if us is None:
+        raise ValueError(f"bad timestamp: {t!r}")
+    return us
+
+
+def _drop(row: Dict[str, Any], skip: frozenset) -> None:
+    for k in skip & row.keys():
+        del row[k]
+    picks = row.get("picks")
+    if isinstance(picks, list):
+        for p in picks:
+            if isinstance(p, dict):
+                for k in skip & p.keys():
+                    del p[k]
+
+
+def iter_lines(path: Path, start: int = 0, end: Optional[int] = None) -> Iterator[tuple]:
+    """(offset, line bytes without the newline) for each line in [start, end)."""
+    with Path(path).open("rb") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            return
+        with mm:
+            stop = len(mm) if end is None else min(end, len(mm))
+            pos = start
+            while pos < stop:
+                nl = mm.find(b"\n", pos, stop)
+                nxt = stop if nl < 0 else nl + 1
+                yield pos, mm[pos : nxt if nl < 0 else nl]
+                pos = nxt
+
+
+def decode_line(raw: bytes, lo: Optional[int], hi: Optional[int]) -> Optional[Dict[str, Any]]:
+    """Decode one stripped line; None if malformed or its ts is outside [lo, hi)."""
+    ts_checked = False
+    if lo is not None or hi is not None:
+        m = TS_PREFIX.match(raw)
+        if m:
+            us = parse_ts_us(m.group(1).decode("utf-8", errors="replace"))
+            if us is None or (lo is not None and us < lo) or (hi is not None and us >= hi):
+                return None
+            ts_checked = True
+    try:
+        row = json.loads(raw)
+    except ValueError:
+        return None
+    if not isinstance(row, dict):
+        return None
+    if (lo is not None or hi is not None) and not ts_checked:
+        us = parse_ts_us(row.get("ts"))
+        if us is None or (lo is not None and us < lo) or (hi is not None and us >= hi):
+            return None
+    return row
+
+
+def iter_snapshots(
+    log_path: Path = DEFAULT_LOG_PATH,
+    *,
+    skip: Iterable[str] = DEFAULT_SKIP,
+    since: TimeBound = None,
+    until: TimeBound = None,
+    contains: Optional[Iterable[Union[str, bytes]]] = None,
+    start: int = 0,
+    end: Optional[int] = None,
+    with_offsets: bool = False,
+) -> Iterator[Any]:
+    """Yield decoded rows (dicts) in file order; malformed lines are skipped.
+
+    log_path may also be a bot.simlog segment directory (rows in manifest
+    order, segments outside since/until are not opened).
+    since/until: keep rows with since <= ts < until (epoch µs, ISO string or
+    datetime). contains: keep lines that include any of these substrings.
+    start/end: byte range, `start` must be at a line boundary.
+    with_offsets: yield (offset, length, row) instead of row.
+    """
+    skip = frozenset(skip)
+    lo, hi = _as_us(since), _as_us(until)
+    needles = [n.encode("utf-8") if isinstance(n, str) else n for n in (contains or [])]
+
+    if Path(log_path).is_dir():
+        if start or end is not None or with_offsets:
+            raise ValueError(f"{log_path}: byte ranges and offsets need a jsonl log, not a segment directory")
+        from .simlog import iter_segmented
+
+        yield from iter_segmented(Path(log_path), skip=skip, lo=lo, hi=hi, needles=needles)
+        return
+
+    for offset, line in iter_lines(Path(log_path), start, end):
+        raw = line.strip()
+        if not raw:
+            continue
+        if needles and not any(n in raw for n in needles):
+            continue
+        row = decode_line(raw, lo, hi)
+        if row is None:
+            continue
+        if skip:
+            _drop(row, skip)
+        yield (offset, len(line), row) if with_offsets else row
+
+
+def is_time_ordered(log_path: Path = DEFAULT_LOG_PATH) -> bool:
+    """True if every line's ts prefix is >= the previous one (no JSON decode)."""
+    prev = b""
+    if Path(log_path).is_dir():
+        from .simlog import iter_raw_lines
+
+        lines = iter_raw_lines(Path(log_path))
+    else:
+        lines = (line for _, line in iter_lines(Path(log_path)))
+    for line in lines:
+        raw = line.strip()
+        if not raw:
+            continue
+        m = TS_PREFIX.match(raw)
+        if not m:
+            return False
+        if m.group(1) < prev:
+            return False
+        prev = m.group(1)
+    return True
+
+
+class SnapshotLog:
+    """Re-iterable `iter_snapshots` view; `ordered=True` yields rows sorted by ts."""
+
+    def __init__(self, log_path: Path = DEFAULT_LOG_PATH, *, ordered: bool = False, **opts):
+        self.path = Path(log_path)
+        self.opts = opts
+        self._sorted: Optional[List[Dict[str, Any]]] = None
+        if ordered and not is_time_ordered(self.path):
+            self._sorted = sorted(iter_snapshots(self.path, **opts), key=lambda r: r.get("ts") or "")
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        if self._sorted is not None:
+            return iter(self._sorted)
+        return iter_snapshots(self.path, **self.opts)
+
+
+def _bench(log_path: Path, repeat: int) -> None:
+    import tempfile
+    import tracemalloc
+
+    data = log_path.read_bytes()
+    with tempfile.NamedTemporaryFile(suffix=".jsonl") as tmp:
+        tmp.write(data * repeat)
+        tmp.flush()
+        path = Path(tmp.name)
+        lines = sum(1 for _ in iter_lines(path))
+        first_id = next((p.get("market_id") for r in iter_snapshots(log_path) for p in r.get("picks") or []), "")
+        stamps = sorted(r.get("ts") or "" for r in iter_snapshots(log_path))
+        recent = stamps[int(len(stamps) * 0.9)] if stamps else None
+
+        def full_decode():
+            with path.open("r", encoding="utf-8") as f:
+                return sum(1 for line in f if line.strip() and json.loads(line) is not None)
+
+        cases = [
+            ("readlines+json.loads", full_decode),
+            ("iter_snapshots", lambda: sum(1 for _ in iter_snapshots(path))),
+            ("iter_snapshots(skip=())", lambda: sum(1 for _ in iter_snapshots(path, skip=()))),
+            (f"contains={first_id[:8]}..", lambda: sum(1 for _ in iter_snapshots(path, contains=[first_id]))),
+            ("since=<last 10%>", lambda: sum(1 for _ in iter_snapshots(path, since=recent))),
+        ]
+        best = {name: float("inf") for name, _ in cases}
+        rows = {}
+        for _ in range(3):  # interleaved best-of-3, the numbers are noisy on a busy box
+            for name, fn in cases:
+                t0 = time.perf_counter()
+                rows[name] = fn()
+                best[name] = min(best[name], time.perf_counter() - t0)
+        print(f"{lines} lines, {len(data) * repeat / 1e6:.1f} MB")
+        for name, _ in cases:
+            print(f"{name:28s} rows={rows[name]:6d} {lines / best[name]:12,.0f} lines/s")
+
+        tracemalloc.start()
+        rows_all = list(iter_snapshots(path, skip=()))
+        held = tracemalloc.get_traced_memory()[1]
+        del rows_all
+        tracemalloc.reset_peak()
+        for _ in iter_snapshots(path):
+            pass
+        streamed = tracemalloc.get_traced_memory()[1] - tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print(f"peak memory: list of all rows {held / 1e6:.1f} MB, streaming {streamed / 1e6:.2f} MB")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--log-path", type=str, default=None)
+    ap.add_argument("--bench", action="store_true", help="measure throughput on the log repeated --repeat times")
+    ap.add_argument("--repeat", type=int, default=50)
+    ap.add_argument("--since", type=str, default=None)
+    ap.add_argument("--until", type=str, default=None)
+    ap.add_argument("--contains", type=str, default=None, help="comma-separated substrings")
+    args = ap.parse_args()
+
+    if args.bench:
+        _bench(Path(args.log_path) if args.log_path else DEFAULT_LOG_PATH, args.repeat)
+        return
+    from .simlog import default_log_source
+
+    log_path = Path(args.log_path) if args.log_path else default_log_source()
+    contains = [c for c in (args.contains or "").split(",") if c] or None
+    n = picks = 0
+    for row in iter_snapshots(log_path, since=args.since, until=args.until, contains=contains):
+        n += 1
+        picks += len(row.get("picks") or [])
+    print(f"rows={n} picks={picks}")
+
+
+if __name__ == "__main__":
+    main()
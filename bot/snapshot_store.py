@@ -0,0 +1,326 @@
+"""Columnar, memory-mapped store for hourly sim_log snapshots.
+
+`convert` flattens data/sim_log.jsonl into one row per pick, in file order,
+and writes each field as a fixed-width NumPy array (`<name>.npy`) plus a small
+meta.json with the string dictionaries:
+
+  snap          int32    snapshot index (row's position in the log)
+  ts            int64    snapshot time, epoch microseconds
+  market        int32    index into meta["markets"] (-1 if missing)
+  question      int32    index into meta["questions"]
+  divergence, simmer_price, best_bid, best_ask, spread, resolves_ts
+                float64  NaN where missing / unparseable
+  walk_notional, walk_avg_price, walk_shares
+                float64  shape (rows, walk_width), NaN padded
+  curve_state   int8     -1 no logged curve, 0 cut at CURVE_MAX_NOTIONAL, 1 complete
+  curve_offsets int64    (rows + 1,) row r's breakpoints are [off[r], off[r+1])
+  curve_notional, curve_shares
+                float64  flattened breakpoints of every row's ask curve
+
+`SnapshotStore` opens the arrays with mmap_mode="r" (np.memmap), so a
+backtest pays only for the pages it touches.
+
+`open_store` keeps one store per (source, since, until) under
+data/sim_log.cols/<source>-<hash>, so ranged and full runs don't rebuild each
+other's. Each build is written to a fresh generation directory and swapped in
+by replacing the `<source>-<hash>` symlink (os.replace). Readers map every
+column when they open, so a rebuild never changes files under a running
+backtest or its worker pool.
+
+The source may also be a bot.simlog segment directory; the store then records
+the rows read per segment and goes stale when the manifest moves past them.
+`since`/`until` build the store for a time range only.
+
+Usage:
+  python -m bot.snapshot_store convert
+  python -m bot.snapshot_store info
+"""
+
+from __future__ import annotations
+
+import argparse
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .snapshot_reader import DEFAULT_SKIP, TimeBound, _as_us, iter_snapshots, parse_ts_us
+
+BASE = Path(__file__).resolve().parent.parent
+DEFAULT_LOG_PATH = BASE / "data" / "sim_log.jsonl"
+DEFAULT_STORE_DIR = BASE / "data" / "sim_log.cols"
+STORE_VERSION = 2
+
+FLOAT_COLUMNS = ("divergence", "simmer_price", "best_bid", "best_ask", "spread", "resolves_ts")
+WALK_COLUMNS = ("walk_notional", "walk_avg_price", "walk_shares")
+
+
+def safe_float(x):
+    try:
+        return float(x)
+    except Exception:
+        return None
+
+
+def _f(x) -> float:
+    v = safe_float(x)
+    return np.nan if v is None else v
+
+
+def _resolves_ts(raw: Optional[str]) -> float:
+    us = parse_ts_us((raw or "").replace(" ", "T"))
+    return np.nan if us is None else us / 1_000_000
+
+
+def convert(
+    log_path: Path = DEFAULT_LOG_PATH,
+    store_dir: Optional[Path] = None,
+    *,
+    since: TimeBound = None,
+    until: TimeBound = None,
+) -> Dict[str, Any]:
+    """Rebuild the columnar store for `log_path` (rows with since <= ts < until) as `store_dir`
+    (default: its `store_path`). Returns meta."""
+    log_path = Path(log_path)
+    if store_dir is None:
+        store_dir = store_path(log_path, DEFAULT_STORE_DIR, since, until)
+    lo, hi = _as_us(since), _as_us(until)
+    markets: Dict[str, int] = {}
+    questions: Dict[str, int] = {}
+    cols: Dict[str, List[Any]] = {k: [] for k in ("snap", "ts", "market", "question", *FLOAT_COLUMNS)}
+    walks: List[List[Any]] = []
+    snap_ts: List[int] = []
+    curve_state: List[int] = []
+    curve_offsets: List[int] = [0]
+    curve_notional: List[float] = []
+    curve_shares: List[float] = []
+
+    progress: Dict[str, int] = {}
+    if log_path.is_dir():
+        from .simlog import iter_segmented, source_signature
+
+        signature = source_signature(log_path)
+        snaps = iter_segmented(log_path, skip=DEFAULT_SKIP, lo=lo, hi=hi, progress=progress)
+    else:
+        snaps = iter_snapshots(log_path, since=lo, until=hi)
+
+    for snap in snaps:
+        ts = parse_ts_us(snap.get("ts"))
+        snap_idx = len(snap_ts)
+        snap_ts.append(ts if ts is not None else np.iinfo(np.int64).min)
+        picks = snap.get("picks") or []
+        if not isinstance(picks, list):
+            continue
+        for p in picks:
+            if not isinstance(p, dict):
+                continue
+            mid = p.get("market_id")
+            q = p.get("question") or ""
+            ob = p.get("orderbook") if isinstance(p.get("orderbook"), dict) else {}
+            cols["snap"].append(snap_idx)
+            cols["ts"].append(snap_ts[-1])
+            cols["market"].append(markets.setdefault(mid, len(markets)) if mid else -1)
+            cols["question"].append(questions.setdefault(q, len(questions)))
+            cols["divergence"].append(_f(p.get("divergence")))
+            cols["simmer_price"].append(_f(p.get("simmer_price")))
+            cols["best_bid"].append(_f(ob.get("best_bid")))
+            cols["best_ask"].append(_f(ob.get("best_ask")))
+            cols["spread"].append(_f(ob.get("spread")))
+            cols["resolves_ts"].append(_resolves_ts(p.get("resolves_at")))
+            row_walks = ob.get("walks")
+            walks.append(
+                [
+                    (_f((w or {}).get("notional")), _f((w or {}).get("avg_price")), _f((w or {}).get("shares")))
+                    for w in (row_walks if isinstance(row_walks, list) else [])
+                ]
+            )
+            curve = ob.get("curve")
+            if isinstance(curve, dict):
+                ns, ss = curve.get("notional") or [], curve.get("shares") or []
+                curve_state.append(1 if curve.get("complete") else 0)
+                curve_notional.extend(_f(x) for x in ns[: len(ss)])
+                curve_shares.extend(_f(x) for x in ss[: len(ns)])
+            else:
+                curve_state.append(-1)
+            curve_offsets.append(len(curve_notional))
+
+    n = len(cols["snap"])
+    width = max((len(w) for w in walks), default=0)
+    arrays: Dict[str, np.ndarray] = {
+        "snap": np.asarray(cols["snap"], dtype=np.int32),
+        "ts": np.asarray(cols["ts"], dtype=np.int64),
+        "market": np.asarray(cols["market"], dtype=np.int32),
+        "question": np.asarray(cols["question"], dtype=np.int32),
+        "snap_ts": np.asarray(snap_ts, dtype=np.int64),
+        "curve_state": np.asarray(curve_state, dtype=np.int8),
+        "curve_offsets": np.asarray(curve_offsets, dtype=np.int64),
+        "curve_notional": np.asarray(curve_notional, dtype=np.float64),
+        "curve_shares": np.asarray(curve_shares, dtype=np.float64),
+    }
+    for k in FLOAT_COLUMNS:
+        arrays[k] = np.asarray(cols[k], dtype=np.float64)
+    for i, k in enumerate(WALK_COLUMNS):
+        a = np.full((n, width), np.nan, dtype=np.float64)
+        for r, ws in enumerate(walks):
+            for j, w in enumerate(ws):
+                a[r, j] = w[i]
+        arrays[k] = a
+
+    if log_path.is_dir():
+        # rows actually read per segment; segments outside the range keep their manifest count
+        source = {"path": str(log_path), "segments": [[name, progress.get(name, rows)] for name, rows in signature]}
+    else:
+        st = log_path.stat()
+        source = {"path": str(log_path), "size": st.st_size, "mtime": st.st_mtime}
+    source.update(since=lo, until=hi)
+    meta = {
+        "version": STORE_VERSION,
+        "rows": n,
+        "snapshots": len(snap_ts),
+        "walk_width": width,
+        "source": source,
+        "markets": sorted(markets, key=markets.get),
+        "questions": sorted(questions, key=questions.get),
+    }
+    _publish(Path(store_dir), arrays, meta)
+    return meta
+
+
+def store_path(log_path: Path, root: Path = DEFAULT_STORE_DIR, since: TimeBound = None, until: TimeBound = None) -> Path:
+    """The store directory (a symlink to its current generation) for one source and range."""
+    log_path = Path(log_path).resolve()
+    key = f"{log_path}|{_as_us(since)}|{_as_us(until)}"
+    return Path(root) / f"{log_path.name.split('.')[0]}-{hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]}"
+
+
+def _publish(link: Path, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]) -> None:
+    """Write a new generation next to `link` and point `link` at it atomically."""
+    link.parent.mkdir(parents=True, exist_ok=True)
+    with (link.parent / f"{link.name}.lock").open("a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            for legacy in [*link.parent.glob("*.npy"), link.parent / "meta.json"]:
+                legacy.unlink(missing_ok=True)  # a single store written in place by older versions
+            gen = Path(tempfile.mkdtemp(dir=link.parent, prefix=f"{link.name}.gen-"))
+            for k, a in arrays.items():
+                np.save(gen / f"{k}.npy", a)
+            (gen / "meta.json").write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+            tmp_link = link.parent / f".{link.name}.link-{os.getpid()}"
+            if tmp_link.is_symlink():
+                tmp_link.unlink()
+            os.symlink(gen.name, tmp_link)
+            os.replace(tmp_link, link)
+            # Open readers keep their mappings of unlinked files. The previous generation
+            # stays one more round for readers that resolved the link but haven't mapped yet.
+            old = sorted((p for p in link.parent.glob(f"{link.name}.gen-*") if p != gen), key=lambda p: p.stat().st_mtime)
+            for stale in old[:-1]:
+                shutil.rmtree(stale, ignore_errors=True)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+class SnapshotStore:
+    """Read-only view over a converted store; columns are np.memmap arrays."""
+
+    def __init__(self, store_dir: Path):
+        for attempt in range(3):
+            # pin one generation: a rebuild may swap the link and drop this one meanwhile
+            self.dir = Path(store_dir).resolve()
+            try:
+                self.meta = json.loads((self.dir / "meta.json").read_text("utf-8"))
+                if self.meta.get("version") != STORE_VERSION:
+                    break
+                self._cols: Dict[str, np.ndarray] = {
+                    p.stem: np.load(p, mmap_mode="r") for p in sorted(self.dir.glob("*.npy"))
+                }
+                break
+            except FileNotFoundError:
+                if attempt == 2:
+                    raise
+        if self.meta.get("version") != STORE_VERSION:
+            raise RuntimeError(f"{self.dir}: store version {self.meta.get('version')} != {STORE_VERSION}; reconvert")
+        self.markets: List[str] = self.meta["markets"]
+        self.questions: List[str] = self.meta["questions"]
+
+    def __len__(self) -> int:
+        return int(self.meta["rows"])
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self._cols[name]
+
+    def is_stale(self, log_path: Path, since: TimeBound = None, until: TimeBound = None) -> bool:
+        src = self.meta.get("source") or {}
+        if (src.get("since"), src.get("until")) != (_as_us(since), _as_us(until)):
+            return True
+        if Path(log_path).is_dir():
+            from .simlog import source_signature
+
+            return src.get("segments") != source_signature(Path(log_path))
+        try:
+            st = Path(log_path).stat()
+        except OSError:
+            return False
+        return src.get("size") != st.st_size or src.get("mtime") != st.st_mtime
+
+
+def open_store(
+    log_path: Path = DEFAULT_LOG_PATH,
+    store_dir: Path = DEFAULT_STORE_DIR,
+    *,
+    since: TimeBound = None,
+    until: TimeBound = None,
+) -> SnapshotStore:
+    """Open the store for `log_path` and range under `store_dir`, (re)converting first if missing or out of date."""
+    path = store_path(log_path, store_dir, since, until)
+    try:
+        store = SnapshotStore(path)
+        if not store.is_stale(log_path, since, until):
+            return store
+    except (OSError, ValueError, KeyError, RuntimeError):
+        pass
+    convert(log_path, path, since=since, until=until)
+    return SnapshotStore(path)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("command", choices=["convert", "info"])
+    ap.add_argument("--log-path", type=str, default=None)
+    ap.add_argument("--store-dir", type=str, default=None)
+    ap.add_argument("--since", type=str, default=None, help="only snapshots at or after this ISO time")
+    ap.add_argument("--until", type=str, default=None, help="only snapshots before this ISO time")
+    args = ap.parse_args()
+
+    from .simlog import default_log_source
+
+    log_path = Path(args.log_path) if args.log_path else default_log_source()
+    store_dir = store_path(log_path, Path(args.store_dir) if args.store_dir else DEFAULT_STORE_DIR, args.since, args.until)
+
+    if args.command == "convert":
+        t0 = time.perf_counter()
+        meta = convert(log_path, store_dir, since=args.since, until=args.until)
+        print(f"converted {log_path} -> {store_dir} rows={meta['rows']} snapshots={meta['snapshots']} in {time.perf_counter() - t0:.3f}s")
+        return
+
+    t0 = time.perf_counter()
+    store = SnapshotStore(store_dir)
+    ts = store["ts"]
+    ms = (time.perf_counter() - t0) * 1000
+    print(f"store={store_dir} rows={len(store)} snapshots={store.meta['snapshots']} markets={len(store.markets)} open_ms={ms:.2f}")
+    if len(store):
+        first = datetime.fromtimestamp(ts[0] / 1e6, timezone.utc).isoformat()
+        last = datetime.fromtimestamp(ts[-1] / 1e6, timezone.utc).isoformat()
+        src = store.meta.get("source") or {}
+        print(f"range {first} .. {last} stale={store.is_stale(log_path, src.get('since'), src.get('until'))} dir={store.dir}")
+
+
+if __name__ == "__main__":
+    main()
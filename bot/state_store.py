@@ -0,0 +1,310 @@
+"""Paper-trading state (per-market cooldowns) in SQLite.
+
+paper_trade and optimized_paper_trade used to read all of
+data/paper_state.json, add to `last_trade` and rewrite the whole file with no
+locking, so two runs in the same minute could trade the same market and the
+last writer dropped the other's entries. Nothing was ever evicted, and the two
+scripts wrote different timestamp formats.
+
+`PaperStateStore` keeps one row per market in data/paper_state.sqlite (WAL
+mode, so readers never block the writer):
+
+- timestamps are epoch seconds (REAL), whatever wrote them;
+- `last_trades(ids)` looks up just the given markets by primary key;
+- `claim(ids, cooldown_min)` takes, in one `BEGIN IMMEDIATE` transaction, the
+  first ids not in cooldown and marks them traded now (pending), so a
+  concurrent run can't pick the same markets. `confirm` keeps a claim once
+  the trade succeeded, and `release` puts back the previous timestamp when
+  it failed;
+- rows older than `ttl_s` (default 7 days, well past any cooldown) are
+  deleted as part of each claim, using the ts index; that includes claims
+  left pending by a run that died before confirming.
+
+The first open imports data/paper_state.json if it exists (recorded in the
+`meta` table, so it happens once); the JSON file is left as it was.
+
+Usage:
+  python -m bot.state_store info
+  python -m bot.state_store export            # JSON with ISO ...Z timestamps
+  python -m bot.state_store bench --n 100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+DEFAULT_STATE_DB_PATH = DATA_DIR / "paper_state.sqlite"
+LEGACY_JSON_PATH = DATA_DIR / "paper_state.json"
+DEFAULT_TTL_S = 7 * 86400.0
+IDS_PER_QUERY = 500  # stays under SQLite's bound-parameter limit
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS last_trade (
+    market_id TEXT PRIMARY KEY,
+    ts REAL NOT NULL,
+    source TEXT,
+    pending INTEGER NOT NULL DEFAULT 0,
+    prev_ts REAL
+);
+CREATE INDEX IF NOT EXISTS idx_last_trade_ts ON last_trade(ts);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def iso_to_epoch(raw: Any) -> Optional[float]:
+    """Epoch seconds for either timestamp format the JSON state used (`...Z` or
+    `+00:00`); naive times are taken as UTC."""
+    if isinstance(raw, (int, float)):
+        return float(raw)
+    try:
+        dt = datetime.fromisoformat(str(raw).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def epoch_to_iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def _chunks(ids: Sequence[str]) -> Iterable[Sequence[str]]:
+    for i in range(0, len(ids), IDS_PER_QUERY):
+        yield ids[i : i + IDS_PER_QUERY]
+
+
+class PaperStateStore:
+    def __init__(self, path: Optional[Path] = None, *, ttl_s: float = DEFAULT_TTL_S, legacy_json: Optional[Path] = LEGACY_JSON_PATH):
+        self.path = Path(path or DEFAULT_STATE_DB_PATH)
+        self.ttl_s = ttl_s
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # autocommit; writes take explicit BEGIN IMMEDIATE transactions
+        self.db = sqlite3.connect(str(self.path), timeout=30, isolation_level=None, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        self._lock = threading.RLock()
+        if legacy_json is not None:
+            self.migrate_json(Path(legacy_json))
+
+    def close(self) -> None:
+        self.db.close()
+
+    @contextmanager
+    def _tx(self):
+        """One write transaction; BEGIN IMMEDIATE takes the write lock up front
+        so a concurrent run waits (busy timeout) instead of failing mid-way."""
+        with self._lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.db
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+            self.db.execute("COMMIT")
+
+    def migrate_json(self, path: Path) -> int:
+        """Import `last_trade` from a paper_state.json once; returns rows imported."""
+        with self._lock:
+            key = f"migrated:{path.resolve()}"
+            if self.db.execute("SELECT 1 FROM meta WHERE key = ?", (key,)).fetchone():
+                return 0
+            rows = []
+            if path.exists():
+                try:
+                    state = json.loads(path.read_text("utf-8"))
+                except Exception:
+                    state = {}
+                for mid, raw in (state.get("last_trade") or {}).items():
+                    ts = iso_to_epoch(raw)
+                    if mid and ts is not None:
+                        rows.append((str(mid), ts, "json"))
+            with self._tx() as db:
+                # keep whichever is newer if the store already has the market
+                db.executemany(
+                    "INSERT INTO last_trade (market_id, ts, source) VALUES (?, ?, ?) "
+                    "ON CONFLICT(market_id) DO UPDATE SET ts = MAX(ts, excluded.ts)",
+                    rows,
+                )
+                db.execute("INSERT OR IGNORE INTO meta (key, value) VALUES (?, ?)", (key, str(len(rows))))
+            return len(rows)
+
+    def last_trades(self, market_ids: Iterable[Any]) -> Dict[str, float]:
+        """market id -> last trade epoch for those of `market_ids` that have one."""
+        ids = list(dict.fromkeys(str(m) for m in market_ids if m))
+        out: Dict[str, float] = {}
+        with self._lock:
+            for chunk in _chunks(ids):
+                q = f"SELECT market_id, ts FROM last_trade WHERE market_id IN ({','.join('?' * len(chunk))})"
+                out.update(self.db.execute(q, chunk).fetchall())
+        return out
+
+    def last_trade(self, market_id: str) -> Optional[float]:
+        return self.last_trades([market_id]).get(str(market_id))
+
+    def claim(
+        self,
+        market_ids: Sequence[Any],
+        cooldown_min: float,
+        *,
+        now: Optional[float] = None,
+        limit: Optional[int] = None,
+        source: Optional[str] = None,
+    ) -> List[str]:
+        """Atomically take up to `limit` of `market_ids` (in order) whose last
+        trade is older than `cooldown_min`, stamping them `now` as pending."""
+        now = time.time() if now is None else float(now)
+        cutoff = now - cooldown_min * 60
+        ids = list(dict.fromkeys(str(m) for m in market_ids if m))
+        with self._tx() as db:
+            db.execute("DELETE FROM last_trade WHERE ts < ?", (now - self.ttl_s,))
+            last = self.last_trades(ids)
+            taken = [m for m in ids if not last.get(m, float("-inf")) > cutoff]
+            if limit is not None:
+                taken = taken[: max(0, limit)]
+            db.executemany(
+                "INSERT INTO last_trade (market_id, ts, source, pending, prev_ts) VALUES (?, ?, ?, 1, ?) "
+                "ON CONFLICT(market_id) DO UPDATE SET ts = excluded.ts, source = excluded.source, "
+                "pending = 1, prev_ts = excluded.prev_ts",
+                [(m, now, source, last.get(m)) for m in taken],
+            )
+        return taken
+
+    def confirm(self, market_ids: Iterable[Any]) -> None:
+        """Keep claims whose trades went through."""
+        rows = [(str(m),) for m in market_ids if m]
+        with self._tx() as db:
+            db.executemany("UPDATE last_trade SET pending = 0, prev_ts = NULL WHERE market_id = ? AND pending = 1", rows)
+
+    def release(self, market_ids: Iterable[Any]) -> None:
+        """Undo claims whose trades failed: restore the previous timestamp, or
+        drop the row if the market had none."""
+        rows = [(str(m),) for m in market_ids if m]
+        with self._tx() as db:
+            db.executemany("DELETE FROM last_trade WHERE market_id = ? AND pending = 1 AND prev_ts IS NULL", rows)
+            db.executemany("UPDATE last_trade SET ts = prev_ts, pending = 0, prev_ts = NULL WHERE market_id = ? AND pending = 1", rows)
+
+    def record(self, market_ids: Iterable[Any], *, now: Optional[float] = None, source: Optional[str] = None) -> None:
+        """Mark markets traded at `now` without a claim."""
+        now = time.time() if now is None else float(now)
+        rows = [(str(m), now, source) for m in market_ids if m]
+        with self._tx() as db:
+            db.executemany(
+                "INSERT INTO last_trade (market_id, ts, source) VALUES (?, ?, ?) "
+                "ON CONFLICT(market_id) DO UPDATE SET ts = excluded.ts, source = excluded.source, pending = 0, prev_ts = NULL",
+                rows,
+            )
+
+    def evict(self, now: Optional[float] = None) -> int:
+        now = time.time() if now is None else float(now)
+        with self._tx() as db:
+            return db.execute("DELETE FROM last_trade WHERE ts < ?", (now - self.ttl_s,)).rowcount
+
+    def export(self) -> Dict[str, Any]:
+        """The old paper_state.json shape, with ISO `...Z` timestamps."""
+        with self._lock:
+            rows = self.db.execute("SELECT market_id, ts FROM last_trade ORDER BY ts").fetchall()
+        return {"last_trade": {mid: epoch_to_iso(ts) for mid, ts in rows}}
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            n, pending, oldest, newest = self.db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(pending), 0), MIN(ts), MAX(ts) FROM last_trade"
+            ).fetchone()
+            migrated = self.db.execute("SELECT key, value FROM meta WHERE key LIKE 'migrated:%'").fetchall()
+        return {
+            "path": str(self.path),
+            "markets": n,
+            "pending": pending,
+            "oldest": epoch_to_iso(oldest) if oldest is not None else None,
+            "newest": epoch_to_iso(newest) if newest is not None else None,
+            "ttl_s": self.ttl_s,
+            "migrated": {k.split(":", 1)[1]: int(v) for k, v in migrated},
+        }
+
+
+def _bench(n: int) -> None:
+    import random
+    import tempfile
+
+    rng = random.Random(0)
+    now = time.time()
+    history = {f"m{i}": epoch_to_iso(now - rng.uniform(0, 6 * 86400)) for i in range(n)}
+    candidates = [f"m{rng.randrange(n * 2)}" for _ in range(80)]
+
+    with tempfile.TemporaryDirectory() as d:
+        json_path = Path(d) / "paper_state.json"
+        json_path.write_text(json.dumps({"last_trade": history}, indent=2), encoding="utf-8")
+
+        t0 = time.perf_counter()
+        state = json.loads(json_path.read_text("utf-8"))
+        cutoff = now - 360 * 60
+        free = [m for m in candidates if not (iso_to_epoch(state["last_trade"].get(m, "1970-01-01T00:00:00Z")) > cutoff)]
+        for m in free[:3]:
+            state["last_trade"][m] = epoch_to_iso(now)
+        json_path.write_text(json.dumps(state, indent=2), encoding="utf-8")
+        t_json = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        store = PaperStateStore(Path(d) / "state.sqlite", legacy_json=json_path)
+        t_migrate = time.perf_counter() - t0
+
+        best = float("inf")
+        for k in range(5):
+            t0 = time.perf_counter()
+            taken = store.claim(candidates, 360, now=now + k, limit=3, source="bench")
+            store.confirm(taken)
+            best = min(best, time.perf_counter() - t0)
+        store.close()
+
+    print(f"history={n} candidates={len(candidates)}")
+    print(f"{'json read+check+rewrite':26s} {t_json * 1000:8.2f} ms")
+    print(f"{'sqlite claim+confirm':26s} {best * 1000:8.2f} ms")
+    print(f"{'one-time json migration':26s} {t_migrate * 1000:8.2f} ms")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--db", type=str, default=None, help=f"default {DEFAULT_STATE_DB_PATH}")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("info", help="row counts, oldest/newest trade, migrations")
+    sub.add_parser("export", help="print the state as paper_state.json-shaped JSON")
+    p = sub.add_parser("migrate", help="import a paper_state.json (once per path)")
+    p.add_argument("json_path", nargs="?", default=str(LEGACY_JSON_PATH))
+    sub.add_parser("evict", help="delete entries older than the TTL")
+    p = sub.add_parser("bench", help="compare with rewriting the JSON file")
+    p.add_argument("--n", type=int, default=100_000)
+    args = ap.parse_args()
+
+    if args.cmd == "bench":
+        _bench(args.n)
+        return
+    store = PaperStateStore(Path(args.db) if args.db else None, legacy_json=None if args.cmd == "migrate" else LEGACY_JSON_PATH)
+    try:
+        if args.cmd == "info":
+            print(json.dumps(store.info(), indent=2))
+        elif args.cmd == "export":
+            print(json.dumps(store.export(), indent=2))
+        elif args.cmd == "migrate":
+            print(f"imported {store.migrate_json(Path(args.json_path))} entries from {args.json_path}")
+        else:
+            print(f"evicted {store.evict()} entries")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
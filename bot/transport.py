@@ -0,0 +1,173 @@
+"""Shared HTTP transport for SimmerClient and PolymarketCLOB.
+
+One pooled keep-alive `requests.Session` per client, plus:
+- retry with jittered exponential backoff on 429/5xx, honouring `Retry-After`;
+  non-idempotent requests (trade POSTs) are only retried on 429, since a 5xx
+  or a dropped connection may arrive after the server already acted
+- timing counters that split connection setup (TCP+TLS) from time-to-first-byte,
+  so each run can report how much the pool saved.
+"""
+
+from __future__ import annotations
+
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+@dataclass
+class TransportStats:
+    requests: int = 0
+    attempts: int = 0
+    retries: int = 0
+    connections: int = 0
+    handshake_s: float = 0.0
+    elapsed_s: float = 0.0
+    backoff_s: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add(self, **deltas) -> None:
+        with self._lock:
+            for k, v in deltas.items():
+                setattr(self, k, getattr(self, k) + v)
+
+    @property
+    def ttfb_s(self) -> float:
+        """Time from request sent to response headers, excluding connection setup."""
+        return max(0.0, self.elapsed_s - self.handshake_s)
+
+    def summary(self) -> str:
+        return (
+            f"requests={self.requests} attempts={self.attempts} retries={self.retries} "
+            f"connections={self.connections} handshake={self.handshake_s:.3f}s "
+            f"ttfb={self.ttfb_s:.3f}s backoff={self.backoff_s:.1f}s"
+        )
+
+
+def _timed_pool(pool_cls, conn_cls, stats: TransportStats):
+    class TimedConnection(conn_cls):
+        def connect(self):
+            t0 = time.perf_counter()
+            super().connect()
+            stats.add(connections=1, handshake_s=time.perf_counter() - t0)
+
+    return type(pool_cls.__name__, (pool_cls,), {"ConnectionCls": TimedConnection})
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose pools count new connections and their setup time."""
+
+    def __init__(self, stats: TransportStats, **kwargs):
+        self.stats = stats
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _timed_pool(HTTPConnectionPool, HTTPConnection, self.stats),
+            "https": _timed_pool(HTTPSConnectionPool, HTTPSConnection, self.stats),
+        }
+
+
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (delta-seconds or HTTP-date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        dt = parsedate_to_datetime(value)
+    except Exception:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return max(0.0, (dt - datetime.now(timezone.utc)).total_seconds())
+
+
+class Transport:
+    def __init__(
+        self,
+        *,
+        headers: Optional[Dict[str, str]] = None,
+        pool_connections: int = 4,
+        pool_maxsize: int = 8,
+        max_retries: int = 4,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+        timeout: float = 30,
+    ):
+        self.stats = TransportStats()
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        if headers:
+            self.session.headers.update(headers)
+        adapter = TimedHTTPAdapter(self.stats, pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2**attempt)))
+        if retry_after is not None:
+            delay = max(delay, retry_after)  # never sooner than the server asked
+        return delay
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        before_attempt: Optional[Callable[[], Any]] = None,
+        idempotent: Optional[bool] = None,
+        **kwargs,
+    ) -> requests.Response:
+        """Send a request, retrying 429/5xx and connection errors if it is idempotent.
+
+        `idempotent` defaults to True for GET/HEAD/OPTIONS; pass True for POSTs
+        that only read (CLOB /books, /prices). Other requests are retried on 429
+        only. `before_attempt` runs ahead of every attempt, e.g. to take a
+        rate-limit token. Raises `requests.HTTPError` once retries are exhausted.
+        """
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        retry_statuses = RETRY_STATUSES if idempotent else (429,)
+        kwargs.setdefault("timeout", self.timeout)
+        self.stats.add(requests=1)
+        attempt = 0
+        while True:
+            if before_attempt:
+                before_attempt()
+            self.stats.add(attempts=1)
+            try:
+                r = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if not idempotent or attempt >= self.max_retries:
+                    raise
+                delay = self.backoff(attempt)
+            else:
+                self.stats.add(elapsed_s=r.elapsed.total_seconds())
+                if r.status_code not in retry_statuses or attempt >= self.max_retries:
+                    r.raise_for_status()
+                    return r
+                delay = self.backoff(attempt, retry_after_seconds(r.headers.get("Retry-After")))
+                r.close()
+            attempt += 1
+            self.stats.add(retries=1, backoff_s=delay)
+            time.sleep(delay)